@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR di tutti i PDF dei quiz con un solo comando e un solo pool di processi
+
+Gli script OCR elaborano un PDF alla volta (PDF_PATH e OUTPUT_TEXT_FILE sono
+fissi nel codice). Questo script trova i PDF in "Ulteriori quiz" e la banca
+dati principale, costruisce l'elenco dei lavori (ogni PDF produce il .txt
+accanto a sé) e li esegue a blocchi di pagine su un unico pool di processi:
+
+- i blocchi di tutti i documenti condividono i worker: quando un documento
+  finisce i suoi processi passano subito agli altri
+- i documenti più lunghi partono per primi, così alla fine non resta un solo
+  documento grande in corso con gli altri core inattivi
+- i .txt già aggiornati vengono saltati: stessa configurazione OCR e stesso
+  PDF (dimensione e data di modifica o, se la data è cambiata, hash sha256)
+- ogni documento viene scritto in ordine di pagina con OutputJournal: il .txt
+  e il report sono quelli dello script singolo e un'esecuzione interrotta
+  riprende con --resume
+- a fine esecuzione vengono riportate le pagine al secondo per documento
+
+Lo stato dei lavori resta in BATCH_MANIFEST tra un'esecuzione e l'altra.
+
+Uso:
+    python batch_ocr.py                        # tutti i PDF, tutti i core, Tesseract
+    python batch_ocr.py --engine easyocr --workers 4
+    python batch_ocr.py "Ulteriori quiz/ssfo-quiz-modello5.pdf" --force
+    python batch_ocr.py --dry-run              # mostra i lavori senza eseguirli
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from ocr_cache import add_cache_arguments, cache_config_from_args
+from ocr_journal import OutputJournal, pdf_signature, REPORT_SUFFIX
+from pdf_text_layer import fitz
+from ocr_quality import page_report, policy_info, add_adaptive_arguments, adaptive_policy_from_args
+from ocr_preprocess import preprocess_info, preprocess_description, add_preprocess_arguments, preprocess_options_from_args
+from ocr_events import ocr_page_metrics, add_events_arguments, events_from_args
+
+# Cartelle in cui cercare i PDF e PDF singoli da aggiungere (la banca dati principale)
+BATCH_DIRS = ["Ulteriori quiz"]
+BATCH_PDFS = ["Banca dati unisa farmacia ospedaliera.pdf"]
+
+# Stato dei lavori (PDF, .txt prodotto, hash) tra un'esecuzione e l'altra
+BATCH_MANIFEST = "ocr-batch.json"
+MANIFEST_VERSION = 1
+
+# Script OCR usati come motori (importati solo quando servono: mancano dipendenze diverse)
+ENGINES = {
+    "tesseract": "extract_text_from_pdf_ocr",
+    "easyocr": "extract_text_from_pdf_ocr_easyocr",
+}
+
+# Pagine per blocco di lavoro: l'unità di schedulazione sul pool
+PAGES_PER_TASK = 4
+
+DEFAULT_DPI = 300
+
+def load_engine(name):
+    """Modulo dello script OCR del motore (esce con SystemExit se mancano le sue dipendenze)"""
+    return importlib.import_module(ENGINES[name])
+
+def engine_settings(engine_name, engine, dpi, text_layer, adaptive, preprocess):
+    """Configurazione OCR come nel run_info degli script (senza la firma del PDF)"""
+    lang = engine.OCR_LANG if engine_name == "tesseract" else '+'.join(engine.OCR_LANGUAGES)
+    return dict(
+        engine=engine_name, lang=lang, dpi=dpi, text_layer=text_layer,
+        adaptive=policy_info(adaptive), preprocess=preprocess_info(preprocess)
+    )
+
+def discover_pdfs(paths):
+    """PDF da elaborare: i file indicati e i PDF contenuti nelle cartelle indicate (senza duplicati)"""
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            pdfs.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(".pdf")
+            )
+        elif os.path.isfile(path):
+            pdfs.append(path)
+        else:
+            print(f"[WARN] {path}: non trovato, saltato")
+
+    unique, seen = [], set()
+    for pdf in pdfs:
+        key = os.path.normcase(os.path.abspath(pdf))
+        if key not in seen:
+            seen.add(key)
+            unique.append(os.path.normpath(pdf))
+    return unique
+
+def output_path(pdf):
+    """Il .txt accanto al PDF (stessa convenzione di "Ulteriori quiz/ssfo-quiz-modelloN.txt")"""
+    return os.path.splitext(pdf)[0] + ".txt"
+
+def file_sha256(path):
+    """Hash sha256 del contenuto di un file, letto a blocchi"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(path, settings):
+    """Lavori registrati dall'esecuzione precedente con la stessa configurazione: {pdf: voce}"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != settings:
+        return {}
+    return {os.path.normpath(job["pdf"]): job for job in manifest.get("jobs", [])}
+
+def save_manifest(path, settings, entries):
+    """Salva lo stato dei lavori in modo atomico (file temporaneo + rename)"""
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            "version": MANIFEST_VERSION,
+            "settings": settings,
+            "updated": datetime.now().isoformat(timespec='seconds'),
+            "jobs": sorted(entries.values(), key=lambda job: job["pdf"]),
+        }, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, path)
+
+def is_up_to_date(job, previous, run_info):
+    """
+    True se il .txt del lavoro corrisponde al PDF attuale e alla configurazione
+
+    previous è la voce del manifest (None se assente o di un'altra
+    configurazione). Senza voce vale il report dello script OCR che ha
+    prodotto il .txt, che registra PDF e configurazione dell'esecuzione.
+    """
+    output = job["output"]
+    if not os.path.exists(output):
+        return False
+    stat = os.stat(output)
+
+    if previous is not None and (previous.get("output_size"), previous.get("output_mtime")) == (stat.st_size, int(stat.st_mtime)):
+        if (previous.get("size"), previous.get("mtime")) == (job["size"], job["mtime"]):
+            job["sha256"] = previous.get("sha256")
+            return True
+        if previous.get("size") == job["size"] and previous.get("sha256"):
+            # Data di modifica cambiata (copia, checkout): decide il contenuto
+            job["sha256"] = file_sha256(job["pdf"])
+            return job["sha256"] == previous["sha256"]
+        return False
+
+    try:
+        with open(output + REPORT_SUFFIX, 'r', encoding='utf-8') as f:
+            return json.load(f).get("run") == run_info
+    except (OSError, ValueError):
+        return False
+
+def build_jobs(pdfs, engine, settings, previous, force=False):
+    """
+    Elenco dei lavori con numero di pagine e stato ("da fare", "aggiornato", "errore")
+
+    Returns:
+        lista di dict (pdf, output, pages, size, mtime, sha256, status, run_info)
+    """
+    jobs = []
+    for pdf in pdfs:
+        signature = pdf_signature(pdf)
+        job = {
+            "pdf": pdf, "output": output_path(pdf), "pages": 0,
+            "size": signature["size"], "mtime": signature["mtime"], "sha256": None,
+            "run_info": dict(signature, **settings),
+        }
+        try:
+            job["pages"] = engine.get_pdf_page_count(pdf)
+        except Exception as e:
+            job["status"], job["error"] = "errore", str(e)
+            jobs.append(job)
+            continue
+        if not force and is_up_to_date(job, previous.get(pdf), job["run_info"]):
+            job["status"] = "aggiornato"
+        else:
+            job["status"] = "da fare"
+        jobs.append(job)
+    return jobs
+
+def manifest_entry(job, **info):
+    """Voce del manifest per un lavoro: PDF, .txt e hash, più le misure dell'esecuzione"""
+    stat = os.stat(job["output"])
+    if job.get("sha256") is None:
+        job["sha256"] = file_sha256(job["pdf"])
+    return dict(
+        pdf=job["pdf"], output=job["output"], pages=job["pages"],
+        size=job["size"], mtime=job["mtime"], sha256=job["sha256"],
+        output_size=stat.st_size, output_mtime=int(stat.st_mtime), **info
+    )
+
+def engine_task(engine_name, pdf, first_page, last_page, dpi, text_layer, adaptive, preprocess, pipeline):
+    """Argomento di _ocr_page_range_worker dello script del motore per un blocco di pagine"""
+    if engine_name == "tesseract":
+        lang = load_engine(engine_name).OCR_LANG
+        return (pdf, first_page, last_page, lang, dpi, text_layer, adaptive, preprocess, 0, pipeline)
+    batch_size = load_engine(engine_name).OCR_BATCH_SIZE
+    return (pdf, first_page, last_page, dpi, batch_size, text_layer, adaptive, preprocess, pipeline)
+
+def _run_chunk(task):
+    """Eseguita nei worker: un blocco di pagine con il worker dello script OCR, cronometrato"""
+    engine_name, page_task = task
+    start_time = time.perf_counter()
+    results = load_engine(engine_name)._ocr_page_range_worker(page_task)
+    return results, time.perf_counter() - start_time
+
+class DocumentRun:
+    """
+    Un documento in elaborazione
+
+    I blocchi arrivano dal pool in qualsiasi ordine: quelli successivi
+    all'ultima pagina scritta restano in attesa finché non arrivano i
+    precedenti, così il journal riceve le pagine in ordine.
+    """
+
+    def __init__(self, job, text_layer, resume=False):
+        self.job = job
+        self.name = os.path.basename(job["pdf"])
+        self.text_layer = text_layer
+        self.journal = OutputJournal(job["output"], job["run_info"], resume=resume)
+        self.first_page = self.journal.next_page
+        self._next_page = self.first_page
+        # Prima pagina del blocco -> (ultima pagina, risultati)
+        self._pending = {}
+        # Blocchi inviati al pool, da annullare se il documento fallisce
+        self.futures = []
+        self.pages = 0
+        self.errors = 0
+        self.worker_seconds = 0.0
+        self.started = None
+        self.finished = None
+        self.failed = None
+
+    @property
+    def complete(self):
+        return self._next_page > self.job["pages"]
+
+    def add_chunk(self, first_page, last_page, results, seconds, on_page):
+        """Registra un blocco completato e scrive quelli ormai in ordine"""
+        now = time.perf_counter()
+        self.started = min(self.started or now, now - seconds)
+        self.worker_seconds += seconds
+        self._pending[first_page] = (last_page, results)
+        while self._next_page in self._pending:
+            last_page, results = self._pending.pop(self._next_page)
+            for page_num, result, error in results:
+                self._write_page(page_num, result, error, on_page)
+            self._next_page = last_page + 1
+
+    def _write_page(self, page_num, result, error, on_page):
+        """Come il ciclo di scrittura degli script OCR: journal, report ed evento di pagina"""
+        self.pages += 1
+        if error is not None:
+            self.errors += 1
+            self.journal.add_page(page_num, None, report={"page": page_num, "error": error})
+            on_page(page_num, error=error, pdf=self.name)
+            return
+        source = result.get("source")
+        self.journal.add_page(page_num, result["text"], source if self.text_layer else None, page_report(page_num, result))
+        on_page(
+            page_num, ocr_page_metrics(result),
+            source=source, cached=bool(result.get("cached")), dpi=result.get("dpi"), pdf=self.name
+        )
+
+    def finish(self):
+        """Finalizza il .txt (True se contiene del testo)"""
+        self.finished = time.perf_counter()
+        return self.journal.finish()
+
+    def close(self):
+        """Chiude senza finalizzare: il documento potrà essere ripreso con --resume"""
+        self.journal.close()
+
+    def throughput(self):
+        """(secondi dal primo blocco alla fine, pagine al secondo) del documento"""
+        if self.started is None or self.finished is None:
+            return 0.0, None
+        seconds = self.finished - self.started
+        return seconds, (self.pages / seconds if seconds > 0 else None)
+
+def schedule(documents, pages_per_task):
+    """Blocchi di pagine da eseguire: documenti dal più lungo al più corto, pagine in ordine"""
+    tasks = []
+    for document in sorted(documents, key=lambda document: document.job["pages"], reverse=True):
+        for first_page in range(document.first_page, document.job["pages"] + 1, pages_per_task):
+            tasks.append((document, first_page, min(first_page + pages_per_task - 1, document.job["pages"])))
+    return tasks
+
+def run_batch(jobs, engine_name, engine, settings, entries, manifest_path, workers, pages_per_task, cache_config, adaptive, preprocess, pipeline, resume, events):
+    """
+    Esegue i lavori "da fare" su un solo pool di processi
+
+    Returns:
+        (documenti DocumentRun, True se tutti i documenti sono stati completati)
+    """
+    todo = [job for job in jobs if job["status"] == "da fare"]
+    documents = [DocumentRun(job, settings["text_layer"], resume) for job in todo]
+    for document in documents:
+        if document.journal.resumed:
+            print(f"[OK] {document.name}: ripresa dalla pagina {document.first_page}/{document.job['pages']}")
+
+    def complete(document):
+        ok = document.finish()
+        seconds, rate = document.throughput()
+        if ok:
+            entries[document.job["pdf"]] = manifest_entry(
+                document.job, status="completato", updated=datetime.now().isoformat(timespec='seconds'),
+                errors=document.errors, seconds=round(seconds, 2), worker_seconds=round(document.worker_seconds, 2),
+                pages_per_second=round(rate, 3) if rate else None
+            )
+            save_manifest(manifest_path, settings, entries)
+            errors = f", {document.errors} pagine con errori" if document.errors else ""
+            speed = f" ({rate:.2f} pagine/s)" if rate else ""
+            print(f"[OK] {document.name}: {document.pages} pagine in {seconds:.1f}s{speed}{errors}")
+        else:
+            document.failed = "nessun testo estratto"
+            print(f"[WARN] {document.name}: nessun testo estratto")
+
+    total_pages = sum(job["pages"] for job in todo)
+    events.start(
+        total_pages, sum(job["pages"] - document.first_page + 1 for job, document in zip(todo, documents)),
+        documents=len(documents), workers=workers, **settings
+    )
+    for document in documents:
+        if document.complete:
+            # Ripresa di un documento già scritto fino all'ultima pagina
+            complete(document)
+
+    tasks = schedule(documents, pages_per_task)
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=engine._init_ocr_worker,
+        initargs=(cache_config,)
+    )
+    futures = {}
+    interrupted = False
+    try:
+        # Tutti i blocchi vengono accodati subito: il pool li esegue nell'ordine di invio
+        for document, first_page, last_page in tasks:
+            page_task = engine_task(
+                engine_name, document.job["pdf"], first_page, last_page,
+                settings["dpi"], settings["text_layer"], adaptive, preprocess, pipeline
+            )
+            future = executor.submit(_run_chunk, (engine_name, page_task))
+            futures[future] = (document, first_page, last_page)
+            document.futures.append(future)
+
+        for future in as_completed(futures):
+            document, first_page, last_page = futures[future]
+            if document.failed is not None:
+                # Blocco annullato o già in corso quando il documento è fallito
+                continue
+            try:
+                results, seconds = future.result()
+            except Exception as e:
+                document.failed = str(e)
+                # I blocchi ancora in coda non servono più: il pool passa agli altri documenti
+                for pending in document.futures:
+                    pending.cancel()
+                document.close()
+                print(f"[ERR] {document.name}: {e}")
+                print("   Le pagine completate sono salvate: riprendi con --resume")
+                continue
+            document.add_chunk(first_page, last_page, results, seconds, events.page)
+            if document.complete:
+                complete(document)
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n\n[INFO] Interrotto: le pagine completate sono salvate, riprendi con --resume")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        for document in documents:
+            if document.finished is None:
+                document.close()
+
+    ok = not interrupted and all(document.failed is None and document.finished is not None for document in documents)
+    events.finish(ok=ok, documents=len(documents), failed=[document.name for document in documents if document.failed])
+    return documents, ok
+
+def print_jobs(jobs):
+    """Elenco dei lavori con pagine e stato"""
+    for job in jobs:
+        detail = f": {job['error']}" if job.get("error") else ""
+        print(f"   {job['pdf']} ({job['pages']} pagine) -> {job['output']} [{job['status']}{detail}]")
+
+def print_summary(documents, seconds, workers):
+    """Pagine al secondo per documento e complessive"""
+    done = [document for document in documents if document.finished is not None]
+    if not done:
+        return
+    print("\n Velocità per documento (pagine / secondi dal primo blocco / pagine al secondo / secondi nei worker):")
+    for document in sorted(done, key=lambda document: document.pages, reverse=True):
+        doc_seconds, rate = document.throughput()
+        speed = f"{rate:.2f}" if rate else "-"
+        print(f"   {document.name}: {document.pages} / {doc_seconds:.1f}s / {speed} / {document.worker_seconds:.1f}s")
+    pages = sum(document.pages for document in done)
+    print(f" Totale: {pages} pagine in {seconds:.1f}s ({pages / seconds:.2f} pagine/s con {workers} processi)")
+
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="OCR di tutti i PDF dei quiz su un solo pool di processi")
+    parser.add_argument(
+        "paths", nargs="*",
+        help=f"PDF o cartelle di PDF (default: {', '.join(BATCH_DIRS + BATCH_PDFS)})"
+    )
+    parser.add_argument(
+        "--engine", choices=sorted(ENGINES), default="tesseract",
+        help="motore OCR (default: tesseract)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="processi OCR (default: 0 = tutti i core)"
+    )
+    parser.add_argument(
+        "--dpi", type=int, default=DEFAULT_DPI,
+        help=f"risoluzione del rendering (default: {DEFAULT_DPI})"
+    )
+    parser.add_argument(
+        "--pages-per-task", type=int, default=PAGES_PER_TASK,
+        help=f"pagine per blocco di lavoro sul pool (default: {PAGES_PER_TASK})"
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="rigenera anche i .txt già aggiornati"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="riprendi i documenti interrotti dalla prima pagina non completata"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="mostra i lavori e il loro stato senza eseguirli"
+    )
+    parser.add_argument(
+        "--force-ocr", action="store_true",
+        help="applica l'OCR a tutte le pagine, anche a quelle con un livello di testo"
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="in ogni processo esegui rendering, preprocessing e OCR come stadi concorrenti"
+    )
+    parser.add_argument(
+        "--manifest", default=BATCH_MANIFEST,
+        help=f"file con lo stato dei lavori (default: {BATCH_MANIFEST})"
+    )
+    add_cache_arguments(parser)
+    add_adaptive_arguments(parser)
+    add_preprocess_arguments(parser)
+    add_events_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    """Funzione principale"""
+    args = parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    events = events_from_args(args, 'batch')
+
+    print("=" * 60)
+    print("  OCR DI TUTTI I PDF DEI QUIZ")
+    print("=" * 60)
+    print()
+
+    try:
+        engine = load_engine(args.engine)
+    except SystemExit:
+        print(f"\n[ERR] Dipendenze mancanti per il motore {args.engine}")
+        events.finish(ok=False, error=f"dipendenze mancanti per {args.engine}")
+        events.close()
+        return 1
+
+    adaptive = adaptive_policy_from_args(args)
+    preprocess = preprocess_options_from_args(args)
+    dpi = adaptive.steps[0] if adaptive is not None else args.dpi
+    text_layer = not args.force_ocr
+    if text_layer and fitz is None:
+        print("[WARN] PyMuPDF non installato: tutte le pagine passano dall'OCR")
+        text_layer = False
+    settings = engine_settings(args.engine, engine, dpi, text_layer, adaptive, preprocess)
+
+    pdfs = discover_pdfs(args.paths or BATCH_DIRS + [pdf for pdf in BATCH_PDFS if os.path.exists(pdf)])
+    if not pdfs:
+        print("[ERR] Nessun PDF trovato")
+        events.finish(ok=False, error="nessun PDF trovato")
+        events.close()
+        return 1
+
+    entries = load_manifest(args.manifest, settings)
+    jobs = build_jobs(pdfs, engine, settings, entries, force=args.force)
+    todo = [job for job in jobs if job["status"] == "da fare"]
+
+    print(f"[OK] {len(jobs)} PDF trovati ({sum(job['pages'] for job in jobs)} pagine), "
+          f"{len(todo)} da elaborare ({sum(job['pages'] for job in todo)} pagine)")
+    print_jobs(jobs)
+    print()
+    # I lavori aggiornati restano nel manifest con l'eventuale hash appena calcolato
+    for job in jobs:
+        if job["status"] == "aggiornato":
+            previous = entries.get(job["pdf"], {})
+            entries[job["pdf"]] = manifest_entry(job, **{
+                key: previous[key] for key in ("status", "updated", "errors", "seconds", "worker_seconds", "pages_per_second")
+                if key in previous
+            })
+
+    if args.dry_run:
+        events.close()
+        return 0
+    save_manifest(args.manifest, settings, entries)
+    if not todo:
+        print("[OK] Tutti i file di testo sono aggiornati" if all(job["status"] != "errore" for job in jobs)
+              else "[ERR] Alcuni PDF non sono leggibili")
+        events.close()
+        return 0 if all(job["status"] != "errore" for job in jobs) else 1
+
+    if args.engine == "tesseract" and not engine.check_dependencies():
+        print("\n[ERR] Dipendenze mancanti. Installa le dipendenze necessarie.")
+        events.close()
+        return 1
+
+    print(f"\n🔍 OCR con {args.engine} su {workers} processi (DPI: {dpi}, {args.pages_per_task} pagine per blocco)")
+    if preprocess is not None:
+        print(f" Preprocessing: {preprocess_description(preprocess)}")
+    print("   (I documenti più lunghi partono per primi)\n")
+
+    start_time = time.perf_counter()
+    documents, ok = run_batch(
+        jobs, args.engine, engine, settings, entries, args.manifest, workers, args.pages_per_task,
+        cache_config_from_args(args), adaptive, preprocess, args.pipeline, args.resume, events
+    )
+    events.close()
+    print_summary(documents, time.perf_counter() - start_time, workers)
+
+    if ok and all(job["status"] != "errore" for job in jobs):
+        print("\n[OK] Tutti i file di testo sono aggiornati")
+        return 0
+    print("\n[ERR] Alcuni documenti non sono stati completati. Controlla gli errori sopra.")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
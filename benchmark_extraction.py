@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark riproducibile degli script di estrazione su PDF sintetici
+Misura extract_text_from_pdf_ocr.py, extract_text_from_pdf_ocr_easyocr.py ed
+extract_pdf_images.py senza accesso alla rete
+
+Il PDF di prova viene generato in locale con PyMuPDF, sempre uguale a parità
+di opzioni (seme fisso), con tre tipi di pagine a quiz:
+    testo       livello di testo (letto senza OCR)
+    scansione   pagina rasterizzata e leggermente ruotata, solo immagine
+    immagini    livello di testo con immagini incorporate
+
+Ogni combinazione script/DPI/processi viene eseguita in un processo separato,
+così il picco di memoria (RSS) è quello della sola esecuzione. Per ogni
+esecuzione vengono registrati pagine al secondo, tempi per fase (dal report
+per pagina degli script OCR) e picco di RSS, in un file JSON confrontabile
+con quelli delle esecuzioni precedenti (--baseline).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    print("[ERR] Errore: PyMuPDF non installato")
+    print("   Installa con: pip install PyMuPDF")
+    sys.exit(1)
+
+from pdf_text_layer import SOURCE_TEXT_LAYER
+
+try:
+    import resource
+except ImportError:
+    # Windows: il picco di RSS non è disponibile
+    resource = None
+
+RESULTS_FILE = "benchmark-results.json"
+RESULTS_VERSION = 1
+
+SCRIPTS = ("tesseract", "easyocr", "images")
+DEFAULT_PAGES = 24
+DEFAULT_MIX = "1:1:1"
+DEFAULT_DPI = "150,300"
+DEFAULT_WORKERS = "1,2"
+DEFAULT_SEED = 42
+
+# Variazione di pagine/secondo oltre la quale il confronto con --baseline la segnala
+REGRESSION_THRESHOLD = 0.10
+
+# Parole per il testo dei quiz sintetici (lessico del dominio, nessun dato reale)
+VOCABULARY = (
+    "farmaco dose paziente terapia somministrazione ospedaliera farmacia principio attivo "
+    "anticorpo monoclonale recettore inibitore enzima plasmatica emivita clearance renale "
+    "epatica interazione controindicazione sterile preparazione galenica allestimento "
+    "nutrizione parenterale antibiotico profilassi infusione endovenosa biodisponibilita "
+    "citochina interleuchina IL-10 TNF-alfa linfociti vaccino adiuvante stabilita validita"
+).split()
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in punti PDF
+SCAN_DPI = 200
+SCAN_MAX_ANGLE = 2.0
+
+def _sentence(rng, min_words, max_words):
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize()
+
+def quiz_page_text(rng, first_number, quizzes=3):
+    """Testo di una pagina con quiz numerati: domanda, opzioni A-E e risposta"""
+    blocks = []
+    for number in range(first_number, first_number + quizzes):
+        lines = [f"{number}) {_sentence(rng, 8, 16)}?"]
+        lines += [f"{letter}) {_sentence(rng, 2, 7)}" for letter in "ABCDE"]
+        lines.append(f"Risposta {rng.choice('ABCDE')}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+def _insert_quiz_text(page, text):
+    page.insert_textbox(fitz.Rect(50, 50, PAGE_WIDTH - 50, PAGE_HEIGHT - 50), text, fontsize=11, fontname="helv")
+
+def _synthetic_image(rng, width, height):
+    """Immagine RGB a blocchi colorati (simula figure e tabelle dei quiz)"""
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pixmap.set_rect(pixmap.irect, (255, 255, 255))
+    for _ in range(12):
+        x0, y0 = rng.randrange(width - 20), rng.randrange(height - 20)
+        rect = fitz.IRect(x0, y0, x0 + rng.randint(10, width // 2), y0 + rng.randint(10, height // 2))
+        pixmap.set_rect(rect & pixmap.irect, tuple(rng.randrange(256) for _ in range(3)))
+    return pixmap
+
+def parse_mix(spec):
+    """Proporzioni "testo:scansione:immagini" -> tupla di 3 interi"""
+    parts = [int(part) for part in spec.split(":")]
+    if len(parts) != 3 or min(parts) < 0 or sum(parts) == 0:
+        raise ValueError(f"proporzioni non valide: {spec} (atteso testo:scansione:immagini, es. 1:1:1)")
+    return tuple(parts)
+
+def page_kinds(pages, mix):
+    """Tipo di ogni pagina ("text", "scan", "image"), alternati secondo le proporzioni"""
+    cycle = [kind for kind, count in zip(("text", "scan", "image"), mix) for _ in range(count)]
+    return [cycle[index % len(cycle)] for index in range(pages)]
+
+def generate_pdf(path, pages=DEFAULT_PAGES, mix=(1, 1, 1), seed=DEFAULT_SEED):
+    """
+    Genera il PDF sintetico (identico a parità di argomenti)
+
+    Returns:
+        {tipo di pagina: numero di pagine}
+    """
+    rng = random.Random(seed)
+    counts = {"text": 0, "scan": 0, "image": 0}
+    quiz_number = 1
+    with fitz.open() as pdf_document:
+        for kind in page_kinds(pages, mix):
+            text = quiz_page_text(rng, quiz_number)
+            quiz_number += 3
+            page = pdf_document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+
+            if kind == "scan":
+                # La pagina viene composta a parte, rasterizzata e ruotata: resta solo l'immagine
+                with fitz.open() as source:
+                    source_page = source.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+                    _insert_quiz_text(source_page, text)
+                    zoom = SCAN_DPI / 72
+                    angle = rng.uniform(-SCAN_MAX_ANGLE, SCAN_MAX_ANGLE)
+                    pixmap = source_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom).prerotate(angle),
+                                                    colorspace=fitz.csGRAY, alpha=False)
+                page.insert_image(page.rect, pixmap=pixmap)
+            else:
+                _insert_quiz_text(page, text)
+                if kind == "image":
+                    for index in range(2):
+                        pixmap = _synthetic_image(rng, 320, 200)
+                        top = 520 + index * 140
+                        page.insert_image(fitz.Rect(120, top, 360, top + 130), pixmap=pixmap)
+            counts[kind] += 1
+        # Metadati e ID fissi: lo stesso seme produce lo stesso file, byte per byte
+        pdf_document.set_metadata({"title": "Quiz sintetici", "producer": "benchmark_extraction.py"})
+        pdf_document.save(path, garbage=3, deflate=True, no_new_id=True)
+    return counts
+
+def peak_rss_mb(who):
+    """Picco di RSS in MB del processo (who=RUSAGE_SELF) o dei figli terminati (RUSAGE_CHILDREN)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss è in KB su Linux e in byte su macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _latency_summary(timed, page_seconds):
+    """Secondi medi per fase (timed: un dizionario fase -> secondi per pagina) e percentili per pagina"""
+    totals = {}
+    for timings in timed:
+        for stage, seconds in timings.items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+
+    page_seconds = sorted(page_seconds)
+    latency = {
+        "stage_mean_seconds": {stage: round(total / len(timed), 4) for stage, total in totals.items()} if timed else {},
+    }
+    if page_seconds:
+        latency["page_p50_seconds"] = round(page_seconds[len(page_seconds) // 2], 4)
+        latency["page_p95_seconds"] = round(page_seconds[min(len(page_seconds) - 1, int(len(page_seconds) * 0.95))], 4)
+    return latency
+
+def stage_latency(report_file):
+    """Tempi per fase dal report per pagina degli script OCR (secondi medi per pagina riconosciuta)"""
+    with open(report_file, 'r', encoding='utf-8') as f:
+        pages = json.load(f)["pages"]
+
+    timed = [page["timings"] for page in pages if page.get("timings")]
+    return dict(
+        pages_ocr=len(timed),
+        pages_text_layer=sum(1 for page in pages if page.get("source") == SOURCE_TEXT_LAYER),
+        **_latency_summary(timed, [sum(timings.values()) for timings in timed])
+    )
+
+def image_stage_latency(page_events):
+    """Tempi per fase dagli eventi di pagina di extract_pdf_images.py (secondi medi per pagina)"""
+    import extract_pdf_images as script
+    timed = [{stage: event[stage] for stage in script.PAGE_STAGES if stage in event} for event in page_events]
+    return _latency_summary(timed, [event["seconds"] for event in page_events if "seconds" in event])
+
+def _run_ocr_script(spec, workdir):
+    """Esegue uno dei due script OCR; (pagine, secondi, secondi di preparazione, tempi per fase)"""
+    output_file = os.path.join(workdir, "output.txt")
+    setup_seconds = 0.0
+
+    if spec["script"] == "tesseract":
+        import extract_text_from_pdf_ocr as script
+        # Senza l'eseguibile tesseract l'esecuzione non è misurabile
+        script.pytesseract.get_tesseract_version()
+        run = lambda: script.extract_text_from_pdf_ocr(
+            spec["pdf"], output_file, lang=script.OCR_LANG, dpi=spec["dpi"], workers=spec["workers"],
+            text_layer=not spec["force_ocr"]
+        )
+    else:
+        import extract_text_from_pdf_ocr_easyocr as script
+        reader = None
+        if spec["workers"] == 1:
+            start_time = time.perf_counter()
+            reader = script.create_reader()
+            setup_seconds = time.perf_counter() - start_time
+        run = lambda: script.extract_text_from_pdf_ocr(
+            spec["pdf"], output_file, reader, dpi=spec["dpi"], workers=spec["workers"],
+            text_layer=not spec["force_ocr"]
+        )
+
+    start_time = time.perf_counter()
+    if not run():
+        raise RuntimeError("estrazione fallita")
+    seconds = time.perf_counter() - start_time
+    return spec["pages"], seconds, setup_seconds, stage_latency(output_file + ".report.json")
+
+def image_shard_pages(pages, workers):
+    """
+    Pagine per blocco dell'estrazione delle immagini: un blocco per processo
+
+    Con i SHARD_PAGES di default un PDF sintetico corto sarebbe un solo blocco
+    e ogni numero di processi misurerebbe lo stesso percorso sequenziale.
+    """
+    return max(1, -(-pages // max(1, workers)))
+
+def _run_images_script(spec, workdir):
+    """Esegue extract_pdf_images.py; (pagine, secondi, secondi di preparazione, dati dell'esecuzione)"""
+    import extract_pdf_images as script
+    from ocr_events import RunEvents
+
+    page_events = []
+
+    def on_event(event):
+        if event["event"] == "page":
+            page_events.append(event)
+
+    events = RunEvents('images', listeners=[on_event])
+    shard_pages = image_shard_pages(spec["pages"], spec["workers"])
+    start_time = time.perf_counter()
+    total_images, _ = script.extract_images_from_pdf(
+        spec["pdf"], os.path.join(workdir, "images"), workers=spec["workers"], force=True,
+        events=events, shard_pages=shard_pages
+    )
+    seconds = time.perf_counter() - start_time
+    return spec["pages"], seconds, 0.0, dict(images=total_images, shard_pages=shard_pages, **image_stage_latency(page_events))
+
+def run_one(spec):
+    """
+    Eseguita nel processo figlio: una sola esecuzione misurata
+
+    L'output degli script viene catturato (se ne conservano le ultime righe in
+    caso di errore); il risultato è una riga JSON su stdout.
+    """
+    result = {key: spec[key] for key in ("script", "dpi", "workers", "force_ocr")}
+    captured = io.StringIO()
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as workdir:
+        try:
+            with contextlib.redirect_stdout(captured):
+                if spec["script"] == "images":
+                    pages, seconds, setup_seconds, details = _run_images_script(spec, workdir)
+                else:
+                    pages, seconds, setup_seconds, details = _run_ocr_script(spec, workdir)
+        except (Exception, SystemExit) as e:
+            # SystemExit: gli script escono all'import se manca una dipendenza
+            tail = captured.getvalue().strip().splitlines()[-3:]
+            reason = [] if isinstance(e, SystemExit) else [str(e) or type(e).__name__]
+            result.update(ok=False, error=" | ".join(tail + reason))
+        else:
+            result.update(
+                ok=True,
+                pages=pages,
+                seconds=round(seconds, 3),
+                setup_seconds=round(setup_seconds, 3),
+                pages_per_second=round(pages / seconds, 3) if seconds else None,
+                **details
+            )
+
+    result["peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_SELF) if resource else None
+    result["peak_rss_workers_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+    return result
+
+def run_in_subprocess(spec):
+    """Avvia run_one in un processo nuovo e ne legge il risultato"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-one", json.dumps(spec)],
+        cwd=script_dir, capture_output=True, text=True, encoding='utf-8', errors='replace'
+    )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    error = (proc.stderr.strip().splitlines() or [f"codice di uscita {proc.returncode}"])[-1]
+    return dict({key: spec[key] for key in ("script", "dpi", "workers", "force_ocr")}, ok=False, error=error)
+
+def run_key(run):
+    """Identifica una combinazione per il confronto tra file di risultati"""
+    return (run["script"], run["dpi"], run["workers"], run["force_ocr"])
+
+def compare_with_baseline(results, baseline):
+    """Righe di confronto pagine/secondo rispetto a un file di risultati precedente"""
+    if baseline.get("corpus") != results["corpus"]:
+        yield "[WARN] Il PDF sintetico della baseline è diverso: i valori non sono confrontabili"
+    previous = {run_key(run): run for run in baseline.get("runs", []) if run.get("ok")}
+    for run in results["runs"]:
+        old = previous.get(run_key(run))
+        if not run.get("ok") or old is None or not old.get("pages_per_second"):
+            continue
+        change = run["pages_per_second"] / old["pages_per_second"] - 1
+        tag = "[WARN]" if change < -REGRESSION_THRESHOLD else "[OK]" if change > REGRESSION_THRESHOLD else "    "
+        yield (f"{tag} {_describe(run)}: {old['pages_per_second']:.2f} -> {run['pages_per_second']:.2f} "
+               f"pagine/s ({change:+.0%})")
+
+def _describe(run):
+    if run["script"] == "images":
+        return f"images, {run['workers']} processi"
+    return f"{run['script']}, {run['dpi']} DPI, {run['workers']} processi"
+
+def _int_list(spec):
+    return [int(value) for value in spec.split(",") if value.strip()]
+
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Benchmark degli script di estrazione su PDF sintetici")
+    parser.add_argument(
+        "--scripts", default=",".join(SCRIPTS),
+        help=f"script da misurare (default: {','.join(SCRIPTS)})"
+    )
+    parser.add_argument("--pages", type=int, default=DEFAULT_PAGES, help=f"pagine del PDF sintetico (default: {DEFAULT_PAGES})")
+    parser.add_argument(
+        "--mix", default=DEFAULT_MIX,
+        help=f"proporzioni di pagine testo:scansione:immagini (default: {DEFAULT_MIX})"
+    )
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"seme del contenuto sintetico (default: {DEFAULT_SEED})")
+    parser.add_argument("--dpi", default=DEFAULT_DPI, help=f"DPI da provare per l'OCR (default: {DEFAULT_DPI})")
+    parser.add_argument("--workers", default=DEFAULT_WORKERS, help=f"numeri di processi da provare (default: {DEFAULT_WORKERS})")
+    parser.add_argument(
+        "--force-ocr", action="store_true",
+        help="applica l'OCR anche alle pagine con livello di testo"
+    )
+    parser.add_argument("--output", default=RESULTS_FILE, help=f"file dei risultati (default: {RESULTS_FILE})")
+    parser.add_argument("--baseline", metavar="FILE", help="confronta con i risultati di un'esecuzione precedente")
+    parser.add_argument("--keep-pdf", metavar="FILE", help="salva anche il PDF sintetico")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def main():
+    """Funzione principale"""
+    args = parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(json.loads(args.run_one))))
+        return
+
+    scripts = [script.strip() for script in args.scripts.split(",") if script.strip()]
+    unknown = set(scripts) - set(SCRIPTS)
+    if unknown:
+        print(f"[ERR] Script sconosciuti: {', '.join(sorted(unknown))} (disponibili: {', '.join(SCRIPTS)})")
+        sys.exit(1)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        print(f"[ERR] {e}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("  BENCHMARK ESTRAZIONE (PDF SINTETICI)")
+    print("=" * 60)
+    print()
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_pdf_") as tmp_dir:
+        pdf_path = os.path.abspath(args.keep_pdf) if args.keep_pdf else os.path.join(tmp_dir, "synthetic-quiz.pdf")
+        counts = generate_pdf(pdf_path, args.pages, mix, args.seed)
+        print(f"[OK] PDF sintetico: {args.pages} pagine ({counts['text']} testo, "
+              f"{counts['scan']} scansione, {counts['image']} immagini), {os.path.getsize(pdf_path) // 1024}KB\n")
+
+        specs = []
+        for script in scripts:
+            # Il DPI non riguarda l'estrazione delle immagini
+            for dpi in ([None] if script == "images" else _int_list(args.dpi)):
+                for workers in _int_list(args.workers):
+                    specs.append({
+                        "script": script, "pdf": pdf_path, "pages": args.pages, "dpi": dpi,
+                        "workers": workers, "force_ocr": args.force_ocr and script != "images",
+                    })
+
+        runs = []
+        for spec in specs:
+            print(f"   {_describe(spec)}...", end=' ', flush=True)
+            run = run_in_subprocess(spec)
+            runs.append(run)
+            if run["ok"]:
+                rss = f", picco RSS {run['peak_rss_mb']}MB" if run.get("peak_rss_mb") is not None else ""
+                print(f"[OK] {run['pages_per_second']} pagine/s ({run['seconds']}s{rss})")
+            else:
+                print(f"[WARN] non eseguito: {run['error']}")
+
+    results = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "pymupdf": fitz.VersionBind,
+        },
+        "corpus": {"pages": args.pages, "mix": list(mix), "seed": args.seed, **counts},
+        "runs": runs,
+    }
+
+    # Scrittura atomica
+    tmp_path = args.output + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, args.output)
+    print(f"\n[OK] Risultati salvati in: {args.output}")
+
+    if args.baseline:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[ERR] Impossibile leggere la baseline {args.baseline}: {e}")
+            sys.exit(1)
+        print(f"\nConfronto con {args.baseline} ({baseline.get('created', '?')}):")
+        for line in compare_with_baseline(results, baseline):
+            print(f"   {line}")
+
+if __name__ == "__main__":
+    main()
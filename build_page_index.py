@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Costruisce l'indice precalcolato domanda -> pagina del PDF (page-index.json)
+
+Quando si apre il PDF di una domanda, main.js leggeva ogni volta l'intero PDF
+con pdf-parse per stimare la pagina. Questo script estrae una sola volta il
+testo di ogni pagina con PyMuPDF, lo normalizza come findQuestionPage() in
+main.js e registra per ogni quiz (id del file JSON) la pagina e il riquadro
+della domanda: l'app risolve la pagina con una ricerca nell'indice.
+
+Formato:
+    {"version": 1,
+     "files": {"quiz-data.json": {"pdf": "...", "pdf_size": 123, "pages": 1500,
+                                  "quizzes": {"1": [pagina, [x0, y0, x1, y1] o null, hash domanda]}}}}
+
+L'hash (primi 8 caratteri esadecimali dello SHA-1 della domanda normalizzata)
+permette all'app di ignorare le voci di domande modificate dopo la costruzione.
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    print("❌ Errore: PyMuPDF non installato")
+    print("   Installa con: pip install PyMuPDF")
+    sys.exit(1)
+
+# Configurazione
+INDEX_FILE = "page-index.json"
+INDEX_VERSION = 1
+
+# File dei quiz -> PDF di origine (come getPdfFromSourceFile in pages/quiz/quiz.js)
+QUIZ_SOURCES = {
+    "quiz-data.json": "Banca dati unisa farmacia ospedaliera.pdf",
+    "new-quiz-data.json": os.path.join("Ulteriori quiz", "ssfo-quiz-modello2.pdf"),
+    "modello3-quiz-data.json": os.path.join("Ulteriori quiz", "ssfo-quiz-modello3.pdf"),
+    "modello4-quiz-data.json": os.path.join("Ulteriori quiz", "ssfo-quiz-modello4.pdf"),
+    "modello5-quiz-data.json": os.path.join("Ulteriori quiz", "ssfo-quiz-modello5.pdf"),
+    "modello6-quiz-data.json": os.path.join("Ulteriori quiz", "ssfo-quiz-modello6.pdf"),
+    "modello7-quiz-data.json": os.path.join("Ulteriori quiz", "ssfo-quiz-modello7.pdf"),
+}
+
+# Prefissi della domanda provati in ordine (come findQuestionPage in main.js)
+SEARCH_PERCENTAGES = (0.85, 0.90, 0.95, 1.0)
+MIN_SEARCH_CHARS = 30
+
+# Parole iniziali della domanda usate per trovarne il riquadro nella pagina
+BBOX_ANCHOR_WORDS = 8
+
+# Stessa normalizzazione di main.js: in JavaScript \w è solo ASCII, \s è Unicode
+_NON_WORD = re.compile(r'[^A-Za-z0-9_\s]')
+_SPACES = re.compile(r'\s+')
+
+def normalize_text(text):
+    """Minuscolo, trim, punteggiatura -> spazio, spazi multipli compressi (come main.js)"""
+    return _SPACES.sub(' ', _NON_WORD.sub(' ', text.lower().strip()))
+
+def question_hash(question):
+    """Hash breve della domanda normalizzata (confrontato dall'app prima di usare la voce)"""
+    return hashlib.sha1(normalize_text(question).encode('utf-8')).hexdigest()[:8]
+
+class PdfText:
+    """Testo normalizzato di tutto il PDF con l'offset di inizio di ogni pagina"""
+
+    def __init__(self, pdf_document):
+        parts = []
+        self.page_starts = []
+        offset = 0
+        for page in pdf_document:
+            text = normalize_text(page.get_text("text"))
+            self.page_starts.append(offset)
+            parts.append(text)
+            offset += len(text) + 1
+        self.text = ' '.join(parts)
+
+    def page_at(self, offset):
+        """Numero di pagina (1-based) che contiene l'offset del testo"""
+        return bisect.bisect_right(self.page_starts, offset)
+
+    def find_question(self, normalized_question):
+        """Offset della domanda nel testo (-1 se non trovata), con la strategia di main.js"""
+        for pct in SEARCH_PERCENTAGES:
+            search_text = normalized_question[:int(len(normalized_question) * pct)].strip()
+            if len(search_text) < MIN_SEARCH_CHARS:
+                search_text = normalized_question
+            match = self.text.find(search_text)
+            if match != -1:
+                return match
+
+        # Pattern con le parole significative (almeno l'80% delle parole, massimo 20)
+        words = [word for word in normalized_question.split() if len(word) > 2]
+        pattern = ' '.join(words[:min(20, int(len(words) * 0.8))])
+        return self.text.find(pattern) if pattern else -1
+
+def question_bbox(page, normalized_question):
+    """
+    Riquadro della domanda nella pagina, in punti PDF (None se non trovato)
+
+    Le parole della pagina vengono normalizzate come il testo e confrontate
+    con le prime parole della domanda; il riquadro unisce le parole che
+    coincidono a partire da quella posizione.
+    """
+    tokens = []
+    for x0, y0, x1, y1, word, *_ in page.get_text("words", sort=True):
+        for token in normalize_text(word).split():
+            tokens.append((token, (x0, y0, x1, y1)))
+
+    question_tokens = normalized_question.split()
+    anchor = question_tokens[:BBOX_ANCHOR_WORDS]
+    if not anchor:
+        return None
+
+    words = [token for token, _ in tokens]
+    for start in range(len(words) - len(anchor) + 1):
+        if words[start:start + len(anchor)] != anchor:
+            continue
+
+        end = start
+        while (end < len(words) and end - start < len(question_tokens)
+               and words[end] == question_tokens[end - start]):
+            end += 1
+
+        boxes = [box for _, box in tokens[start:end]]
+        return [
+            round(min(box[0] for box in boxes), 1),
+            round(min(box[1] for box in boxes), 1),
+            round(max(box[2] for box in boxes), 1),
+            round(max(box[3] for box in boxes), 1),
+        ]
+    return None
+
+def index_quiz_file(quiz_file, pdf_path):
+    """
+    Indicizza le domande di un file di quiz nel PDF di origine
+
+    Returns:
+        (voce dell'indice per il file, domande non trovate)
+    """
+    with open(quiz_file, 'r', encoding='utf-8') as f:
+        quizzes = json.load(f)["quizzes"]
+
+    quiz_entries = {}
+    not_found = 0
+    with fitz.open(pdf_path) as pdf_document:
+        pdf_text = PdfText(pdf_document)
+        for quiz in quizzes:
+            normalized = normalize_text(quiz.get("question") or "")
+            if not normalized:
+                continue
+
+            offset = pdf_text.find_question(normalized)
+            if offset == -1:
+                not_found += 1
+                continue
+
+            page_num = pdf_text.page_at(offset)
+            bbox = question_bbox(pdf_document[page_num - 1], normalized)
+            quiz_entries[str(quiz["id"])] = [page_num, bbox, question_hash(quiz["question"])]
+
+        page_count = pdf_document.page_count
+
+    return {
+        "pdf": os.path.basename(pdf_path),
+        "pdf_size": os.path.getsize(pdf_path),
+        "pages": page_count,
+        "quizzes": quiz_entries,
+    }, not_found
+
+def load_index(index_path):
+    """Indice esistente (per aggiornare solo alcuni file); uno vuoto se assente o di un'altra versione"""
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"version": INDEX_VERSION, "files": {}}
+
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Costruisce l'indice domanda -> pagina del PDF per l'app")
+    parser.add_argument(
+        "quiz_files", nargs="*",
+        help="file dei quiz da indicizzare (default: tutti quelli con il PDF disponibile)"
+    )
+    parser.add_argument(
+        "--output", default=INDEX_FILE,
+        help=f"file dell'indice (default: {INDEX_FILE})"
+    )
+    return parser.parse_args()
+
+def main():
+    """Funzione principale"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("  INDICE DOMANDE -> PAGINE PDF")
+    print("=" * 60)
+    print()
+
+    quiz_files = args.quiz_files or list(QUIZ_SOURCES)
+    index = load_index(args.output)
+
+    for quiz_file in quiz_files:
+        pdf_path = QUIZ_SOURCES.get(os.path.basename(quiz_file))
+        if pdf_path is None:
+            print(f"⚠️  {quiz_file}: nessun PDF associato, saltato")
+            continue
+        if not os.path.exists(quiz_file) or not os.path.exists(pdf_path):
+            print(f"⚠️  {quiz_file}: file dei quiz o PDF ({pdf_path}) non trovato, saltato")
+            continue
+
+        start_time = time.time()
+        entry, not_found = index_quiz_file(quiz_file, pdf_path)
+        index["files"][os.path.basename(quiz_file)] = entry
+        print(f"📄 {quiz_file}: {len(entry['quizzes'])} domande indicizzate, "
+              f"{not_found} non trovate ({entry['pages']} pagine, {time.time() - start_time:.1f}s)")
+
+    # Scrittura atomica, formato compatto
+    tmp_path = args.output + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, args.output)
+
+    print(f"\n✨ Indice salvato in: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compila i file dei quiz in un unico database SQLite indicizzato (quiz-bank.db)
+
+L'app carica per intero quiz-data.json (2990 quiz, 2.4MB) e i file
+modelloN-quiz-data.json, poi filtra per categoria e cerca nel testo
+scorrendo tutti i quiz. Questo script li importa una sola volta in tabelle
+normalizzate con gli indici per file, categoria e sottocategoria e un indice
+full-text FTS5 su domande e risposte; QuizStore risponde alle richieste
+dell'app (N quiz casuali di una categoria esclusi quelli già visti, ricerca
+per parole) in pochi millisecondi, senza caricare la banca dati in memoria.
+
+Schema:
+    sources  (id, file, source_pdf, extraction_date, size, mtime, quizzes)
+    quizzes  (id, source_id, quiz_id, position, question, category, subcategory, correct_answer)
+    answers  (quiz_rowid, position, letter, text)
+    quiz_fts (question, answers)   FTS5 senza contenuto, rowid = quizzes.id
+
+quiz_id è l'id del quiz nel suo file (lo stesso usato dall'app per i quiz
+già visti): non è unico tra i file e in qualche file si ripete, quindi ogni
+quiz ha anche il proprio id di riga.
+
+Uso:
+    python build_quiz_db.py                              # crea o aggiorna quiz-bank.db
+    python build_quiz_db.py --search "cloramfenicolo"    # prova la ricerca
+    python build_quiz_db.py --random 10 --category FARMACOLOGIA --source quiz-data.json --exclude 1,2,3
+    python build_quiz_db.py --random 10 --exclude quiz-data.json:1,modello7-quiz-data.json:4
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+# Configurazione
+DB_FILE = "quiz-bank.db"
+DB_VERSION = 1
+
+# File dei quiz da importare (come QUIZ_FILES in dedup_quizzes.py)
+QUIZ_FILES = [
+    "quiz-data.json",
+    "new-quiz-data.json",
+    "modello3-quiz-data.json",
+    "modello4-quiz-data.json",
+    "modello5-quiz-data.json",
+    "modello6-quiz-data.json",
+    "modello7-quiz-data.json",
+]
+
+# Peso della domanda rispetto alle risposte nel punteggio bm25 della ricerca
+SEARCH_WEIGHTS = (2.0, 1.0)
+SEARCH_LIMIT = 20
+
+SCHEMA = """
+CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE sources (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL UNIQUE,
+    source_pdf TEXT,
+    extraction_date TEXT,
+    size INTEGER,
+    mtime INTEGER,
+    quizzes INTEGER
+);
+CREATE TABLE quizzes (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    quiz_id INTEGER,
+    position INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    category TEXT,
+    subcategory TEXT,
+    correct_answer TEXT
+);
+CREATE TABLE answers (
+    quiz_rowid INTEGER NOT NULL REFERENCES quizzes(id),
+    position INTEGER NOT NULL,
+    letter TEXT,
+    text TEXT,
+    PRIMARY KEY (quiz_rowid, position)
+) WITHOUT ROWID;
+CREATE INDEX quizzes_category ON quizzes (category, subcategory);
+CREATE INDEX quizzes_subcategory ON quizzes (subcategory);
+CREATE INDEX quizzes_source ON quizzes (source_id, quiz_id);
+CREATE VIRTUAL TABLE quiz_fts USING fts5 (
+    question, answers,
+    content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+_WORD = re.compile(r'\w+')
+
+def file_signature(quiz_file):
+    """(dimensione, data di modifica) di un file dei quiz: se cambia il database va ricostruito"""
+    stat = os.stat(quiz_file)
+    return stat.st_size, int(stat.st_mtime)
+
+def is_up_to_date(db_path, files):
+    """True se il database esiste ed è stato costruito dagli stessi file, non modificati da allora"""
+    if not os.path.exists(db_path):
+        return False
+    try:
+        with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+            version = conn.execute("SELECT value FROM info WHERE key = 'version'").fetchone()
+            built = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT file, size, mtime FROM sources")}
+    except sqlite3.Error:
+        return False
+    if version is None or int(version[0]) != DB_VERSION:
+        return False
+    current = {os.path.basename(f): file_signature(f) for f in files if os.path.exists(f)}
+    return built == current
+
+def build_database(db_path, files):
+    """
+    Importa i file dei quiz in un nuovo database, che sostituisce quello esistente solo a fine costruzione
+
+    Returns:
+        {file: quiz importati}
+    """
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    imported = {}
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.execute("INSERT INTO info VALUES ('version', ?)", (str(DB_VERSION),))
+        conn.execute("INSERT INTO info VALUES ('built', ?)", (datetime.now().isoformat(timespec='seconds'),))
+
+        for quiz_file in files:
+            if not os.path.exists(quiz_file):
+                print(f"⚠️  {quiz_file}: file non trovato, saltato")
+                continue
+            try:
+                with open(quiz_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"❌ Errore nel caricamento di {quiz_file}: {e}")
+                continue
+
+            metadata = data.get("metadata") or {}
+            quizzes = data.get("quizzes") or []
+            size, mtime = file_signature(quiz_file)
+            source_id = conn.execute(
+                "INSERT INTO sources (file, source_pdf, extraction_date, size, mtime, quizzes) VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.basename(quiz_file), metadata.get("sourceFile"), metadata.get("extractionDate"),
+                 size, mtime, len(quizzes))
+            ).lastrowid
+
+            for position, quiz in enumerate(quizzes):
+                answers = quiz.get("answers") or []
+                rowid = conn.execute(
+                    "INSERT INTO quizzes (source_id, quiz_id, position, question, category, subcategory, correct_answer) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (source_id, quiz.get("id"), position, quiz.get("question") or "",
+                     quiz.get("category"), quiz.get("subcategory"), quiz.get("correctAnswer"))
+                ).lastrowid
+                conn.executemany(
+                    "INSERT INTO answers (quiz_rowid, position, letter, text) VALUES (?, ?, ?, ?)",
+                    [(rowid, index, answer.get("letter"), answer.get("text")) for index, answer in enumerate(answers)]
+                )
+                conn.execute(
+                    "INSERT INTO quiz_fts (rowid, question, answers) VALUES (?, ?, ?)",
+                    (rowid, quiz.get("question") or "", "\n".join(answer.get("text") or "" for answer in answers))
+                )
+
+            imported[os.path.basename(quiz_file)] = len(quizzes)
+            print(f"✅ {quiz_file}: {len(quizzes)} quiz")
+
+        conn.commit()
+        conn.execute("INSERT INTO quiz_fts (quiz_fts) VALUES ('optimize')")
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return imported
+
+def fts_query(text):
+    """Query FTS5 da un testo libero: ogni parola (anche come prefisso) deve comparire"""
+    return " ".join(f'"{word}"*' for word in _WORD.findall(text))
+
+class QuizStore:
+    """
+    Interrogazioni sul database dei quiz (in sola lettura)
+
+    I quiz restituiti hanno il formato dei file JSON ("id", "question",
+    "category", "subcategory", "answers", "correctAnswer") più "source", il
+    file da cui provengono.
+    """
+
+    def __init__(self, db_path=DB_FILE):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"database dei quiz non trovato: {db_path} (crealo con build_quiz_db.py)")
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def sources(self):
+        """{file: numero di quiz}"""
+        return dict(self.conn.execute("SELECT file, quizzes FROM sources ORDER BY id"))
+
+    def categories(self, source=None):
+        """Lista di (categoria, sottocategoria, numero di quiz), eventualmente di un solo file"""
+        where, params = self._filters(source=source)
+        return self.conn.execute(
+            f"SELECT category, subcategory, COUNT(*) FROM quizzes q {where} "
+            "GROUP BY category, subcategory ORDER BY category, subcategory", params
+        ).fetchall()
+
+    def random_quizzes(self, count, category=None, subcategory=None, source=None, exclude_ids=()):
+        """
+        count quiz casuali (o meno, se non ce ne sono abbastanza)
+
+        Args:
+            category, subcategory, source: filtri (None = tutti)
+            exclude_ids: quiz già visti, come coppie (file, id del file); con source
+                         bastano gli id del file (gli id si ripetono tra i file)
+        """
+        where, params = self._filters(category, subcategory, source, exclude_ids)
+        rows = self.conn.execute(
+            f"SELECT q.id FROM quizzes q {where} ORDER BY random() LIMIT ?", params + [count]
+        ).fetchall()
+        return self._load([row[0] for row in rows])
+
+    def search(self, text, limit=SEARCH_LIMIT, category=None, subcategory=None, source=None):
+        """Quiz che contengono tutte le parole del testo (domanda o risposte), i più pertinenti per primi"""
+        query = fts_query(text)
+        if not query:
+            return []
+        where, params = self._filters(category, subcategory, source)
+        where = f"{where} AND" if where else "WHERE"
+        rows = self.conn.execute(
+            f"SELECT q.id FROM quiz_fts JOIN quizzes q ON q.id = quiz_fts.rowid "
+            f"{where} quiz_fts MATCH ? ORDER BY bm25(quiz_fts, ?, ?) LIMIT ?",
+            params + [query, *SEARCH_WEIGHTS, limit]
+        ).fetchall()
+        return self._load([row[0] for row in rows])
+
+    def get(self, source, quiz_id):
+        """Quiz con un dato id in un file (None se assente; se l'id si ripete, il primo del file)"""
+        row = self.conn.execute(
+            "SELECT q.id FROM quizzes q JOIN sources s ON s.id = q.source_id "
+            "WHERE s.file = ? AND q.quiz_id = ? ORDER BY q.position LIMIT 1", (source, quiz_id)
+        ).fetchone()
+        return self._load([row[0]])[0] if row else None
+
+    def _filters(self, category=None, subcategory=None, source=None, exclude_ids=()):
+        """Clausola WHERE (sulla tabella quizzes con alias q) e parametri dei filtri comuni"""
+        clauses, params = [], []
+        if category is not None:
+            clauses.append("q.category = ?")
+            params.append(category)
+        if subcategory is not None:
+            clauses.append("q.subcategory = ?")
+            params.append(subcategory)
+        if source is not None:
+            clauses.append("q.source_id = (SELECT id FROM sources WHERE file = ?)")
+            params.append(source)
+        if exclude_ids:
+            clauses.append(
+                "(q.source_id, q.quiz_id) NOT IN (SELECT s.id, json_extract(e.value, '$[1]') "
+                "FROM json_each(?) e JOIN sources s ON s.file = json_extract(e.value, '$[0]'))"
+            )
+            params.append(json.dumps(_exclusion_pairs(exclude_ids, source)))
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _load(self, rowids):
+        """Quiz completi (con le risposte) per una lista di id di riga, nello stesso ordine"""
+        if not rowids:
+            return []
+        placeholders = ",".join("?" * len(rowids))
+        quizzes = {}
+        for rowid, source, quiz_id, question, category, subcategory, correct in self.conn.execute(
+            "SELECT q.id, s.file, q.quiz_id, q.question, q.category, q.subcategory, q.correct_answer "
+            f"FROM quizzes q JOIN sources s ON s.id = q.source_id WHERE q.id IN ({placeholders})", rowids
+        ):
+            quizzes[rowid] = {
+                "id": quiz_id,
+                "question": question,
+                "category": category,
+                "subcategory": subcategory,
+                "answers": [],
+                "correctAnswer": correct,
+                "source": source,
+            }
+        for rowid, letter, text in self.conn.execute(
+            f"SELECT quiz_rowid, letter, text FROM answers WHERE quiz_rowid IN ({placeholders}) "
+            "ORDER BY quiz_rowid, position", rowids
+        ):
+            quizzes[rowid]["answers"].append({"letter": letter, "text": text})
+        return [quizzes[rowid] for rowid in rowids]
+
+def _exclusion_pairs(exclude_ids, source=None):
+    """
+    Coppie [file, id] dei quiz da escludere
+
+    Un id da solo vale solo con source: lo stesso id indica quiz diversi in
+    file diversi, ed escluderlo ovunque nasconderebbe quiz mai visti.
+    """
+    pairs = []
+    for item in exclude_ids:
+        if isinstance(item, (tuple, list)):
+            quiz_file, quiz_id = item
+        elif source is not None:
+            quiz_file, quiz_id = source, item
+        else:
+            raise ValueError(f"id {item} da escludere senza file: indica source o usa coppie (file, id)")
+        pairs.append([quiz_file, int(quiz_id)])
+    return pairs
+
+def parse_exclusions(text):
+    """Elenco di --exclude: "id" (con --source) o "file:id", separati da virgola"""
+    exclusions = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        quiz_file, _, quiz_id = item.rpartition(":")
+        exclusions.append((quiz_file, int(quiz_id)) if quiz_file else int(quiz_id))
+    return exclusions
+
+def _print_quizzes(quizzes):
+    for quiz in quizzes:
+        print(f"   [{quiz['source']} #{quiz['id']}] {quiz['category']}/{quiz['subcategory']}: {quiz['question'][:80]}")
+
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Compila i file dei quiz in un database SQLite con ricerca full-text")
+    parser.add_argument(
+        "files", nargs="*",
+        help="file dei quiz da importare (default: tutti i file dei quiz)"
+    )
+    parser.add_argument(
+        "--output", default=DB_FILE,
+        help=f"database da creare (default: {DB_FILE})"
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="ricostruisci il database anche se i file dei quiz non sono cambiati"
+    )
+    parser.add_argument(
+        "--search", metavar="TESTO",
+        help="cerca i quiz che contengono le parole indicate"
+    )
+    parser.add_argument(
+        "--random", type=int, metavar="N",
+        help="estrai N quiz casuali (con --category, --subcategory, --source, --exclude)"
+    )
+    parser.add_argument("--category", help="filtra per categoria")
+    parser.add_argument("--subcategory", help="filtra per sottocategoria")
+    parser.add_argument("--source", help="filtra per file dei quiz, es. quiz-data.json")
+    parser.add_argument(
+        "--exclude", default="",
+        help='quiz già visti da escludere, separati da virgola: "file:id", oppure solo gli id con --source'
+    )
+    return parser.parse_args()
+
+def main():
+    """Funzione principale"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("  DATABASE DEI QUIZ (SQLite + FTS5)")
+    print("=" * 60)
+    print()
+
+    files = args.files or QUIZ_FILES
+    if not args.force and is_up_to_date(args.output, files):
+        print(f"✅ {args.output} è già aggiornato (usa --force per ricostruirlo)")
+    else:
+        start_time = time.time()
+        try:
+            imported = build_database(args.output, files)
+        except sqlite3.Error as e:
+            print(f"❌ Errore durante la costruzione del database: {e}")
+            sys.exit(1)
+        if not imported:
+            print("❌ Nessun file dei quiz importato")
+            sys.exit(1)
+        print(f"\n📦 Database creato: {args.output} ({sum(imported.values())} quiz da {len(imported)} file, "
+              f"{os.path.getsize(args.output) // 1024}KB, {time.time() - start_time:.2f}s)")
+
+    if args.search is None and args.random is None:
+        return
+
+    with QuizStore(args.output) as store:
+        filters = dict(category=args.category, subcategory=args.subcategory, source=args.source)
+        if args.search is not None:
+            start_time = time.perf_counter()
+            quizzes = store.search(args.search, **filters)
+            elapsed = (time.perf_counter() - start_time) * 1000
+            print(f"\n🔍 Ricerca \"{args.search}\": {len(quizzes)} quiz ({elapsed:.1f}ms)")
+            _print_quizzes(quizzes)
+        if args.random is not None:
+            try:
+                exclude = parse_exclusions(args.exclude)
+            except ValueError:
+                print(f"❌ Elenco di id non valido: {args.exclude}")
+                sys.exit(2)
+            if args.source is None and any(not isinstance(item, tuple) for item in exclude):
+                print("❌ Gli id da escludere senza file valgono solo con --source (oppure usa file:id)")
+                sys.exit(2)
+            start_time = time.perf_counter()
+            quizzes = store.random_quizzes(args.random, exclude_ids=exclude, **filters)
+            elapsed = (time.perf_counter() - start_time) * 1000
+            print(f"\n🎲 {len(quizzes)} quiz casuali ({elapsed:.1f}ms)")
+            _print_quizzes(quizzes)
+
+if __name__ == "__main__":
+    main()
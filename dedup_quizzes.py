@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ricerca dei quiz duplicati (anche quasi identici) tra i file dei quiz con MinHash/LSH
+
+countUniqueQuizzes.js e i compareModello*Quizzes.js confrontano i primi 150
+caratteri normalizzati della domanda: un solo carattere diverso (errore OCR,
+apostrofo, spazio) nasconde il duplicato. Qui ogni quiz diventa l'insieme
+dei suoi shingle di caratteri (domanda + risposte, in qualsiasi ordine):
+    1. firma MinHash di NUM_PERM valori, calcolata per tutti i quiz insieme con NumPy
+    2. LSH a bande: i quiz con almeno una banda identica sono candidati
+    3. ogni candidato è verificato con la similarità di Jaccard esatta degli shingle
+Il numero di confronti cresce con i candidati, non con il quadrato dei quiz.
+
+Uso:
+    python dedup_quizzes.py                               # cluster di duplicati in tutti i file
+    python dedup_quizzes.py --query modello8-quiz-data.json   # nuovo file contro la banca dati
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    print("❌ Errore: NumPy non installato")
+    print("   Installa con: pip install numpy")
+    sys.exit(1)
+
+# File dei quiz in ordine di priorità (il primo del cluster è il quiz canonico)
+QUIZ_FILES = [
+    "quiz-data.json",
+    "new-quiz-data.json",
+    "modello3-quiz-data.json",
+    "modello4-quiz-data.json",
+    "modello5-quiz-data.json",
+    "modello6-quiz-data.json",
+    "modello7-quiz-data.json",
+]
+
+REPORT_FILE = "dedup-report.json"
+
+# Shingle di caratteri: abbastanza lunghi da essere selettivi, abbastanza corti
+# da sopravvivere a un carattere sbagliato dall'OCR
+SHINGLE_SIZE = 5
+
+# Firma MinHash: NUM_PERM = LSH_BANDS * righe per banda. Con 16 bande da 4 righe
+# la probabilità di diventare candidati è ~50% a Jaccard 0.5 e ~99% a 0.7
+NUM_PERM = 64
+LSH_BANDS = 16
+MINHASH_SEED = 42
+
+# Similarità di Jaccard minima (domanda + risposte) per considerare due quiz duplicati
+SIMILARITY_THRESHOLD = 0.7
+
+# Permutazioni calcolate insieme: il buffer (PERM_CHUNK x shingle) resta piccolo e in cache
+PERM_CHUNK = 4
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+# Lettere greche scritte per esteso prima di ridurre il testo ad ASCII: "α1" e "β1"
+# (recettori, subunità, isoforme) devono restare quiz diversi
+GREEK_LETTERS = str.maketrans({
+    'α': 'alfa', 'β': 'beta', 'γ': 'gamma', 'δ': 'delta', 'ε': 'epsilon', 'ζ': 'zeta',
+    'η': 'eta', 'θ': 'theta', 'ι': 'iota', 'κ': 'kappa', 'λ': 'lambda', 'μ': 'mu',
+    'ν': 'nu', 'ξ': 'xi', 'ο': 'omicron', 'π': 'pi', 'ρ': 'rho', 'σ': 'sigma', 'ς': 'sigma',
+    'τ': 'tau', 'υ': 'upsilon', 'φ': 'phi', 'χ': 'chi', 'ψ': 'psi', 'ω': 'omega',
+})
+
+def normalize_text(text):
+    """Minuscolo, senza accenti né punteggiatura, spazi singoli (solo caratteri ASCII,
+    lettere greche per esteso)"""
+    # NFKD separa gli accenti (anche delle lettere greche) e trasforma µ (micro) in μ
+    text = unicodedata.normalize('NFKD', (text or '').lower()).translate(GREEK_LETTERS)
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    return _NON_WORD.sub(' ', text).strip()
+
+def quiz_fields(quiz):
+    """(domanda, risposte) normalizzate; le risposte sono ordinate per testo, così lo stesso
+    quiz con le opzioni mescolate è identico"""
+    answers = sorted(normalize_text(answer.get("text")) for answer in quiz.get("answers") or [])
+    return normalize_text(quiz.get("question")), ' '.join(answers)
+
+def _window_values(data):
+    """Valore di ogni finestra di SHINGLE_SIZE byte (numero in base 257, < 2^41)"""
+    count = len(data) - SHINGLE_SIZE + 1
+    values = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        values = values * np.uint64(257) + data[offset:offset + count]
+    return values
+
+def _pad(text):
+    # I testi più corti di uno shingle diventano un unico shingle
+    return text.ljust(SHINGLE_SIZE)
+
+def shingle_hashes(text):
+    """Hash ordinati e distinti degli shingle di caratteri di un testo normalizzato"""
+    data = np.frombuffer(_pad(text).encode('ascii'), dtype=np.uint8).astype(np.uint64)
+    return np.unique(_window_values(data))
+
+def corpus_shingles(quiz_texts):
+    """
+    Shingle di tutti i quiz in un colpo solo
+
+    I campi di tutti i quiz sono concatenati in un unico buffer separato da
+    '\n' e le finestre vengono calcolate con poche operazioni vettoriali; le
+    finestre a cavallo di un separatore sono scartate.
+
+    Returns:
+        (valori degli shingle, inizio degli shingle di ogni quiz nell'array)
+    """
+    buffer = '\n'.join('\n'.join(_pad(field) for field in fields) for fields in quiz_texts) + '\n'
+    data = np.frombuffer(buffer.encode('ascii'), dtype=np.uint8).astype(np.uint64)
+    separators = np.cumsum(data == ord('\n'))
+    values = _window_values(data)
+
+    # Una finestra è valida se non contiene separatori; il suo quiz è il numero di
+    # separatori che la precedono diviso il numero di campi per quiz
+    crossed = separators[SHINGLE_SIZE - 1:] - np.concatenate([[0], separators[:-SHINGLE_SIZE]])
+    valid = crossed == 0
+    owners = np.concatenate([[0], separators[:-SHINGLE_SIZE]])[valid] // len(quiz_texts[0])
+    starts = np.searchsorted(owners, np.arange(len(quiz_texts)))
+    return values[valid], starts
+
+def jaccard(a, b):
+    """Similarità di Jaccard tra due array ordinati di hash distinti"""
+    if len(a) == 0 or len(b) == 0:
+        return 0.0
+    common = len(np.intersect1d(a, b, assume_unique=True))
+    return common / (len(a) + len(b) - common)
+
+class QuizShingles:
+    """Shingle distinti di un quiz: domanda, risposte e unione dei due"""
+
+    __slots__ = ("question", "answers", "combined")
+
+    def __init__(self, fields):
+        question, answers = fields
+        self.question = shingle_hashes(question)
+        self.answers = shingle_hashes(answers)
+        self.combined = np.union1d(self.question, self.answers)
+
+class MinHasher:
+    """
+    Firme MinHash con NUM_PERM funzioni hash multiply-shift: ((a * x + b) mod 2^64) >> 32
+
+    Il prodotto a 64 bit si riavvolge da solo in NumPy: nessun modulo esplicito.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=MINHASH_SEED):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        # a dispari, come richiesto dallo schema multiply-shift
+        self.a = rng.randint(0, 1 << 62, size=num_perm, dtype=np.int64).astype(np.uint64) * np.uint64(2)
+        self.a += np.uint64(1)
+        self.b = rng.randint(0, 1 << 62, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def signatures(self, values, starts):
+        """
+        Matrice (quiz x NUM_PERM) delle firme
+
+        values contiene gli shingle di tutti i quiz, uno dopo l'altro, e starts
+        l'inizio di ciascun quiz: ogni permutazione è un'operazione vettoriale e
+        np.minimum.reduceat calcola il minimo per quiz.
+        """
+        signatures = np.empty((len(starts), self.num_perm), dtype=np.uint32)
+        # Un solo buffer riusato con operazioni in-place: nessuna matrice temporanea per passaggio
+        permuted = np.empty((PERM_CHUNK, len(values)), dtype=np.uint64)
+        for chunk in range(0, self.num_perm, PERM_CHUNK):
+            np.multiply(self.a[chunk:chunk + PERM_CHUNK, None], values[None, :], out=permuted)
+            permuted += self.b[chunk:chunk + PERM_CHUNK, None]
+            permuted >>= np.uint64(32)
+            signatures[:, chunk:chunk + PERM_CHUNK] = np.minimum.reduceat(permuted, starts, axis=1).T
+        return signatures
+
+def lsh_candidates(signatures, bands=LSH_BANDS, query_start=None):
+    """
+    Coppie candidate (i, j) con i < j che condividono almeno una banda della firma
+
+    Con query_start vengono restituite solo le coppie con almeno un quiz
+    di indice >= query_start (i quiz da confrontare con la banca dati).
+    """
+    count, num_perm = signatures.shape
+    rows = num_perm // bands
+    candidates = set()
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        # Ogni banda come un'unica chiave di byte: np.unique raggruppa i quiz per bucket
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+        _, bucket, sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        bucket = bucket.ravel()
+        shared = np.flatnonzero(sizes[bucket] > 1)
+        if len(shared) == 0:
+            continue
+
+        order = shared[np.argsort(bucket[shared], kind='stable')]
+        groups = np.split(order, np.flatnonzero(np.diff(bucket[order])) + 1)
+        for group in groups:
+            members = group.tolist()
+            if query_start is not None and members[-1] < query_start:
+                continue
+            for x, i in enumerate(members):
+                for j in members[x + 1:]:
+                    if query_start is None or j >= query_start:
+                        candidates.add((i, j))
+    return candidates
+
+def load_quizzes(files):
+    """Quiz di tutti i file, nell'ordine dato: lista di (file, quiz)"""
+    entries = []
+    for quiz_file in files:
+        if not os.path.exists(quiz_file):
+            print(f"⚠️  {quiz_file}: file non trovato, saltato")
+            continue
+        try:
+            with open(quiz_file, 'r', encoding='utf-8') as f:
+                quizzes = json.load(f).get("quizzes") or []
+        except (OSError, ValueError) as e:
+            print(f"❌ Errore nel caricamento di {quiz_file}: {e}")
+            continue
+        entries.extend((os.path.basename(quiz_file), quiz) for quiz in quizzes)
+        print(f"✅ {quiz_file}: {len(quizzes)} quiz")
+    return entries
+
+def correct_answer_text(quiz):
+    """Testo normalizzato della risposta corretta (None se non indicata)"""
+    for answer in quiz.get("answers") or []:
+        if answer.get("letter") == quiz.get("correctAnswer"):
+            return normalize_text(answer.get("text"))
+    return None
+
+class QuizCorpus:
+    """Quiz da confrontare, con gli shingle distinti calcolati solo quando servono"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.fields = [quiz_fields(quiz) for _, quiz in entries]
+        self._shingles = {}
+
+    def shingles(self, index):
+        if index not in self._shingles:
+            self._shingles[index] = QuizShingles(self.fields[index])
+        return self._shingles[index]
+
+    def similarity(self, first, second):
+        """Similarità di Jaccard di domanda + risposte"""
+        return jaccard(self.shingles(first).combined, self.shingles(second).combined)
+
+    def compare(self, first, second):
+        """Similarità tra due quiz: (complessiva, domanda, risposte)"""
+        a, b = self.shingles(first), self.shingles(second)
+        return jaccard(a.combined, b.combined), jaccard(a.question, b.question), jaccard(a.answers, b.answers)
+
+def find_duplicate_pairs(corpus, threshold=SIMILARITY_THRESHOLD, query_start=None):
+    """
+    Coppie di quiz duplicati verificate
+
+    Returns:
+        (lista di (i, j, similarità), statistiche: candidati e tempi per fase in secondi)
+    """
+    timings = {}
+    start_time = time.time()
+    values, starts = corpus_shingles(corpus.fields)
+    timings["shingles"] = time.time() - start_time
+
+    start_time = time.time()
+    signatures = MinHasher().signatures(values, starts)
+    timings["minhash"] = time.time() - start_time
+
+    start_time = time.time()
+    candidates = lsh_candidates(signatures, query_start=query_start)
+    timings["lsh"] = time.time() - start_time
+
+    start_time = time.time()
+    pairs = []
+    for i, j in sorted(candidates):
+        similarity = corpus.similarity(i, j)
+        if similarity >= threshold:
+            pairs.append((i, j, similarity))
+    timings["verify"] = time.time() - start_time
+    timings["candidates"] = len(candidates)
+    return pairs, timings
+
+def build_clusters(count, pairs):
+    """Cluster (componenti connesse) delle coppie duplicate: liste di indici ordinate"""
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, _ in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            # La radice è sempre l'indice minore: il quiz del file con priorità più alta
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters = {}
+    for i in range(count):
+        clusters.setdefault(find(i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+def _quiz_ref(entries, index):
+    source, quiz = entries[index]
+    return {"file": source, "id": quiz.get("id"), "question": (quiz.get("question") or "")[:150]}
+
+def dedup_report(corpus, pairs):
+    """
+    Report dei cluster: quiz canonico e duplicati con le similarità
+
+    Ogni duplicato ha un'azione: "merge" se può essere unito al quiz canonico,
+    "review" se la risposta corretta è diversa (spesso varianti della stessa
+    domanda, es. pKa = 6 / pKa = 7) e va controllato a mano.
+    """
+    entries = corpus.entries
+    clusters = []
+    merged = set()
+    reviewed = set()
+    for members in build_clusters(len(entries), pairs):
+        canonical = members[0]
+        canonical_answer = correct_answer_text(entries[canonical][1])
+        duplicates = []
+        for member in members[1:]:
+            similarity, question_similarity, answers_similarity = corpus.compare(canonical, member)
+            member_answer = correct_answer_text(entries[member][1])
+            # None se uno dei due quiz non ha la risposta corretta
+            same_answer = None
+            if canonical_answer is not None and member_answer is not None:
+                same_answer = canonical_answer == member_answer
+            action = "review" if same_answer is False else "merge"
+            (reviewed if action == "review" else merged).add(member)
+            duplicates.append({
+                **_quiz_ref(entries, member),
+                "similarity": round(similarity, 3),
+                "question_similarity": round(question_similarity, 3),
+                "answers_similarity": round(answers_similarity, 3),
+                "same_correct_answer": same_answer,
+                "action": action,
+            })
+        clusters.append({"canonical": _quiz_ref(entries, canonical), "duplicates": duplicates})
+
+    files = {}
+    for index, (source, _) in enumerate(entries):
+        stats = files.setdefault(source, {"total": 0, "unique": 0, "duplicates": 0, "review": 0})
+        stats["total"] += 1
+        if index in merged:
+            stats["duplicates"] += 1
+        else:
+            stats["unique"] += 1
+            if index in reviewed:
+                stats["review"] += 1
+
+    return {
+        "totalQuizzes": len(entries),
+        "uniqueQuizzes": len(entries) - len(merged),
+        "duplicates": len(merged),
+        "review": len(reviewed),
+        "files": files,
+        "clusters": clusters,
+    }
+
+def query_report(corpus, pairs, query_start):
+    """Report di un nuovo file contro la banca dati (come comparison-modello*-report.json)"""
+    entries = corpus.entries
+    matches = {}
+    for i, j, similarity in pairs:
+        # Nelle coppie j è sempre un quiz del nuovo file; i può essere della banca dati o del nuovo file
+        if i < query_start:
+            matches.setdefault(j, []).append((similarity, i))
+
+    duplicates = []
+    unique = []
+    for index in range(query_start, len(entries)):
+        quiz = entries[index][1]
+        if index not in matches:
+            unique.append({key: quiz.get(key) for key in ("id", "question", "category", "subcategory", "answers")})
+            continue
+
+        existing = []
+        for similarity, match in sorted(matches[index], key=lambda item: (-item[0], item[1])):
+            _, question_similarity, answers_similarity = corpus.compare(match, index)
+            existing.append({
+                **_quiz_ref(entries, match),
+                "similarity": round(similarity, 3),
+                "question_similarity": round(question_similarity, 3),
+                "answers_similarity": round(answers_similarity, 3),
+            })
+        duplicates.append({"id": quiz.get("id"), "question": (quiz.get("question") or "")[:150], "existingMatches": existing})
+
+    return {
+        "source": entries[query_start][0] if query_start < len(entries) else None,
+        "totalQuestions": len(entries) - query_start,
+        "totalExistingQuestions": query_start,
+        "duplicates": duplicates,
+        "unique": unique,
+    }
+
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Trova i quiz duplicati o quasi identici con MinHash/LSH")
+    parser.add_argument(
+        "files", nargs="*",
+        help="file dei quiz in ordine di priorità (default: tutti i file dei quiz)"
+    )
+    parser.add_argument(
+        "--query", metavar="FILE",
+        help="confronta solo i quiz di questo file con la banca dati"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=SIMILARITY_THRESHOLD,
+        help=f"similarità minima 0-1 per considerare due quiz duplicati (default: {SIMILARITY_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--output", default=REPORT_FILE,
+        help=f"file del report JSON (default: {REPORT_FILE})"
+    )
+    return parser.parse_args()
+
+def main():
+    """Funzione principale"""
+    args = parse_args()
+
+    print("=" * 60)
+    print("  RICERCA QUIZ DUPLICATI (MinHash/LSH)")
+    print("=" * 60)
+    print()
+
+    files = args.files or QUIZ_FILES
+    query_start = None
+    if args.query:
+        files = [f for f in files if os.path.basename(f) != os.path.basename(args.query)]
+    entries = load_quizzes(files)
+    if args.query:
+        query_start = len(entries)
+        entries += load_quizzes([args.query])
+        if len(entries) == query_start:
+            print(f"❌ Nessun quiz da confrontare in {args.query}")
+            sys.exit(1)
+
+    start_time = time.time()
+    corpus = QuizCorpus(entries)
+    pairs, timings = find_duplicate_pairs(corpus, args.threshold, query_start)
+    elapsed = time.time() - start_time
+
+    if query_start is None:
+        report = dedup_report(corpus, pairs)
+    else:
+        report = query_report(corpus, pairs, query_start)
+    report["settings"] = {
+        "shingle_size": SHINGLE_SIZE,
+        "num_perm": NUM_PERM,
+        "lsh_bands": LSH_BANDS,
+        "threshold": args.threshold,
+    }
+    report["generated"] = datetime.now().isoformat()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print("\n📊 RISULTATI:")
+    print("=" * 60)
+    print(f"Quiz analizzati: {len(entries)}")
+    print(f"Coppie candidate (LSH): {timings['candidates']}, duplicati verificati: {len(pairs)}")
+    if query_start is None:
+        print(f"Quiz unici: {report['uniqueQuizzes']}, cluster di duplicati: {len(report['clusters'])}")
+        for source, stats in report["files"].items():
+            print(f"   {source}: {stats['total']} totali, {stats['unique']} unici, {stats['duplicates']} duplicati")
+        if report["review"]:
+            print(f"⚠️  {report['review']} quiz quasi identici con risposta corretta diversa: da verificare (\"action\": \"review\")")
+    else:
+        print(f"Domande in {args.query}: {report['totalQuestions']}")
+        print(f"Duplicati trovati: {len(report['duplicates'])}")
+        print(f"Domande uniche (nuove): {len(report['unique'])}")
+    print(f"Tempo: {elapsed:.2f}s (normalizzazione {elapsed - sum(v for k, v in timings.items() if k != 'candidates'):.2f}s, shingle {timings['shingles']:.2f}s, MinHash {timings['minhash']:.2f}s, "
+          f"LSH {timings['lsh']:.2f}s, verifica {timings['verify']:.2f}s)")
+    print("=" * 60)
+    print(f"\n📄 Report salvato in: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -400,7 +400,7 @@ function extractQuestionsFromText() {
     
     const text = fs.readFileSync(textPath, 'utf8');
     // Rimuovi i separatori di pagina
-    const cleanedText = text.replace(/=== PAGINA \d+ ===/g, '');
+    const cleanedText = text.replace(/=== PAGINA \d+(?: \[\w+\])? ===/g, '');
     const lines = cleanedText.split(/\r?\n/).map(line => line.trim()).filter(line => line.length > 0);
     
     console.log(`📝 Totale righe estratte: ${lines.length}`);
@@ -6,127 +6,677 @@ Usa PyMuPDF (fitz) per estrarre tutte le immagini incorporate nel PDF
 """
 
 import fitz  # PyMuPDF
+import argparse
+import hashlib
 import os
 import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+from image_bundle import build_bundle, bundle_path_for
+from image_variants import generate_variants, print_variants_summary
+from ocr_events import RunEvents, add_events_arguments, events_from_args
+
 # Configurazione
 PDF_PATH = "Banca dati unisa farmacia ospedaliera.pdf"
 OUTPUT_DIR = "quiz-images"
 METADATA_FILE = "images-metadata.json"
 
-def extract_images_from_pdf(pdf_path, output_dir, max_pages=None):
+# Pagine per blocco nella modalità parallela (ogni worker estrae un blocco alla volta)
+SHARD_PAGES = 50
+
+# Secondi per fase registrati per ogni pagina (misure degli eventi di pagina)
+PAGE_STAGES = ("decode_seconds", "hash_seconds", "write_seconds", "vector_seconds")
+
+# Scritture in attesa nel writer in background (limita la memoria usata dalle immagini in coda)
+WRITER_QUEUE_SIZE = 32
+
+# Modalità --vector: le figure disegnate con tracciati vettoriali (es. formule di
+# struttura) non sono immagini incorporate; le loro regioni vengono renderizzate a questo DPI
+VECTOR_DPI = 300
+# Tracciati a meno di VECTOR_GAP punti l'uno dall'altro appartengono alla stessa figura
+VECTOR_GAP = 8
+# Una figura ha almeno VECTOR_MIN_PATHS tracciati e un lato di almeno VECTOR_MIN_SIZE
+# punti: sottolineature e riquadri isolati vengono ignorati
+VECTOR_MIN_PATHS = 3
+VECTOR_MIN_SIZE = 24
+# Tracciati più larghi o alti di questa frazione della pagina (bordi, righe, sfondi) ignorati
+VECTOR_MAX_FRACTION = 0.6
+# Le parole brevi (etichette degli atomi: OH, NH2, COOH...) vicine ai tracciati fanno parte della figura
+VECTOR_LABEL_CHARS = 5
+# Margine (punti) attorno alla figura renderizzata
+VECTOR_PADDING = 6
+
+class BackgroundWriter:
+    """
+    Scrive i file su disco in un thread separato
+    
+    La coda è limitata (WRITER_QUEUE_SIZE): se il disco è più lento della
+    decodifica, write() si blocca invece di accumulare immagini in memoria.
+    """
+    
+    def __init__(self, max_queue=WRITER_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, data = item
+            try:
+                with open(path, "wb") as img_file:
+                    img_file.write(data)
+            except Exception as e:
+                # Qualsiasi errore (anche un percorso non valido) viene conservato e il thread
+                # continua a svuotare la coda: write() e close() non restano mai bloccati
+                if self._error is None:
+                    self._error = e
+    
+    def write(self, path, data):
+        """Accoda la scrittura di un file"""
+        if self._error is not None:
+            raise self._error
+        self._queue.put((path, data))
+    
+    def close(self):
+        """Attende la fine delle scritture in coda (solleva il primo errore di scrittura)"""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+def _is_figure_path(drawing, page_rect):
+    """True se un tracciato di get_drawings() può far parte di una figura (non bordo, riga o sfondo)"""
+    rect = drawing["rect"]
+    if rect.width > page_rect.width * VECTOR_MAX_FRACTION or rect.height > page_rect.height * VECTOR_MAX_FRACTION:
+        return False
+    # Riempimenti bianchi senza contorno: sfondi e coperture, non visibili
+    return drawing.get("color") is not None or drawing.get("fill") not in (None, (1.0, 1.0, 1.0))
+
+def cluster_regions(rects, gap=VECTOR_GAP):
+    """
+    Raggruppa i riquadri (x0, y0, x1, y1) dei tracciati: due riquadri a meno di gap punti
+    finiscono nella stessa regione, che si allarga e può assorbirne altri
+    
+    Returns:
+        lista di [x0, y0, x1, y1, numero di tracciati]
+    """
+    regions = []
+    for x0, y0, x1, y1 in rects:
+        region = [x0, y0, x1, y1, 1]
+        merged = True
+        while merged:
+            merged = False
+            for other in regions:
+                if (other[0] - gap <= region[2] and region[0] - gap <= other[2]
+                        and other[1] - gap <= region[3] and region[1] - gap <= other[3]):
+                    regions.remove(other)
+                    region = [
+                        min(region[0], other[0]), min(region[1], other[1]),
+                        max(region[2], other[2]), max(region[3], other[3]),
+                        region[4] + other[4]
+                    ]
+                    merged = True
+                    break
+        regions.append(region)
+    return regions
+
+def vector_regions(page):
+    """
+    Riquadri (in punti, con margine, dall'alto verso il basso) delle figure vettoriali di una pagina
+    
+    Legge solo i tracciati e, se ci sono figure, le parole della pagina: nessun rendering.
+    Le etichette degli atomi sono testo e non tracciati: le parole brevi a meno di
+    VECTOR_GAP punti da una figura allargano il suo riquadro.
+    """
+    page_rect = page.rect
+    rects = [tuple(drawing["rect"]) for drawing in page.get_drawings() if _is_figure_path(drawing, page_rect)]
+    figures = [
+        region for region in cluster_regions(rects)
+        if region[4] >= VECTOR_MIN_PATHS and max(region[2] - region[0], region[3] - region[1]) >= VECTOR_MIN_SIZE
+    ]
+    if not figures:
+        return []
+    
+    labels = [word[:4] for word in page.get_text("words") if len(word[4]) <= VECTOR_LABEL_CHARS]
+    regions = []
+    for x0, y0, x1, y1, _ in figures:
+        for lx0, ly0, lx1, ly1 in labels:
+            if lx0 - VECTOR_GAP <= x1 and x0 - VECTOR_GAP <= lx1 and ly0 - VECTOR_GAP <= y1 and y0 - VECTOR_GAP <= ly1:
+                x0, y0, x1, y1 = min(x0, lx0), min(y0, ly0), max(x1, lx1), max(y1, ly1)
+        clip = fitz.Rect(x0, y0, x1, y1) + (-VECTOR_PADDING, -VECTOR_PADDING, VECTOR_PADDING, VECTOR_PADDING)
+        regions.append(clip & page_rect)
+    return sorted(regions, key=lambda rect: (rect.y0, rect.x0))
+
+def extract_page_range(pdf_path, output_dir, first_page, last_page, verbose=True, on_page=None, vector_dpi=None):
+    """
+    Estrae le immagini di un intervallo di pagine (1-based, estremi inclusi)
+    
+    Ogni immagine distinta dell'intervallo viene estratta e salvata una sola
+    volta: xref già visto -> nessuna decodifica; stessi byte (hash) -> nessuna
+    scrittura. Le scritture passano da un BackgroundWriter, così decodifica e
+    I/O su disco si sovrappongono.
+    
+    Con vector_dpi anche le figure vettoriali della pagina (vedi vector_regions)
+    vengono salvate in PNG, renderizzando solo il loro riquadro: nel metadata
+    hanno "kind": "vector", il riquadro in punti PDF ("bbox") e xref null.
+    
+    on_page, se indicata, viene chiamata a fine pagina con (numero_pagina,
+    misure, errore): secondi, immagini, file scritti, byte scritti, pixel
+    decodificati e secondi per fase (PAGE_STAGES: estrazione, hash, attesa
+    della coda di scrittura, rendering delle figure vettoriali), per gli
+    eventi di avanzamento (vedi ocr_events.py).
+    
+    Returns:
+        lista delle occorrenze (una per immagine di ogni pagina), in ordine di pagina
+    """
+    xref_cache = {}   # xref -> dati dell'immagine canonica
+    hash_cache = {}   # sha256 -> dati dell'immagine canonica
+    occurrences = []
+    
+    writer = BackgroundWriter()
+    try:
+        with fitz.open(pdf_path) as pdf_document:
+            for page_num in range(first_page, last_page + 1):
+                page_start = time.perf_counter()
+                page = pdf_document[page_num - 1]
+                image_list = page.get_images(full=True)
+                page_stats = {"images": len(image_list), "written": 0, "bytes_written": 0, "pixels": 0}
+                stage_seconds = dict.fromkeys(PAGE_STAGES, 0.0)
+                page_error = None
+                
+                if image_list and verbose:
+                    print(f"📄 Pagina {page_num}: {len(image_list)} immagini trovate")
+                
+                # Estrai ogni immagine dalla pagina
+                for img_index, img in enumerate(image_list):
+                    try:
+                        xref = img[0]  # XREF dell'immagine
+                        
+                        canonical = xref_cache.get(xref)
+                        if canonical is None:
+                            # Estrai l'immagine
+                            stage_start = time.perf_counter()
+                            base_image = pdf_document.extract_image(xref)
+                            image_bytes = base_image["image"]
+                            hash_start = time.perf_counter()
+                            digest = hashlib.sha256(image_bytes).hexdigest()
+                            stage_seconds["decode_seconds"] += hash_start - stage_start
+                            stage_seconds["hash_seconds"] += time.perf_counter() - hash_start
+                            
+                            canonical = hash_cache.get(digest)
+                            if canonical is None:
+                                # Nome file (della prima pagina in cui compare l'immagine)
+                                image_filename = f"page_{page_num:04d}_img_{img_index + 1:02d}.{base_image['ext']}"
+                                stage_start = time.perf_counter()
+                                writer.write(os.path.join(output_dir, image_filename), image_bytes)
+                                stage_seconds["write_seconds"] += time.perf_counter() - stage_start
+                                
+                                canonical = {
+                                    "filename": image_filename,
+                                    "page": page_num,
+                                    "width": base_image["width"],
+                                    "height": base_image["height"],
+                                    "colorspace": base_image["colorspace"],
+                                    "bpc": base_image["bpc"],  # bits per component
+                                    "size_bytes": len(image_bytes),
+                                    "sha256": digest,
+                                }
+                                hash_cache[digest] = canonical
+                                duplicate = False
+                                page_stats["written"] += 1
+                                page_stats["bytes_written"] += len(image_bytes)
+                                page_stats["pixels"] += base_image["width"] * base_image["height"]
+                            else:
+                                duplicate = True
+                            xref_cache[xref] = canonical
+                        else:
+                            duplicate = True
+                        
+                        # Metadata: ogni occorrenza punta al file canonico
+                        occurrences.append({
+                            "filename": canonical["filename"],
+                            "page": page_num,
+                            "image_index": img_index + 1,
+                            "width": canonical["width"],
+                            "height": canonical["height"],
+                            "colorspace": canonical["colorspace"],
+                            "bpc": canonical["bpc"],
+                            "xref": xref,
+                            "size_bytes": canonical["size_bytes"],
+                            "sha256": canonical["sha256"],
+                            "duplicate": duplicate,
+                            "canonical_page": canonical["page"]
+                        })
+                        
+                        if verbose:
+                            if duplicate:
+                                print(f"  ↺ Duplicato di: {canonical['filename']}")
+                            else:
+                                print(f"  ✓ Salvata: {canonical['filename']} ({canonical['width']}x{canonical['height']}px, {canonical['size_bytes']//1024}KB)")
+                        
+                    except Exception as e:
+                        print(f"  ✗ Errore immagine {img_index + 1} (pagina {page_num}): {str(e)}")
+                        if page_error is None:
+                            page_error = f"immagine {img_index + 1}: {e}"
+                
+                if vector_dpi:
+                    try:
+                        regions = vector_regions(page)
+                    except Exception as e:
+                        print(f"  ✗ Errore figure vettoriali (pagina {page_num}): {str(e)}")
+                        regions = []
+                        if page_error is None:
+                            page_error = f"figure vettoriali: {e}"
+                    page_stats["vector_regions"] = len(regions)
+                    if regions and verbose:
+                        print(f"📐 Pagina {page_num}: {len(regions)} figure vettoriali trovate")
+                    
+                    for region_index, clip in enumerate(regions):
+                        # Numerate dopo le immagini incorporate della pagina
+                        image_index = len(image_list) + region_index + 1
+                        try:
+                            stage_start = time.perf_counter()
+                            pix = page.get_pixmap(dpi=vector_dpi, clip=clip)
+                            image_bytes = pix.tobytes("png")
+                            hash_start = time.perf_counter()
+                            digest = hashlib.sha256(image_bytes).hexdigest()
+                            stage_seconds["vector_seconds"] += hash_start - stage_start
+                            stage_seconds["hash_seconds"] += time.perf_counter() - hash_start
+                            
+                            canonical = hash_cache.get(digest)
+                            duplicate = canonical is not None
+                            if not duplicate:
+                                image_filename = f"page_{page_num:04d}_vec_{region_index + 1:02d}.png"
+                                stage_start = time.perf_counter()
+                                writer.write(os.path.join(output_dir, image_filename), image_bytes)
+                                stage_seconds["write_seconds"] += time.perf_counter() - stage_start
+                                canonical = {
+                                    "filename": image_filename,
+                                    "page": page_num,
+                                    "width": pix.width,
+                                    "height": pix.height,
+                                    "colorspace": pix.colorspace.name,
+                                    "bpc": 8,
+                                    "size_bytes": len(image_bytes),
+                                    "sha256": digest,
+                                }
+                                hash_cache[digest] = canonical
+                                page_stats["written"] += 1
+                                page_stats["bytes_written"] += len(image_bytes)
+                                page_stats["pixels"] += pix.width * pix.height
+                            
+                            occurrences.append({
+                                "filename": canonical["filename"],
+                                "page": page_num,
+                                "image_index": image_index,
+                                "width": canonical["width"],
+                                "height": canonical["height"],
+                                "colorspace": canonical["colorspace"],
+                                "bpc": canonical["bpc"],
+                                "xref": None,
+                                "size_bytes": canonical["size_bytes"],
+                                "sha256": canonical["sha256"],
+                                "duplicate": duplicate,
+                                "canonical_page": canonical["page"],
+                                "kind": "vector",
+                                "bbox": [round(value, 2) for value in clip],
+                            })
+                            
+                            if verbose:
+                                if duplicate:
+                                    print(f"  ↺ Duplicato di: {canonical['filename']}")
+                                else:
+                                    print(f"  ✓ Renderizzata: {canonical['filename']} ({canonical['width']}x{canonical['height']}px, {canonical['size_bytes']//1024}KB)")
+                        
+                        except Exception as e:
+                            print(f"  ✗ Errore figura vettoriale {region_index + 1} (pagina {page_num}): {str(e)}")
+                            if page_error is None:
+                                page_error = f"figura vettoriale {region_index + 1}: {e}"
+                
+                if on_page is not None:
+                    page_stats["seconds"] = round(time.perf_counter() - page_start, 4)
+                    for stage, seconds in stage_seconds.items():
+                        if stage != "vector_seconds" or vector_dpi:
+                            page_stats[stage] = round(seconds, 4)
+                    on_page(page_num, page_stats, page_error)
+    finally:
+        writer.close()
+    
+    return occurrences
+
+def _extract_shard(task):
     """
-    Estrae tutte le immagini dal PDF
+    Eseguita nei worker: ogni processo apre il proprio documento fitz ed estrae un intervallo di pagine
+    
+    Le misure per pagina tornano con le occorrenze e diventano eventi nel processo principale.
+    """
+    pdf_path, output_dir, first_page, last_page, vector_dpi = task
+    page_stats = []
+    occurrences = extract_page_range(
+        pdf_path, output_dir, first_page, last_page, verbose=False,
+        on_page=lambda *page: page_stats.append(page), vector_dpi=vector_dpi
+    )
+    return first_page, last_page, occurrences, page_stats
+
+def merge_shards(shards, output_dir, known=None):
+    """
+    Unisce le occorrenze dei blocchi di pagine in un unico elenco deterministico
+    
+    Ogni blocco deduplica solo al proprio interno: un'immagine presente in più
+    blocchi è stata salvata una volta per blocco. Il file canonico diventa
+    quello della pagina più bassa (lo stesso dell'estrazione sequenziale) e le
+    copie salvate dagli altri blocchi vengono eliminate.
+    
+    Args:
+        shards: liste di occorrenze, nell'ordine delle pagine
+        output_dir: directory di output delle immagini
+        known: sha256 -> {"filename", "page"} dei file canonici già estratti
+               in un'esecuzione precedente (hanno la precedenza)
+    """
+    canonical_by_hash = dict(known or {})
+    merged = []
+    for occurrences in shards:
+        for occurrence in occurrences:
+            canonical = canonical_by_hash.setdefault(occurrence["sha256"], occurrence)
+            if canonical is occurrence:
+                merged.append(occurrence)
+                continue
+            
+            if not occurrence["duplicate"]:
+                # Copia salvata da un altro blocco: il file canonico è già su disco
+                redundant_path = os.path.join(output_dir, occurrence["filename"])
+                if os.path.exists(redundant_path):
+                    os.remove(redundant_path)
+            
+            merged.append(dict(
+                occurrence,
+                filename=canonical["filename"],
+                duplicate=True,
+                canonical_page=canonical["page"]
+            ))
+    return merged
+
+def parse_page_ranges(spec, total_pages):
+    """
+    Converte un elenco di intervalli ("1-100,200,1400-") in una lista ordinata di pagine
+    
+    Raises:
+        ValueError: se l'elenco non è valido o esce dalle pagine del PDF
+    """
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            first = int(start) if start.strip() else 1
+            last = int(end) if end.strip() else total_pages
+        else:
+            first = last = int(part)
+        if first < 1 or last > total_pages or first > last:
+            raise ValueError(f"intervallo di pagine non valido: {part} (il PDF ha {total_pages} pagine)")
+        pages.update(range(first, last + 1))
+    return sorted(pages)
+
+def format_page_ranges(pages):
+    """Forma compatta di un insieme di pagine, es. [1, 2, 3, 7] -> 1-3,7"""
+    parts = []
+    for first, last in _page_runs(pages, max_length=None):
+        parts.append(str(first) if first == last else f"{first}-{last}")
+    return ",".join(parts)
+
+def _page_runs(pages, max_length=SHARD_PAGES):
+    """Raggruppa pagine ordinate in intervalli contigui (first, last) di al massimo max_length pagine"""
+    runs = []
+    for page in sorted(pages):
+        if runs and page == runs[-1][1] + 1 and (max_length is None or page - runs[-1][0] < max_length):
+            runs[-1][1] = page
+        else:
+            runs.append([page, page])
+    return [tuple(run) for run in runs]
+
+def load_manifest(output_dir):
+    """Legge images-metadata.json di un'estrazione precedente (None se assente o illeggibile)"""
+    metadata_path = os.path.join(output_dir, METADATA_FILE)
+    try:
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest.get("images"), list) else None
+
+def validate_manifest(pdf_document, manifest, output_dir):
+    """
+    Pagine del manifest ancora valide: stessi xref delle immagini e file su disco della dimensione attesa
+    
+    Una pagina non valida viene estratta di nuovo; poiché la nuova estrazione
+    può riscrivere i suoi file, diventano non valide anche le pagine le cui
+    immagini puntano a quei file.
+    
+    Returns:
+        (pagine valide, occorrenze delle pagine valide)
+    """
+    entries_by_page = {}
+    for image in manifest["images"]:
+        entries_by_page.setdefault(image["page"], []).append(image)
+    
+    if manifest.get("pages"):
+        done = set(parse_page_ranges(manifest["pages"], max(pdf_document.page_count, 1)))
+    else:
+        # Manifest di versioni precedenti: sono note solo le pagine con immagini
+        done = {page for page in entries_by_page if page <= pdf_document.page_count}
+    
+    stale = set()
+    for page in done:
+        entries = sorted(entries_by_page.get(page, []), key=lambda image: image["image_index"])
+        xrefs = [img[0] for img in pdf_document[page - 1].get_images(full=True)]
+        if xrefs != [image["xref"] for image in entries if image.get("kind") != "vector"]:
+            stale.add(page)
+            continue
+        for image in entries:
+            image_path = os.path.join(output_dir, image["filename"])
+            if not os.path.exists(image_path) or os.path.getsize(image_path) != image["size_bytes"]:
+                stale.add(page)
+                break
+    
+    while True:
+        stale_files = {
+            image["filename"]
+            for page in stale
+            for image in entries_by_page.get(page, [])
+            if not image["duplicate"]
+        }
+        newly_stale = {
+            page for page in done - stale
+            if any(image["filename"] in stale_files for image in entries_by_page.get(page, []))
+        }
+        if not newly_stale:
+            break
+        stale |= newly_stale
+    
+    valid = done - stale
+    kept = [image for page in sorted(valid) for image in entries_by_page.get(page, [])]
+    return valid, kept
+
+def save_manifest(output_dir, images, pages, vector_dpi=None):
+    """Scrive images-metadata.json in modo atomico (file temporaneo + rename)"""
+    metadata_path = os.path.join(output_dir, METADATA_FILE)
+    tmp_path = metadata_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "total_images": len(images),
+            "unique_images": sum(1 for image in images if not image["duplicate"]),
+            "total_pages_processed": len(pages),
+            "pages": format_page_ranges(pages),
+            "vector_dpi": vector_dpi,
+            "extraction_date": datetime.now().isoformat(timespec='seconds'),
+            "images": images
+        }, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, metadata_path)
+    return metadata_path
+
+def extract_images_from_pdf(pdf_path, output_dir, max_pages=None, workers=1, pages=None, force=False, events=None, verbose=True, vector_dpi=None, shard_pages=SHARD_PAGES):
+    """
+    Estrae le immagini dal PDF, saltando le pagine già estratte
+    
+    Le pagine registrate in images-metadata.json (con gli stessi xref e i
+    file su disco della dimensione attesa) non vengono estratte di nuovo: i
+    risultati nuovi si aggiungono a quelli esistenti.
     
     Args:
         pdf_path: percorso del file PDF
         output_dir: directory di output per le immagini
         max_pages: numero massimo di pagine da processare (None = tutte)
+        workers: processi in parallelo, ognuno su un blocco di shard_pages pagine (default: 1)
+        pages: elenco di pagine da processare (1-based, ha la precedenza su max_pages)
+        force: ignora il manifest esistente ed estrai di nuovo tutte le pagine richieste
+        events: RunEvents che riceve un evento per ogni pagina processata (vedi ocr_events.py)
+        verbose: stampa le immagini trovate e salvate pagina per pagina
+        vector_dpi: salva anche le figure vettoriali, renderizzate a questo DPI
+                    (None = solo le immagini incorporate)
+        shard_pages: pagine per blocco nella modalità parallela (default: SHARD_PAGES)
     """
+    if events is None:
+        events = RunEvents('images')
     
     # Crea la directory di output se non esiste
-    Path(output_dir).mkdir(exist_ok=True)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
     
     # Apri il PDF
     print(f"📖 Apertura PDF: {pdf_path}")
-    pdf_document = fitz.open(pdf_path)
-    total_pages = pdf_document.page_count
+    with fitz.open(pdf_path) as pdf_document:
+        total_pages = pdf_document.page_count
+        
+        if pages is None:
+            pages = list(range(1, min(max_pages or total_pages, total_pages) + 1))
+        
+        manifest = None if force else load_manifest(output_dir)
+        if manifest is not None and manifest.get("vector_dpi") != vector_dpi:
+            # Le pagine già estratte non hanno le figure vettoriali richieste (o ne hanno di troppo)
+            print("⚠️  Estrazione precedente con un'altra impostazione --vector: le pagine richieste vengono estratte di nuovo")
+            manifest = None
+        if manifest is not None:
+            done_pages, kept_images = validate_manifest(pdf_document, manifest, output_dir)
+        else:
+            done_pages, kept_images = set(), []
     
-    if max_pages:
-        pages_to_process = min(max_pages, total_pages)
-    else:
-        pages_to_process = total_pages
+    todo = [page for page in pages if page not in done_pages]
     
     print(f"📄 Pagine totali: {total_pages}")
-    print(f"🔍 Pagine da processare: {pages_to_process}\n")
+    print(f"🔍 Pagine richieste: {len(pages)}")
+    if manifest is not None:
+        print(f"⏭️  Già estratte (saltate): {len(pages) - len(todo)}")
+    print(f"🔍 Pagine da processare: {len(todo)}\n")
     
-    all_images_metadata = []
-    total_images = 0
+    events.start(total_pages, len(todo), pdf=os.path.abspath(pdf_path), output_dir=output_dir, workers=workers)
     
-    # Processa ogni pagina
-    for page_num in range(pages_to_process):
-        page = pdf_document[page_num]
-        image_list = page.get_images(full=True)
-        
-        if image_list:
-            print(f"📄 Pagina {page_num + 1}: {len(image_list)} immagini trovate")
-        
-        # Estrai ogni immagine dalla pagina
-        for img_index, img in enumerate(image_list):
-            try:
-                xref = img[0]  # XREF dell'immagine
-                
-                # Estrai l'immagine
-                base_image = pdf_document.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                
-                # Nome file
-                image_filename = f"page_{page_num + 1:04d}_img_{img_index + 1:02d}.{image_ext}"
-                image_path = os.path.join(output_dir, image_filename)
-                
-                # Salva l'immagine
-                with open(image_path, "wb") as img_file:
-                    img_file.write(image_bytes)
-                
-                # Metadata
-                metadata = {
-                    "filename": image_filename,
-                    "page": page_num + 1,
-                    "image_index": img_index + 1,
-                    "width": base_image["width"],
-                    "height": base_image["height"],
-                    "colorspace": base_image["colorspace"],
-                    "bpc": base_image["bpc"],  # bits per component
-                    "xref": xref,
-                    "size_bytes": len(image_bytes)
-                }
-                
-                all_images_metadata.append(metadata)
-                total_images += 1
-                
-                print(f"  ✓ Salvata: {image_filename} ({base_image['width']}x{base_image['height']}px, {len(image_bytes)//1024}KB)")
-                
-            except Exception as e:
-                print(f"  ✗ Errore immagine {img_index + 1}: {str(e)}")
+    runs = _page_runs(todo, shard_pages)
+    if workers > 1 and len(runs) > 1:
+        print(f"⚡ Modalità parallela: {workers} processi, blocchi di {shard_pages} pagine\n")
+        tasks = [(pdf_path, output_dir, first_page, last_page, vector_dpi) for first_page, last_page in runs]
+        shards = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map restituisce i blocchi nell'ordine di invio: il merge è deterministico
+            for first_page, last_page, occurrences, page_stats in executor.map(_extract_shard, tasks):
+                if verbose:
+                    print(f"📄 Pagine {first_page}-{last_page}: {len(occurrences)} immagini")
+                for page in page_stats:
+                    events.page(*page)
+                shards.append(occurrences)
+    else:
+        shards = [
+            extract_page_range(pdf_path, output_dir, first_page, last_page, verbose, on_page=events.page, vector_dpi=vector_dpi)
+            for first_page, last_page in runs
+        ]
     
-    pdf_document.close()
+    # I file canonici delle pagine già estratte restano quelli di riferimento
+    known = {
+        image["sha256"]: {"filename": image["filename"], "page": image["canonical_page"]}
+        for image in kept_images
+    }
+    new_images = merge_shards(shards, output_dir, known)
     
-    # Salva metadata
-    metadata_path = os.path.join(output_dir, METADATA_FILE)
-    with open(metadata_path, 'w', encoding='utf-8') as f:
-        json.dump({
-            "total_images": total_images,
-            "total_pages_processed": pages_to_process,
-            "extraction_date": None,  # Verrà aggiunto dopo
-            "images": all_images_metadata
-        }, f, indent=2, ensure_ascii=False)
+    all_images_metadata = sorted(kept_images + new_images, key=lambda image: (image["page"], image["image_index"]))
+    total_images = len(all_images_metadata)
+    duplicates = [image for image in new_images if image["duplicate"]]
+    bytes_saved = sum(image["size_bytes"] for image in duplicates)
+    
+    # Salva metadata (pagine già estratte + pagine nuove)
+    metadata_path = save_manifest(output_dir, all_images_metadata, done_pages | set(todo), vector_dpi)
+    events.finish(
+        ok=True, total_images=total_images,
+        new_images=len(new_images), duplicates=len(duplicates), metadata=metadata_path
+    )
     
     print(f"\n✨ Estrazione completata!")
     print(f"📊 Statistiche:")
-    print(f"   - Pagine processate: {pages_to_process}/{total_pages}")
-    print(f"   - Immagini estratte: {total_images}")
+    print(f"   - Pagine processate: {len(todo)}/{total_pages}")
+    print(f"   - Immagini nelle pagine processate: {len(new_images)}")
+    if vector_dpi:
+        print(f"   - di cui figure vettoriali ({vector_dpi} DPI): {sum(1 for image in new_images if image.get('kind') == 'vector')}")
+    print(f"   - Immagini distinte salvate: {len(new_images) - len(duplicates)}")
+    print(f"   - Duplicati non salvati: {len(duplicates)} ({bytes_saved//1024}KB risparmiati)")
+    print(f"   - Immagini totali nel metadata: {total_images}")
     print(f"   - Directory output: {output_dir}/")
     print(f"   - Metadata salvato: {metadata_path}")
     
     return total_images, all_images_metadata
 
 
-def main():
-    """Funzione principale"""
-    
-    print("=" * 60)
-    print("  ESTRATTORE IMMAGINI PDF - Quiz Farmacia")
-    print("=" * 60)
-    print()
-    
-    # Verifica che il PDF esista
-    if not os.path.exists(PDF_PATH):
-        print(f"❌ Errore: File PDF non trovato: {PDF_PATH}")
-        return
-    
-    # Chiedi all'utente
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(
+        description="Estrae le immagini dal PDF dei quiz (senza opzioni e da terminale mostra il menu interattivo)"
+    )
+    parser.add_argument(
+        "--pdf", default=PDF_PATH,
+        help=f"PDF da cui estrarre le immagini (default: {PDF_PATH})"
+    )
+    parser.add_argument(
+        "--output-dir", default=OUTPUT_DIR,
+        help=f"directory di output (default: {OUTPUT_DIR})"
+    )
+    parser.add_argument(
+        "--pages",
+        help='pagine da estrarre, es. "1-100,200,1400-" (default: tutte)'
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="estrai di nuovo anche le pagine già presenti in images-metadata.json"
+    )
+    parser.add_argument(
+        "--format", choices=("files", "bundle"), default="files",
+        help="files: un file per immagine; bundle: anche un unico <output-dir>.bundle con indice (default: files)"
+    )
+    parser.add_argument(
+        "--variants", action="store_true",
+        help="crea anche le varianti WebP ridotte (display/); nel bundle va la variante display"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help=f"processi in parallelo, ognuno su blocchi di {SHARD_PAGES} pagine (default: 1; 0 = tutti i core)"
+    )
+    parser.add_argument(
+        "--vector", type=int, nargs="?", const=VECTOR_DPI, default=None, metavar="DPI",
+        help=f"salva anche le figure vettoriali (es. formule di struttura) renderizzando solo il loro riquadro "
+             f"(senza DPI: {VECTOR_DPI}; default: disattivato)"
+    )
+    add_events_arguments(parser)
+    return parser.parse_args()
+
+def choose_max_pages():
+    """Menu interattivo: restituisce (True, pagine massime) oppure (False, None) se la scelta non è valida"""
     print("⚠️  IMPORTANTE: L'estrazione di tutte le 1500 pagine può richiedere tempo!")
     print()
     print("Opzioni:")
@@ -148,24 +698,80 @@ def main():
         print(f"\n🔍 Modalità COMPLETA: tutte le pagine\n")
     else:
         print("❌ Scelta non valida")
-        return
+        return False, None
+    return True, max_pages
+
+def main():
+    """Funzione principale"""
+    
+    # Il menu interattivo resta solo se lo script è lanciato senza opzioni da un terminale
+    interactive = len(sys.argv) == 1 and sys.stdin.isatty()
+    args = parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    events = events_from_args(args, 'images')
+    
+    print("=" * 60)
+    print("  ESTRATTORE IMMAGINI PDF - Quiz Farmacia")
+    print("=" * 60)
+    print()
+    
+    # Verifica che il PDF esista
+    if not os.path.exists(args.pdf):
+        print(f"❌ Errore: File PDF non trovato: {args.pdf}")
+        sys.exit(1)
+    
+    max_pages = None
+    pages = None
+    if interactive:
+        # Chiedi all'utente
+        valid, max_pages = choose_max_pages()
+        if not valid:
+            return
+    elif args.pages:
+        try:
+            with fitz.open(args.pdf) as pdf_document:
+                pages = parse_page_ranges(args.pages, pdf_document.page_count)
+        except ValueError as e:
+            print(f"❌ Errore: {e}")
+            sys.exit(2)
     
     # Estrai le immagini
     try:
-        total_images, metadata = extract_images_from_pdf(PDF_PATH, OUTPUT_DIR, max_pages)
+        total_images, metadata = extract_images_from_pdf(
+            args.pdf, args.output_dir, max_pages, workers,
+            pages=pages,
+            force=args.force,
+            events=events,
+            verbose=not args.quiet,
+            vector_dpi=args.vector
+        )
+        
+        if args.variants:
+            print()
+            processed, created, errors = generate_variants(args.output_dir, workers)
+            print_variants_summary(args.output_dir, processed, created, errors)
+            metadata = load_manifest(args.output_dir)["images"]
+        
+        if args.format == "bundle":
+            bundle_path = bundle_path_for(args.output_dir)
+            entries, data_bytes = build_bundle(args.output_dir, metadata, bundle_path, "display" if args.variants else None)
+            print(f"\n📦 Bundle creato: {bundle_path} ({entries} voci, {data_bytes // 1024}KB di immagini)")
         
         if total_images > 0:
-            print(f"\n💡 Le immagini sono state salvate in: {OUTPUT_DIR}/")
+            print(f"\n💡 Le immagini sono state salvate in: {args.output_dir}/")
             print(f"💡 Puoi aprirle per vedere strutture chimiche, grafici, etc.")
         else:
             print("\n⚠️  Nessuna immagine trovata nelle pagine processate")
             
     except Exception as e:
         print(f"\n❌ Errore durante l'estrazione: {str(e)}")
+        events.finish(ok=False, error=str(e))
         import traceback
         traceback.print_exc()
+        sys.exit(1)
+    finally:
+        events.close()
 
 
 if __name__ == "__main__":
     main()
-
@@ -5,12 +5,17 @@ Script per estrarre testo da PDF scansionato usando OCR
 Usa pdf2image per convertire PDF in immagini e pytesseract per OCR
 """
 
+import argparse
 import os
+import shutil
 import sys
-from pathlib import Path
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 try:
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_path, pdfinfo_from_path
 except ImportError:
     print("[ERR] Errore: pdf2image non installato")
     print("   Installa con: pip install pdf2image")
@@ -32,6 +37,18 @@ except ImportError:
     print("   Installa con: pip install Pillow")
     sys.exit(1)
 
+from ocr_cache import OCRCache, open_pdf, page_fingerprint, pixels_fingerprint, make_key
+from ocr_cache import add_cache_arguments, cache_config_from_args
+from ocr_journal import OutputJournal, pdf_signature
+from pdf_text_layer import fitz, classify_page, text_layer_result, SOURCE_OCR, SOURCE_TEXT_LAYER
+from ocr_quality import needs_higher_dpi, record_attempt, page_report, policy_info
+from ocr_quality import add_adaptive_arguments, adaptive_policy_from_args
+from ocr_preprocess import preprocess_image, shift_boxes, with_timings, merge_timings, StageTimes, preprocess_info
+from ocr_preprocess import preprocess_description, add_preprocess_arguments, preprocess_options_from_args
+from quiz_layout_parser import QuizJsonlWriter
+from ocr_events import RunEvents, ocr_page_metrics, add_events_arguments, events_from_args
+from ocr_pipeline import run_pipeline, chain_stages, PDF_LOCK
+
 # Configurazione
 PDF_PATH = os.path.join("Ulteriori quiz", "ssfo-quiz-modello3.pdf")
 OUTPUT_TEXT_FILE = os.path.join("Ulteriori quiz", "ssfo-quiz-modello3.txt")
@@ -54,6 +71,21 @@ if platform.system() == 'Windows':
 # Lingua per OCR (italiano + inglese)
 OCR_LANG = 'ita+eng'
 
+# Pagine renderizzate per volta: la memoria di picco dipende da questo valore
+# e non dal numero totale di pagine del PDF
+PAGES_PER_CHUNK = 4
+
+# Pagine per esecuzione di Tesseract con --tesseract-batch senza valore
+TESSERACT_BATCH_PAGES = 32
+
+# Cache OCR del processo worker (aperta in _init_ocr_worker)
+_worker_cache = None
+
+# Pagina in transito tra gli stadi di iter_ocr_pages: result è già pronto
+# (livello di testo, cache) oppure image va ancora riconosciuta; offset sposta
+# i riquadri dalle coordinate dell'immagine ritagliata a quelle della pagina
+PageWork = namedtuple("PageWork", ["page_num", "key", "result", "error", "image", "offset", "timings"])
+
 def check_dependencies():
     """Verifica che tutte le dipendenze siano installate"""
     print("[*] Verifica dipendenze...")
@@ -94,85 +126,788 @@ def check_dependencies():
     
     return True
 
-def extract_text_from_pdf_ocr(pdf_path, output_file, lang='ita+eng', dpi=300):
+def get_pdf_page_count(pdf_path):
+    """Restituisce il numero di pagine del PDF (tramite pdfinfo di poppler)"""
+    info = pdfinfo_from_path(pdf_path)
+    return int(info["Pages"])
+
+def iter_pdf_pages(pdf_path, dpi=300, chunk_size=PAGES_PER_CHUNK, first_page=1, last_page=None, render_threads=4):
+    """
+    Renderizza il PDF a finestre di chunk_size pagine e restituisce una pagina alla volta
+    
+    Args:
+        pdf_path: percorso del file PDF
+        dpi: risoluzione per la conversione PDF->immagine
+        chunk_size: numero massimo di pagine tenute in memoria contemporaneamente
+        first_page: prima pagina da renderizzare (1-based)
+        last_page: ultima pagina da renderizzare (None = fino alla fine)
+        render_threads: thread di poppler per ogni blocco
+    
+    Yields:
+        (numero_pagina, immagine PIL)
+    """
+    if last_page is None:
+        last_page = get_pdf_page_count(pdf_path)
+    
+    for start in range(first_page, last_page + 1, chunk_size):
+        end = min(start + chunk_size - 1, last_page)
+        images = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            fmt='png',
+            first_page=start,
+            last_page=end,
+            thread_count=min(render_threads, end - start + 1)
+        )
+        
+        page_num = start
+        # Estrae le pagine dalla lista così ogni immagine viene liberata
+        # appena il chiamante ha finito di usarla
+        while images:
+            yield page_num, images.pop(0)
+            page_num += 1
+
+def parse_tsv_words(tsv):
+    """
+    Estrae le parole dall'output TSV di Tesseract
+    
+    Returns:
+        (parole, riquadri [x0, y0, x1, y1], confidenze 0-1)
+    """
+    words, boxes, confidences = [], [], []
+    for row in tsv.splitlines()[1:]:
+        cols = row.split('\t')
+        # Colonne: level page block par line word left top width height conf text
+        if len(cols) < 12 or not cols[11].strip():
+            continue
+        conf = float(cols[10])
+        if conf < 0:
+            continue
+        left, top, width, height = (int(c) for c in cols[6:10])
+        words.append(cols[11])
+        boxes.append([left, top, left + width, top + height])
+        confidences.append(round(conf / 100, 4))
+    return words, boxes, confidences
+
+def prepare_image(image, preprocess=None, dpi=300):
+    """
+    Preprocessing di un'immagine prima di Tesseract (vedi ocr_preprocess.py)
+    
+    Returns:
+        (immagine da riconoscere, spostamento dei riquadri, {fase: secondi}) -
+        senza preprocess l'immagine è quella ricevuta
+    """
+    if preprocess is None:
+        return image, (0, 0), {}
+    array, offset, timings = preprocess_image(image, preprocess, dpi)
+    return Image.fromarray(array), offset, timings
+
+def recognize_image(image, lang, offset=(0, 0)):
+    """
+    OCR di un'immagine con una sola esecuzione di Tesseract (uscite txt e tsv insieme)
+    
+    Returns:
+        ({"text": testo come image_to_string, "words": [...], "boxes": [...], "confidences": [...],
+          "pixels": pixel dell'immagine riconosciuta}, secondi di OCR)
+    """
+    start_time = time.perf_counter()
+    text, tsv = pytesseract.run_and_get_multiple_output(image, extensions=['txt', 'tsv'], lang=lang)
+    ocr_seconds = time.perf_counter() - start_time
+    
+    words, boxes, confidences = parse_tsv_words(tsv)
+    boxes = shift_boxes(boxes, offset)
+    return {
+        "text": text, "words": words, "boxes": boxes, "confidences": confidences,
+        "source": SOURCE_OCR, "pixels": image.width * image.height
+    }, ocr_seconds
+
+def ocr_image(image, lang, preprocess=None, dpi=300):
+    """
+    Preprocessing (opzionale) e OCR di un'immagine
+    
+    Con preprocess (vedi ocr_preprocess.py) l'immagine viene prima convertita
+    in scala di grigi, binarizzata, raddrizzata e ritagliata; i riquadri delle
+    parole vengono riportati alle coordinate della pagina.
+    
+    Returns:
+        (risultato come recognize_image, {fase: secondi})
+    """
+    image, offset, timings = prepare_image(image, preprocess, dpi)
+    result, timings["ocr"] = recognize_image(image, lang, offset)
+    return result, timings
+
+def _cache_key(fingerprint, lang, dpi, preprocess=None):
+    """Chiave della cache OCR per una pagina riconosciuta con Tesseract (il preprocessing cambia il risultato)"""
+    if preprocess is None:
+        return make_key(fingerprint, 'tesseract', lang, dpi)
+    return make_key(fingerprint, 'tesseract', lang, dpi, preprocess=preprocess_info(preprocess))
+
+def split_tsv_pages(tsv):
+    """
+    Divide il TSV di un'esecuzione su più immagini per pagina (colonna page_num, 1-based)
+    
+    Returns:
+        {numero immagine: TSV della sola pagina con la riga di intestazione}
+    """
+    lines = tsv.splitlines()
+    if not lines:
+        return {}
+    header = lines[0]
+    rows = {}
+    for row in lines[1:]:
+        cols = row.split('\t')
+        if len(cols) < 12 or not cols[1].isdigit():
+            continue
+        rows.setdefault(int(cols[1]), []).append(row)
+    return {page: '\n'.join([header] + page_rows) for page, page_rows in rows.items()}
+
+class TesseractBatch:
+    """
+    Pagine riconosciute da una sola esecuzione di Tesseract
+    
+    pytesseract avvia un processo tesseract per ogni immagine, che ricarica
+    ogni volta i modelli ita+eng. Qui le immagini (già preprocessate, vedi
+    prepare_image) vengono scritte in una cartella temporanea man mano che arrivano, così in memoria
+    resta una pagina alla volta; run() passa a Tesseract il file con l'elenco
+    delle immagini, con le stesse opzioni di ocr_image, e divide l'uscita per
+    pagina: il testo sul separatore di pagina (\\f) e il TSV sulla colonna page_num.
+    """
+    
+    def __init__(self, lang):
+        self.lang = lang
+        self._dir = tempfile.mkdtemp(prefix="ocr_batch_")
+        # (numero_pagina, percorso immagine, spostamento dei riquadri, tempi per fase, pixel)
+        self._pages = []
+    
+    def __len__(self):
+        return len(self._pages)
+    
+    def add(self, page_num, image, offset=(0, 0), timings=None):
+        """
+        Prepara una pagina per la prossima esecuzione (l'immagine può essere chiusa subito dopo)
+        
+        Args:
+            offset: spostamento dei riquadri restituito da prepare_image
+            timings: tempi per fase già spesi sulla pagina (rendering, preprocessing)
+        """
+        timings = dict(timings or {})
+        
+        # PNM non compresso: scrittura e lettura molto più veloci del PNG
+        path = os.path.join(self._dir, f"page_{page_num:05d}.pnm")
+        image.save(path, format="PPM")
+        self._pages.append((page_num, path, offset, timings, image.width * image.height))
+    
+    def run(self):
+        """
+        Riconosce le pagine aggiunte con un solo processo tesseract
+        
+        Returns:
+            {numero_pagina: (risultato, tempi per fase, errore)} - se l'esecuzione
+            fallisce l'errore vale per tutte le pagine del batch
+        """
+        pages, self._pages = self._pages, []
+        if not pages:
+            return {}
+        
+        list_path = os.path.join(self._dir, "pages.txt")
+        output_base = os.path.join(self._dir, "output")
+        start_time = time.perf_counter()
+        try:
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(path for _, path, _, _, _ in pages) + '\n')
+            
+            pytesseract.pytesseract.run_tesseract(
+                list_path, output_base, extension='txt', lang=self.lang,
+                config='-c tessedit_create_tsv=1'
+            )
+            with open(output_base + '.txt', 'r', encoding='utf-8') as f:
+                texts = f.read().split('\f')
+            with open(output_base + '.tsv', 'r', encoding='utf-8') as f:
+                tsv_pages = split_tsv_pages(f.read())
+            
+            # Ogni pagina termina con il separatore: l'ultimo pezzo è vuoto
+            if len(texts) != len(pages) + 1:
+                raise RuntimeError(f"Tesseract ha restituito {len(texts) - 1} pagine invece di {len(pages)}")
+        except Exception as e:
+            return {page_num: (None, None, str(e)) for page_num, _, _, _, _ in pages}
+        finally:
+            for name in os.listdir(self._dir):
+                os.remove(os.path.join(self._dir, name))
+        
+        ocr_seconds = (time.perf_counter() - start_time) / len(pages)
+        results = {}
+        for index, (page_num, _, offset, timings, pixels) in enumerate(pages):
+            words, boxes, confidences = parse_tsv_words(tsv_pages.get(index + 1, ""))
+            result = {
+                # Come l'uscita di una singola immagine, che termina con il separatore
+                "text": texts[index] + '\f',
+                "words": words,
+                "boxes": shift_boxes(boxes, offset),
+                "confidences": confidences,
+                "source": SOURCE_OCR,
+                "pixels": pixels,
+            }
+            results[page_num] = (result, dict(timings, ocr=ocr_seconds), None)
+        return results
+    
+    def close(self):
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+def _ocr_page_at_dpi(pdf_path, pdf_document, page_num, lang, dpi, cache=None, preprocess=None):
+    """Renderizza una singola pagina alla risoluzione indicata e ne restituisce il risultato OCR (con cache)"""
+    key = None
+    if cache is not None and pdf_document is not None:
+        with PDF_LOCK:
+            fingerprint = page_fingerprint(pdf_document, page_num - 1)
+        key = _cache_key(fingerprint, lang, dpi, preprocess)
+        result = cache.get(key)
+        if result is not None:
+            return dict(result, cached=True)
+    
+    start_time = time.perf_counter()
+    _, image = next(iter_pdf_pages(pdf_path, dpi, 1, page_num, page_num, render_threads=1))
+    render_seconds = time.perf_counter() - start_time
+    try:
+        if cache is not None and key is None:
+            key = _cache_key(pixels_fingerprint(image), lang, dpi, preprocess)
+            result = cache.get(key)
+            if result is not None:
+                return dict(result, cached=True)
+        
+        result, timings = ocr_image(image, lang, preprocess, dpi)
+        if cache is not None:
+            cache.put(key, result)
+        return with_timings(result, dict(timings, rendering=render_seconds))
+    finally:
+        image.close()
+
+def _refine_result(result, pdf_path, pdf_document, page_num, lang, dpi, cache, adaptive, preprocess=None):
+    """Annota il DPI del risultato e, in modalità adattiva, riprova a DPI più alti se la confidenza è bassa"""
+    result = record_attempt(result, dpi)
+    if adaptive is None:
+        return result
+    
+    for higher_dpi in adaptive.steps[1:]:
+        if not needs_higher_dpi(result, adaptive):
+            break
+        retry = _ocr_page_at_dpi(pdf_path, pdf_document, page_num, lang, higher_dpi, cache, preprocess)
+        if "timings" in result:
+            # Il tempo speso nei tentativi precedenti resta nel conto della pagina
+            retry = with_timings(retry, merge_timings(result["timings"], retry.get("timings")))
+        result = record_attempt(retry, higher_dpi, previous=result)
+    return result
+
+def _iter_page_sources(pdf_path, lang, dpi, chunk_size, first_page, last_page, render_threads, cache, text_layer, preprocess):
+    """
+    Primo stadio di iter_ocr_pages: pagine pronte senza OCR e rendering delle altre
+    
+    Le pagine con un livello di testo o già nella cache non vengono
+    renderizzate; le altre vengono renderizzate a blocchi di chunk_size.
+    
+    Yields:
+        PageWork con result (pagina pronta), image (da riconoscere) o error
+    """
+    def lookup(start, end, keys, ready):
+        """Pagine già pronte senza OCR: livello di testo o cache (gli oggetti pagina restano qui)"""
+        for page_num in range(start, end + 1):
+            if text_layer:
+                page = pdf_document[page_num - 1]
+                needs_ocr, text, _ = classify_page(page)
+                if not needs_ocr:
+                    ready[page_num] = text_layer_result(page, text, dpi)
+                    continue
+            if cache is not None:
+                keys[page_num] = _cache_key(page_fingerprint(pdf_document, page_num - 1), lang, dpi, preprocess)
+                result = cache.get(keys[page_num])
+                if result is not None:
+                    ready[page_num] = dict(result, cached=True)
+    
+    with PDF_LOCK:
+        pdf_document = open_pdf(pdf_path) if cache is not None or text_layer else None
+    try:
+        for start in range(first_page, last_page + 1, chunk_size):
+            end = min(start + chunk_size - 1, last_page)
+            
+            keys = {}
+            ready = {}
+            if pdf_document is not None:
+                with PDF_LOCK:
+                    lookup(start, end, keys, ready)
+            
+            # Renderizza solo l'intervallo che contiene pagine da riconoscere
+            missing = [page_num for page_num in range(start, end + 1) if page_num not in ready]
+            if missing:
+                images = iter_pdf_pages(pdf_path, dpi, chunk_size, missing[0], missing[-1], render_threads)
+            
+            for page_num in range(start, end + 1):
+                image = timings = None
+                if missing and missing[0] <= page_num <= missing[-1]:
+                    # Il primo next() del blocco renderizza tutte le sue pagine
+                    start_time = time.perf_counter()
+                    _, image = next(images)
+                    timings = {"rendering": time.perf_counter() - start_time}
+                
+                result, error = ready.get(page_num), None
+                if result is None and cache is not None and page_num not in keys:
+                    # Senza PyMuPDF l'impronta si calcola sui pixel renderizzati
+                    try:
+                        keys[page_num] = _cache_key(pixels_fingerprint(image), lang, dpi, preprocess)
+                        result = cache.get(keys[page_num])
+                        if result is not None:
+                            result = dict(result, cached=True)
+                    except Exception as e:
+                        error = str(e)
+                if image is not None and (result is not None or error is not None):
+                    image.close()
+                    image = None
+                yield PageWork(page_num, keys.get(page_num), result, error, image, (0, 0), timings)
+    finally:
+        if pdf_document is not None:
+            with PDF_LOCK:
+                pdf_document.close()
+
+def _iter_prepared(pages, preprocess, dpi):
+    """Secondo stadio di iter_ocr_pages: preprocessing delle immagini da riconoscere (prepare_image)"""
+    for work in pages:
+        if work.image is not None and preprocess is not None:
+            rendered = work.image
+            try:
+                image, offset, timings = prepare_image(rendered, preprocess, dpi)
+                work = work._replace(image=image, offset=offset, timings=dict(work.timings, **timings))
+            except Exception as e:
+                work = work._replace(image=None, error=str(e))
+            finally:
+                rendered.close()
+        yield work
+
+def _iter_recognized(pages, lang, cache, tesseract_batch):
+    """
+    Terzo stadio di iter_ocr_pages: OCR delle immagini, una alla volta o a batch
+    
+    Con tesseract_batch > 0 le pagine da riconoscere vengono raccolte in un
+    TesseractBatch; le pagine pronte che le seguono aspettano l'esecuzione
+    del batch, così l'ordine resta quello del documento.
+    
+    Yields:
+        (numero_pagina, risultato, errore)
+    """
+    batch = TesseractBatch(lang) if tesseract_batch > 0 else None
+    # Pagine non ancora restituite, in ordine: (numero_pagina, chiave cache, risultato, errore);
+    # risultato ed errore None = pagina in attesa dell'esecuzione del batch
+    waiting = []
+    
+    def finish_pages(batch_results):
+        """Completa (cache) e restituisce in ordine le pagine in attesa"""
+        for page_num, key, result, error in waiting:
+            if result is None and error is None:
+                result, timings, error = batch_results[page_num]
+                if error is None:
+                    if cache is not None:
+                        cache.put(key, result)
+                    result = with_timings(result, timings)
+            yield page_num, result, error
+        waiting.clear()
+    
+    try:
+        for work in pages:
+            result, error = work.result, work.error
+            if work.image is not None:
+                try:
+                    if batch is not None:
+                        batch.add(work.page_num, work.image, work.offset, work.timings)
+                    else:
+                        result, ocr_seconds = recognize_image(work.image, lang, work.offset)
+                        if cache is not None:
+                            cache.put(work.key, result)
+                        result = with_timings(result, dict(work.timings, ocr=ocr_seconds))
+                except Exception as e:
+                    result, error = None, str(e)
+                finally:
+                    work.image.close()
+            
+            waiting.append((work.page_num, work.key, result, error))
+            if batch is None or len(batch) == 0:
+                # Nessuna pagina in attesa di Tesseract: le pagine escono subito
+                yield from finish_pages({})
+            elif len(batch) >= tesseract_batch:
+                yield from finish_pages(batch.run())
+        
+        if waiting:
+            yield from finish_pages(batch.run())
+    finally:
+        if batch is not None:
+            batch.close()
+
+def _iter_refined(pages, pdf_path, lang, dpi, cache, adaptive, preprocess):
+    """Ultimo stadio di iter_ocr_pages: DPI del risultato e nuovi tentativi della modalità adattiva"""
+    # Documento proprio dello stadio: gli oggetti PyMuPDF non vanno condivisi tra thread
+    with PDF_LOCK:
+        pdf_document = open_pdf(pdf_path) if cache is not None and adaptive is not None else None
+    try:
+        for page_num, result, error in pages:
+            if error is None and result.get("source") == SOURCE_OCR:
+                try:
+                    result = _refine_result(result, pdf_path, pdf_document, page_num, lang, dpi, cache, adaptive, preprocess)
+                except Exception as e:
+                    error = str(e)
+            yield page_num, result if error is None else None, error
+    finally:
+        if pdf_document is not None:
+            with PDF_LOCK:
+                pdf_document.close()
+
+def iter_ocr_pages(pdf_path, lang, dpi, chunk_size=PAGES_PER_CHUNK, first_page=1, last_page=None, render_threads=4, cache=None, text_layer=False, adaptive=None, preprocess=None, tesseract_batch=0, pipeline=False, pipeline_stats=None):
+    """
+    Applica l'OCR alle pagine di un intervallo, una alla volta
+    
+    Con la cache le pagine già riconosciute non vengono né renderizzate (se
+    PyMuPDF è disponibile per calcolare l'impronta del contenuto) né passate
+    di nuovo a Tesseract. Con text_layer le pagine che hanno già un livello
+    di testo utilizzabile vengono lette con PyMuPDF, senza rendering né OCR.
+    Con adaptive (AdaptiveDPI) le pagine vengono renderizzate al primo DPI
+    della politica e di nuovo ai successivi solo se la confidenza è bassa.
+    Con preprocess (Preprocess) ogni immagine passa per ocr_preprocess.py
+    prima di Tesseract. I risultati riconosciuti hanno i tempi per fase in "timings".
+    Con tesseract_batch > 0 le pagine da riconoscere vengono raccolte in un
+    TesseractBatch ed elaborate da un solo processo tesseract ogni
+    tesseract_batch pagine (i nuovi tentativi della modalità adattiva restano
+    una pagina alla volta); le pagine restano comunque in ordine.
+    
+    Le fasi sono stadi separati (rendering, preprocessing, OCR, DPI adattivo):
+    di default vengono eseguite una dopo l'altra; con pipeline ogni stadio
+    gira in un proprio thread collegato al successivo da una coda limitata
+    (vedi ocr_pipeline.py), così il rendering della pagina successiva procede
+    mentre Tesseract riconosce quella corrente e chi consuma le pagine scrive
+    l'output in parallelo. La cache deve essere un OCRCache (thread-safe).
+    
+    Args:
+        pipeline_stats: lista in cui aggiungere i tempi degli stadi (StageStats, solo con pipeline)
+    
+    Yields:
+        (numero_pagina, risultato, errore) - risultato è None se l'OCR della pagina è fallito
+    """
+    if last_page is None:
+        last_page = get_pdf_page_count(pdf_path)
+    if adaptive is not None:
+        dpi = adaptive.steps[0]
+    
+    source = _iter_page_sources(pdf_path, lang, dpi, chunk_size, first_page, last_page, render_threads, cache, text_layer, preprocess)
+    stages = [
+        ("preprocessing", lambda pages: _iter_prepared(pages, preprocess, dpi)),
+        ("ocr", lambda pages: _iter_recognized(pages, lang, cache, tesseract_batch)),
+        ("dpi", lambda pages: _iter_refined(pages, pdf_path, lang, dpi, cache, adaptive, preprocess)),
+    ]
+    if not pipeline:
+        yield from chain_stages(source, stages)
+        return
+    
+    with run_pipeline(source, stages) as pages:
+        if pipeline_stats is not None:
+            pipeline_stats.extend(pages.stats)
+        yield from pages
+
+def _init_ocr_worker(cache_config):
+    """Inizializzazione dei processi worker: ogni processo apre la propria connessione alla cache"""
+    global _worker_cache
+    
+    # Un solo thread Tesseract per processo: il parallelismo viene dal pool
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    
+    _worker_cache = OCRCache(*cache_config) if cache_config else None
+
+def _ocr_page_range_worker(task):
+    """Eseguita nei worker: renderizza dal PDF e applica l'OCR a un intervallo di pagine"""
+    pdf_path, first_page, last_page, lang, dpi, text_layer, adaptive, preprocess, tesseract_batch, pipeline = task
+    return list(iter_ocr_pages(
+        pdf_path, lang, dpi,
+        # Con il batch l'intervallo può superare PAGES_PER_CHUNK: il rendering resta a blocchi
+        # (anche con la pipeline, per sovrapporre il rendering di un blocco all'OCR del precedente)
+        chunk_size=min(last_page - first_page + 1, PAGES_PER_CHUNK) if tesseract_batch or pipeline else last_page - first_page + 1,
+        first_page=first_page,
+        last_page=last_page,
+        render_threads=1,
+        cache=_worker_cache,
+        text_layer=text_layer,
+        adaptive=adaptive,
+        preprocess=preprocess,
+        tesseract_batch=tesseract_batch,
+        pipeline=pipeline
+    ))
+
+def iter_ocr_pages_parallel(pdf_path, total_pages, lang, dpi, chunk_size, workers, cache_config=None, first_page=1, text_layer=False, adaptive=None, preprocess=None, tesseract_batch=0, pipeline=False):
+    """
+    Distribuisce blocchi di chunk_size pagine su un pool di processi
+    
+    Ogni worker renderizza le proprie pagine partendo dal percorso del PDF,
+    quindi tra i processi viaggiano solo intervalli di pagine e testo.
+    Con tesseract_batch i blocchi crescono fino a tesseract_batch pagine
+    (senza lasciare worker inattivi): ogni blocco è una sola esecuzione di Tesseract.
+    Con pipeline ogni worker esegue i propri stadi in thread separati.
+    
+    Yields:
+        (numero_pagina, risultato, errore) nell'ordine delle pagine
+    """
+    if tesseract_batch:
+        pages_per_worker = -(-(total_pages - first_page + 1) // workers)
+        chunk_size = max(chunk_size, min(tesseract_batch, pages_per_worker))
+    
+    tasks = [
+        (pdf_path, start, min(start + chunk_size - 1, total_pages), lang, dpi, text_layer, adaptive, preprocess, tesseract_batch, pipeline)
+        for start in range(first_page, total_pages + 1, chunk_size)
+    ]
+    
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_ocr_worker,
+        initargs=(cache_config,)
+    )
+    try:
+        # map restituisce i blocchi nell'ordine di invio: le pagine restano ordinate
+        for chunk_results in executor.map(_ocr_page_range_worker, tasks):
+            yield from chunk_results
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def print_page_event(event):
+    """Vista della console sugli eventi di pagina: la riga "Pagina i/N..." con l'esito"""
+    if event["event"] != "page":
+        return
+    print(f"    Pagina {event['page']}/{event['total_pages']}...", end=' ')
+    if event["error"] is not None:
+        print(f"[ERR] Errore pagina {event['page']}: {event['error']}")
+    elif not event.get("chars"):
+        print("  (nessun testo rilevato)")
+    elif event.get("source") == SOURCE_TEXT_LAYER:
+        print("[OK] (livello di testo)")
+    else:
+        print("[OK] (cache)" if event.get("cached") else "[OK]")
+
+def extract_text_from_pdf_ocr(pdf_path, output_file, lang='ita+eng', dpi=300, chunk_size=PAGES_PER_CHUNK, workers=1, cache_config=None, resume=False, text_layer=True, adaptive=None, quiz_jsonl=None, preprocess=None, tesseract_batch=0, events=None, pipeline=False):
     """
     Estrae testo da PDF scansionato usando OCR
     
+    Le pagine vengono renderizzate a blocchi di chunk_size, passate all'OCR
+    e liberate subito: il testo di ogni pagina viene aggiunto al journal di
+    output appena pronto, così un'esecuzione interrotta può essere ripresa.
+    
     Args:
         pdf_path: percorso del file PDF
         output_file: percorso del file di output per il testo
         lang: lingua per OCR (default: 'ita+eng')
         dpi: risoluzione per la conversione PDF->immagine (default: 300)
+        chunk_size: pagine renderizzate per volta (default: PAGES_PER_CHUNK)
+        workers: processi OCR in parallelo (default: 1 = sequenziale)
+        cache_config: (cartella, MB massimi) della cache OCR, None per disattivarla
+        resume: riprendi un'esecuzione interrotta dalla prima pagina non completata
+        text_layer: leggi senza OCR le pagine con un livello di testo (richiede PyMuPDF);
+                    ogni pagina viene etichettata con il metodo di estrazione
+        adaptive: politica AdaptiveDPI (ignora dpi e parte dal primo DPI della politica)
+        quiz_jsonl: file JSON Lines in cui scrivere i quiz ricostruiti dalle pagine
+                    man mano che vengono riconosciute (vedi quiz_layout_parser.py)
+        preprocess: opzioni Preprocess delle fasi tra rendering e OCR
+                    (vedi ocr_preprocess.py), None per passare le pagine così come sono
+        tesseract_batch: pagine riconosciute da ogni processo tesseract
+                         (0 = un processo per pagina, come pytesseract)
+        events: RunEvents che riceve gli eventi di avanzamento per pagina
+                (vedi ocr_events.py); default: solo la riga di console per pagina
+        pipeline: esegui rendering, preprocessing e OCR come stadi concorrenti
+                  collegati da code limitate (vedi ocr_pipeline.py), mentre
+                  questa funzione scrive l'output delle pagine già pronte
     """
+    if events is None:
+        events = RunEvents('tesseract', listeners=[print_page_event])
     
     if not os.path.exists(pdf_path):
         print(f"[ERR] File PDF non trovato: {pdf_path}")
+        events.finish(ok=False, error=f"File PDF non trovato: {pdf_path}")
         return False
     
     print(f" Apertura PDF: {pdf_path}")
     
     try:
-        # Converti PDF in immagini
-        print(f" Conversione PDF in immagini (DPI: {dpi})...")
-        print("   (Questo può richiedere alcuni minuti per PDF grandi)")
-        
-        images = convert_from_path(
-            pdf_path,
-            dpi=dpi,
-            fmt='png',
-            thread_count=4  # Usa 4 thread per velocizzare
-        )
-        
-        total_pages = len(images)
-        print(f"[OK] Convertite {total_pages} pagine in immagini\n")
-        
+        total_pages = get_pdf_page_count(pdf_path)
+        print(f"[OK] PDF con {total_pages} pagine")
+        if adaptive is not None:
+            dpi = adaptive.steps[0]
+            print(f" Risoluzione adattiva: DPI {', '.join(str(step) for step in adaptive.steps)}")
+        if preprocess is not None:
+            print(f" Preprocessing: {preprocess_description(preprocess)}")
+        if tesseract_batch:
+            print(f" Tesseract a batch: fino a {tesseract_batch} pagine per esecuzione")
+        if pipeline:
+            print(" Pipeline: rendering, preprocessing, OCR e scrittura in stadi concorrenti")
+        print(f" Conversione a blocchi di {chunk_size} pagine (DPI: {dpi})\n")
     except Exception as e:
-        print(f"[ERR] Errore durante la conversione PDF: {e}")
+        print(f"[ERR] Errore durante la lettura del PDF: {e}")
         print("\n[INFO] Assicurati che poppler sia installato e nel PATH")
+        events.finish(ok=False, error=str(e))
         return False
     
+    if text_layer and fitz is None:
+        print("[WARN] PyMuPDF non installato: tutte le pagine passano dall'OCR")
+        text_layer = False
+    
+    run_info = dict(
+        pdf_signature(pdf_path),
+        engine='tesseract', lang=lang, dpi=dpi, text_layer=text_layer,
+        adaptive=policy_info(adaptive), preprocess=preprocess_info(preprocess)
+    )
+    journal = OutputJournal(output_file, run_info, resume=resume)
+    first_page = journal.next_page
+    if journal.resumed:
+        print(f"[OK] Ripresa dalla pagina {first_page}/{total_pages}\n")
+    events.start(total_pages, total_pages - first_page + 1, first_page=first_page, output=output_file, **run_info)
+    
+    # Con la ripresa i quiz già scritti restano e i nuovi vengono aggiunti
+    quiz_writer = QuizJsonlWriter(quiz_jsonl, append=journal.resumed) if quiz_jsonl else None
+    
     # Estrai testo da ogni immagine usando OCR
-    all_text = []
+    pages_from_cache = 0
+    pages_from_text_layer = 0
+    stage_times = StageTimes()
+    pipeline_stats = []
+    cache = None
     
     print(f"🔍 Estrazione testo con OCR (lingua: {lang})...")
+    if workers > 1:
+        print(f"   (Modalità parallela: {workers} processi)")
     print("   (Questo può richiedere tempo, specialmente per PDF grandi)\n")
     
-    for i, image in enumerate(images, 1):
-        try:
-            print(f"    Pagina {i}/{total_pages}...", end=' ', flush=True)
-            
-            # Applica OCR all'immagine
-            text = pytesseract.image_to_string(image, lang=lang)
+    if workers > 1:
+        pages = iter_ocr_pages_parallel(pdf_path, total_pages, lang, dpi, chunk_size, workers, cache_config, first_page, text_layer, adaptive, preprocess, tesseract_batch, pipeline)
+    else:
+        cache = OCRCache(*cache_config) if cache_config else None
+        pages = iter_ocr_pages(
+            pdf_path, lang, dpi,
+            chunk_size=chunk_size,
+            first_page=first_page,
+            last_page=total_pages,
+            cache=cache,
+            text_layer=text_layer,
+            adaptive=adaptive,
+            preprocess=preprocess,
+            tesseract_batch=tesseract_batch,
+            pipeline=pipeline,
+            pipeline_stats=pipeline_stats
+        )
+    
+    try:
+        while True:
+            try:
+                i, result, error = next(pages)
+            except StopIteration:
+                break
+            except Exception as e:
+                print(f"[ERR] Errore durante la conversione PDF: {e}")
+                print("\n[INFO] Assicurati che poppler sia installato e nel PATH")
+                print("   Le pagine completate sono salvate: riprendi con --resume")
+                events.finish(ok=False, error=str(e))
+                return False
             
-            if text.strip():
-                all_text.append(f"=== PAGINA {i} ===\n{text}\n")
-                print("[OK]")
-            else:
-                print("  (nessun testo rilevato)")
+            try:
+                if error is not None:
+                    raise RuntimeError(error)
                 
-        except Exception as e:
-            print(f"[ERR] Errore pagina {i}: {e}")
-            continue
+                text = result["text"]
+                source = result.get("source")
+                if result.get("cached"):
+                    pages_from_cache += 1
+                if source == SOURCE_TEXT_LAYER:
+                    pages_from_text_layer += 1
+                stage_times.add(result)
+                
+                journal.add_page(i, text, source if text_layer else None, page_report(i, result))
+                if quiz_writer is not None:
+                    quiz_writer.add_page(i, result)
+                events.page(
+                    i, ocr_page_metrics(result),
+                    source=source, cached=bool(result.get("cached")), dpi=result.get("dpi", dpi)
+                )
+                    
+            except Exception as e:
+                journal.add_page(i, None, report={"page": i, "error": str(e)})
+                events.page(i, error=str(e))
+                continue
+    except KeyboardInterrupt:
+        print("\n\n[INFO] Interrotto: le pagine completate sono salvate, riprendi con --resume")
+        events.finish(ok=False, error="interrotto")
+        return False
+    finally:
+        pages.close()
+        if cache is not None:
+            cache.close()
+        journal.close()
+        if quiz_writer is not None:
+            # Il quiz in corso viene scritto solo a fine documento (non dopo un'interruzione)
+            quiz_writer.close(finish=journal.next_page > total_pages)
     
-    # Salva il testo estratto
-    if all_text:
-        output_path = Path(output_file)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(all_text))
-        
+    ok = journal.finish()
+    events.finish(ok=ok, total_chars=journal.total_chars)
+    if ok:
         print(f"\n[OK] Testo estratto salvato in: {output_file}")
         print(f" Totale pagine processate: {total_pages}")
-        print(f" Totale caratteri estratti: {sum(len(t) for t in all_text)}")
+        if text_layer:
+            print(f" Pagine lette dal livello di testo (senza OCR): {pages_from_text_layer}")
+        if cache_config:
+            print(f" Pagine lette dalla cache OCR: {pages_from_cache}")
+        print(f" Totale caratteri estratti: {journal.total_chars}")
+        print(f" Report per pagina (DPI e confidenza): {journal.report_file}")
+        if quiz_writer is not None:
+            print(f" Quiz ricostruiti: {quiz_writer.parser.quizzes} in {quiz_jsonl}")
+        if stage_times.pages:
+            print(f" Tempi per fase ({stage_times.pages} pagine riconosciute in questa esecuzione):")
+            for line in stage_times.lines():
+                print(f"   {line}")
+        if pipeline_stats:
+            print(" Stadi della pipeline (lavoro / attesa sulle code):")
+            for stats in pipeline_stats:
+                print(f"   {stats.name}: {stats.busy:.1f}s / {stats.waiting:.1f}s")
         return True
     else:
         print("\n  Nessun testo estratto")
         return False
 
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Estrae testo da PDF scansionato con Tesseract OCR")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="processi OCR in parallelo (default: 1; 0 = tutti i core)"
+    )
+    parser.add_argument(
+        "--force-ocr", action="store_true",
+        help="applica l'OCR a tutte le pagine, anche a quelle con un livello di testo"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="riprendi un'esecuzione interrotta dalla prima pagina non completata"
+    )
+    add_cache_arguments(parser)
+    parser.add_argument(
+        "--quiz-jsonl", metavar="FILE",
+        help="scrivi anche i quiz (domanda, opzioni A-E, risposta) ricostruiti dai riquadri OCR in JSON Lines"
+    )
+    parser.add_argument(
+        "--tesseract-batch", type=int, nargs="?", const=TESSERACT_BATCH_PAGES, default=0, metavar="N",
+        help=f"riconosce N pagine con un solo processo tesseract invece di uno per pagina "
+             f"(senza N: {TESSERACT_BATCH_PAGES}; default: disattivato)"
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="esegui rendering, preprocessing, OCR e scrittura come stadi concorrenti con code limitate"
+    )
+    add_adaptive_arguments(parser)
+    add_preprocess_arguments(parser)
+    add_events_arguments(parser)
+    return parser.parse_args()
+
 def main():
     """Funzione principale"""
     
+    args = parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    events = events_from_args(args, 'tesseract', print_page_event)
+    
     print("=" * 60)
     print("  ESTRATTORE TESTO DA PDF SCANNERIZZATO - OCR")
     print("=" * 60)
@@ -190,8 +925,19 @@ def main():
         PDF_PATH,
         OUTPUT_TEXT_FILE,
         lang=OCR_LANG,
-        dpi=300  # Aumenta a 400-600 per migliore qualità, ma più lento
+        dpi=300,  # Aumenta a 400-600 per migliore qualità, ma più lento
+        workers=workers,
+        cache_config=cache_config_from_args(args),
+        resume=args.resume,
+        text_layer=not args.force_ocr,
+        adaptive=adaptive_policy_from_args(args),
+        quiz_jsonl=args.quiz_jsonl,
+        preprocess=preprocess_options_from_args(args),
+        tesseract_batch=args.tesseract_batch,
+        events=events,
+        pipeline=args.pipeline
     )
+    events.close()
     
     if success:
         print("\n" + "=" * 60)
@@ -5,9 +5,11 @@ Script per estrarre testo da PDF scansionato usando EasyOCR
 EasyOCR non richiede installazione manuale di Tesseract
 """
 
+import argparse
 import os
 import sys
-from pathlib import Path
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 # Prova prima con PyMuPDF (non richiede Poppler)
 try:
@@ -16,7 +18,7 @@ try:
 except ImportError:
     USE_PYMUPDF = False
     try:
-        from pdf2image import convert_from_path
+        from pdf2image import convert_from_path, pdfinfo_from_path
         USE_PDF2IMAGE = True
     except ImportError:
         print("[ERR] Errore: PyMuPDF o pdf2image non installati")
@@ -26,6 +28,7 @@ except ImportError:
 
 try:
     import easyocr
+    import numpy as np
 except ImportError:
     print("[ERR] Errore: easyocr non installato")
     print("   Installa con: pip install easyocr")
@@ -38,6 +41,18 @@ except ImportError:
     print("   Installa con: pip install Pillow")
     sys.exit(1)
 
+from ocr_cache import OCRCache, page_fingerprint, pixels_fingerprint, make_key
+from ocr_cache import add_cache_arguments, cache_config_from_args
+from ocr_journal import OutputJournal, pdf_signature
+from pdf_text_layer import classify_page, text_layer_result, SOURCE_OCR, SOURCE_TEXT_LAYER
+from ocr_quality import needs_higher_dpi, record_attempt, page_report, policy_info
+from ocr_quality import add_adaptive_arguments, adaptive_policy_from_args
+from ocr_preprocess import preprocess_image, shift_boxes, with_timings, merge_timings, StageTimes, preprocess_info
+from ocr_preprocess import preprocess_description, add_preprocess_arguments, preprocess_options_from_args
+from quiz_layout_parser import QuizJsonlWriter
+from ocr_events import RunEvents, ocr_page_metrics, add_events_arguments, events_from_args
+from ocr_pipeline import run_pipeline, chain_stages, PDF_LOCK
+
 # Configurazione
 PDF_PATH = os.path.join("Ulteriori quiz", "ssfo-quiz-modello7.pdf")
 OUTPUT_TEXT_FILE = os.path.join("Ulteriori quiz", "ssfo-quiz-modello7.txt")
@@ -45,6 +60,51 @@ OUTPUT_TEXT_FILE = os.path.join("Ulteriori quiz", "ssfo-quiz-modello7.txt")
 # Lingue per OCR (italiano + inglese)
 OCR_LANGUAGES = ['it', 'en']
 
+# Pagine renderizzate per volta con pdf2image (PyMuPDF renderizza una pagina alla volta)
+PAGES_PER_CHUNK = 4
+
+# Pagine passate insieme a EasyOCR (readtext_batched); devono avere le stesse dimensioni
+OCR_BATCH_SIZE = 4
+
+# Reader EasyOCR e cache OCR del processo worker (creati una sola volta in _init_ocr_worker)
+_worker_reader = None
+_worker_cache = None
+
+# Wrapper di stdout che filtra i caratteri problematici per Windows
+class SafeStdout:
+    def __init__(self, original):
+        self.original = original
+        
+    def write(self, text):
+        # Filtra caratteri problematici per Windows
+        try:
+            safe_text = text.encode('utf-8', errors='ignore').decode('utf-8', errors='ignore')
+            # Rimuovi caratteri di progresso problematici
+            safe_text = safe_text.replace('\u2588', '#').replace('\u2589', '#').replace('\u258a', '#')
+            safe_text = safe_text.replace('\u258b', '#').replace('\u258c', '#').replace('\u258d', '#')
+            safe_text = safe_text.replace('\u258e', '#').replace('\u258f', '#')
+            self.original.write(safe_text)
+        except:
+            pass
+            
+    def flush(self):
+        self.original.flush()
+        
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+def create_reader():
+    """Crea il Reader EasyOCR (carica i modelli, ~500MB)"""
+    # Disabilita la barra di progresso per evitare problemi di encoding su Windows
+    original_stdout = sys.stdout
+    sys.stdout = SafeStdout(sys.stdout)
+    
+    try:
+        return easyocr.Reader(OCR_LANGUAGES, gpu=False, verbose=False)
+    finally:
+        # Ripristina stdout originale
+        sys.stdout = original_stdout
+
 def check_dependencies():
     """Verifica che tutte le dipendenze siano installate"""
     print("[*] Verifica dipendenze...")
@@ -54,44 +114,7 @@ def check_dependencies():
         print("[*] Inizializzazione EasyOCR (prima volta puo' richiedere download modelli)...")
         print("    (Il download dei modelli puo' richiedere alcuni minuti e ~500MB)")
         
-        # Disabilita la barra di progresso per evitare problemi di encoding su Windows
-        import sys
-        import io
-        
-        # Salva stdout originale
-        original_stdout = sys.stdout
-        
-        # Crea un wrapper che filtra i caratteri problematici
-        class SafeStdout:
-            def __init__(self, original):
-                self.original = original
-                
-            def write(self, text):
-                # Filtra caratteri problematici per Windows
-                try:
-                    safe_text = text.encode('utf-8', errors='ignore').decode('utf-8', errors='ignore')
-                    # Rimuovi caratteri di progresso problematici
-                    safe_text = safe_text.replace('\u2588', '#').replace('\u2589', '#').replace('\u258a', '#')
-                    safe_text = safe_text.replace('\u258b', '#').replace('\u258c', '#').replace('\u258d', '#')
-                    safe_text = safe_text.replace('\u258e', '#').replace('\u258f', '#')
-                    self.original.write(safe_text)
-                except:
-                    pass
-                    
-            def flush(self):
-                self.original.flush()
-                
-            def __getattr__(self, name):
-                return getattr(self.original, name)
-        
-        # Usa il wrapper durante l'inizializzazione
-        sys.stdout = SafeStdout(sys.stdout)
-        
-        try:
-            reader = easyocr.Reader(OCR_LANGUAGES, gpu=False, verbose=False)
-        finally:
-            # Ripristina stdout originale
-            sys.stdout = original_stdout
+        reader = create_reader()
             
         print("[OK] EasyOCR inizializzato correttamente")
         return reader
@@ -101,138 +124,673 @@ def check_dependencies():
         print("   Questo puo' richiedere alcuni minuti e ~500MB di spazio")
         return None
 
-def extract_text_from_pdf_ocr(pdf_path, output_file, reader, dpi=300):
+def get_pdf_page_count(pdf_path):
+    """Restituisce il numero di pagine del PDF"""
+    if USE_PYMUPDF:
+        with fitz.open(pdf_path) as pdf_document:
+            return pdf_document.page_count
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+def iter_page_batches(pdf_path, dpi=300, first_page=1, last_page=None, batch_size=OCR_BATCH_SIZE, render_threads=4, cache=None, text_layer=False, preprocess=None):
+    """
+    Renderizza le pagine di un intervallo in scala di grigi e le raggruppa in batch
+    
+    Con PyMuPDF l'array NumPy è una vista diretta sul buffer della pixmap
+    (nessuna codifica PNG e nessuna copia): le viste restano valide solo fino
+    alla richiesta del batch successivo. Un batch contiene al massimo batch_size
+    pagine da riconoscere, tutte con le stesse dimensioni come richiesto da
+    readtext_batched; le pagine già pronte (cache o livello di testo) non hanno array.
+    Con preprocess le pagine sono array nuovi (vedi ocr_preprocess.py) e, dato che
+    il ritaglio dei margini cambia le dimensioni, vengono raggruppate comunque:
+    iter_ocr_pages le allinea con fondo bianco prima di readtext_batched.
+    
+    Args:
+        pdf_path: percorso del file PDF
+        dpi: risoluzione per la conversione PDF->immagine
+        first_page: prima pagina da renderizzare (1-based)
+        last_page: ultima pagina da renderizzare (None = fino alla fine)
+        batch_size: numero massimo di pagine da riconoscere per batch
+        render_threads: thread di poppler (solo pdf2image)
+        cache: OCRCache opzionale
+        text_layer: leggi con PyMuPDF le pagine che hanno un livello di testo
+        preprocess: opzioni Preprocess (None = pagine così come renderizzate)
+    
+    Yields:
+        lista di (numero_pagina, array NumPy 2D uint8 o None, chiave cache, risultato pronto o None,
+                  (spostamento dei riquadri, tempi per fase) o None)
+    """
+    if last_page is None:
+        last_page = get_pdf_page_count(pdf_path)
+    
+    pages = _iter_gray_pages(pdf_path, dpi, first_page, last_page, render_threads, cache, text_layer, preprocess)
+    return _group_batches(pages, batch_size, preprocess)
+
+def _group_batches(pages, batch_size, preprocess=None):
+    """Raggruppa le pagine di _iter_gray_pages nei batch di iter_page_batches"""
+    batch = []
+    # Riferimenti alle pixmap: mantengono valido il buffer delle viste del batch corrente
+    pixmaps = []
+    pending = 0
+    
+    for page_num, img_array, pixmap, key, ready, prepared in pages:
+        if img_array is None:
+            if pending == 0:
+                # Nessuna pagina in attesa di OCR: il risultato pronto esce subito
+                yield [(page_num, None, key, ready, None)]
+            else:
+                batch.append((page_num, None, key, ready, None))
+            continue
+        
+        if pending and (pending >= batch_size or (img_array.shape != batch_shape and preprocess is None)):
+            yield batch
+            batch, pixmaps, pending = [], [], 0
+        
+        batch_shape = img_array.shape
+        batch.append((page_num, img_array, key, None, prepared))
+        pixmaps.append(pixmap)
+        pending += 1
+    
+    if batch:
+        yield batch
+
+def _cache_key(fingerprint, dpi, preprocess=None):
+    """Chiave della cache OCR per una pagina riconosciuta con EasyOCR (il preprocessing cambia il risultato)"""
+    if preprocess is None:
+        return make_key(fingerprint, 'easyocr', '+'.join(OCR_LANGUAGES), dpi)
+    return make_key(fingerprint, 'easyocr', '+'.join(OCR_LANGUAGES), dpi, preprocess=preprocess_info(preprocess))
+
+def _prepare_page(img_array, pixmap, render_seconds, dpi, preprocess):
+    """
+    Applica il preprocessing a una pagina renderizzata
+    
+    Returns:
+        (array per l'OCR, pixmap, (spostamento dei riquadri, tempi per fase))
+    """
+    if preprocess is None:
+        return img_array, pixmap, ((0, 0), {"rendering": render_seconds})
+    # Con il solo ritaglio il risultato è ancora una vista sul buffer: la pixmap resta referenziata
+    img_array, offset, timings = preprocess_image(img_array, preprocess, dpi)
+    timings["rendering"] = render_seconds
+    return img_array, pixmap, (offset, timings)
+
+def _iter_gray_pages(pdf_path, dpi, first_page, last_page, render_threads, cache=None, text_layer=False, preprocess=None, copy=False):
+    """
+    Restituisce una pagina alla volta come
+    (numero_pagina, array in scala di grigi o None, pixmap o None, chiave cache, risultato pronto o None,
+     (spostamento dei riquadri, tempi per fase) o None)
+    """
+    pages = _iter_rendered_pages(pdf_path, dpi, first_page, last_page, render_threads, cache, text_layer, preprocess, copy)
+    return _iter_prepared_pages(pages, dpi, preprocess)
+
+def _iter_prepared_pages(pages, dpi, preprocess):
+    """Applica _prepare_page alle pagine di _iter_rendered_pages (i secondi di rendering diventano (spostamento, tempi))"""
+    for page_num, img_array, pixmap, key, ready, render_seconds in pages:
+        if img_array is None:
+            yield page_num, None, None, key, ready, None
+        else:
+            img_array, pixmap, prepared = _prepare_page(img_array, pixmap, render_seconds, dpi, preprocess)
+            yield page_num, img_array, pixmap, key, None, prepared
+
+def _render_page(pdf_document, page_num, mat, dpi, cache, text_layer, preprocess, copy):
+    """Una pagina di _iter_rendered_pages con PyMuPDF (da chiamare sotto PDF_LOCK)"""
+    page = pdf_document[page_num - 1]
+    
+    if text_layer:
+        # Pagina digitale: il testo si legge senza rendering né OCR
+        needs_ocr, text, _ = classify_page(page)
+        if not needs_ocr:
+            return page_num, None, None, None, text_layer_result(page, text, dpi), None
+    
+    key = None
+    if cache is not None:
+        # L'impronta del contenuto evita anche il rendering delle pagine in cache
+        key = _cache_key(page_fingerprint(pdf_document, page_num - 1), dpi, preprocess)
+        cached = cache.get(key)
+        if cached is not None:
+            return page_num, None, None, key, dict(cached, cached=True), None
+    
+    # Renderizza direttamente in scala di grigi, senza canale alpha
+    start_time = time.perf_counter()
+    pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+    # Vista sul buffer della pixmap (stride può includere padding)
+    img_array = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+    img_array = img_array.reshape(pix.height, pix.stride)[:, :pix.width]
+    if copy:
+        # Array indipendente: la pixmap viene liberata qui, sotto il lock
+        img_array, pix = img_array.copy(), None
+    return page_num, img_array, pix, key, None, time.perf_counter() - start_time
+
+def _iter_rendered_pages(pdf_path, dpi, first_page, last_page, render_threads, cache=None, text_layer=False, preprocess=None, copy=False):
+    """
+    Restituisce una pagina alla volta come
+    (numero_pagina, array in scala di grigi o None, pixmap o None, chiave cache, risultato pronto o None,
+     secondi di rendering o None)
+    
+    preprocess serve solo per la chiave della cache (il preprocessing è in
+    _iter_prepared_pages). Con copy gli array non sono viste sulle pixmap e
+    nessun oggetto PyMuPDF esce dal generatore: serve quando le pagine
+    passano ad altri thread (pipeline).
+    """
+    if USE_PYMUPDF:
+        # Usa PyMuPDF (non richiede Poppler)
+        with PDF_LOCK:
+            pdf_document = fitz.open(pdf_path)
+        try:
+            mat = fitz.Matrix(dpi/72, dpi/72)  # 72 è il DPI standard di PDF
+            for page_num in range(first_page, last_page + 1):
+                with PDF_LOCK:
+                    rendered = _render_page(pdf_document, page_num, mat, dpi, cache, text_layer, preprocess, copy)
+                yield rendered
+        finally:
+            with PDF_LOCK:
+                pdf_document.close()
+    else:
+        # Usa pdf2image (richiede Poppler), a blocchi di PAGES_PER_CHUNK pagine
+        for start in range(first_page, last_page + 1, PAGES_PER_CHUNK):
+            end = min(start + PAGES_PER_CHUNK - 1, last_page)
+            start_time = time.perf_counter()
+            images = convert_from_path(
+                pdf_path,
+                dpi=dpi,
+                grayscale=True,
+                first_page=start,
+                last_page=end,
+                thread_count=min(render_threads, end - start + 1)
+            )
+            # Il tempo del blocco viene attribuito alla sua prima pagina
+            render_seconds = time.perf_counter() - start_time
+            page_num = start
+            while images:
+                image = images.pop(0)
+                img_array = np.asarray(image.convert('L'))
+                image.close()
+                
+                key = cached = None
+                if cache is not None:
+                    # Senza PyMuPDF l'impronta si calcola sui pixel renderizzati
+                    key = _cache_key(pixels_fingerprint(img_array), dpi, preprocess)
+                    cached = cache.get(key)
+                
+                if cached is not None:
+                    yield page_num, None, None, key, dict(cached, cached=True), None
+                else:
+                    yield page_num, img_array, None, key, None, render_seconds
+                render_seconds = 0.0
+                page_num += 1
+
+def _to_page_result(results, offset=(0, 0), pixels=None):
+    """
+    Converte l'output di readtext in {"text", "words", "boxes", "confidences"} (riquadri spostati di offset)
+    
+    pixels è la dimensione della pagina passata a EasyOCR (senza il riempimento del batch).
+    """
+    words, boxes, confidences = [], [], []
+    for points, text, conf in results:
+        xs = [point[0] for point in points]
+        ys = [point[1] for point in points]
+        words.append(text)
+        boxes.append([int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))])
+        confidences.append(round(float(conf), 4))
+    boxes = shift_boxes(boxes, offset)
+    return {
+        "text": '\n'.join(words), "words": words, "boxes": boxes, "confidences": confidences,
+        "source": SOURCE_OCR, "pixels": pixels
+    }
+
+def _pad_to_same_shape(arrays):
+    """Allinea le pagine di un batch alle stesse dimensioni aggiungendo fondo bianco a destra e in basso"""
+    height = max(array.shape[0] for array in arrays)
+    width = max(array.shape[1] for array in arrays)
+    return [
+        array if array.shape == (height, width)
+        else np.pad(array, ((0, height - array.shape[0]), (0, width - array.shape[1])), constant_values=255)
+        for array in arrays
+    ]
+
+def _ocr_page_at_dpi(reader, pdf_path, page_num, dpi, cache=None, preprocess=None):
+    """Renderizza una singola pagina alla risoluzione indicata e ne restituisce il risultato OCR (con cache)"""
+    # copy: la pagina può essere riconosciuta in un thread della pipeline diverso dal rendering
+    for _, img_array, pix, key, ready, prepared in _iter_gray_pages(pdf_path, dpi, page_num, page_num, 1, cache, preprocess=preprocess, copy=True):
+        if ready is not None:
+            return ready
+        offset, timings = prepared
+        start_time = time.perf_counter()
+        result = _to_page_result(reader.readtext(img_array), offset, img_array.shape[0] * img_array.shape[1])
+        timings["ocr"] = time.perf_counter() - start_time
+        if cache is not None:
+            cache.put(key, result)
+        return with_timings(result, timings)
+
+def _refine_result(result, reader, pdf_path, page_num, dpi, cache, adaptive, preprocess=None):
+    """Annota il DPI del risultato e, in modalità adattiva, riprova a DPI più alti se la confidenza è bassa"""
+    result = record_attempt(result, dpi)
+    if adaptive is None:
+        return result
+    
+    for higher_dpi in adaptive.steps[1:]:
+        if not needs_higher_dpi(result, adaptive):
+            break
+        retry = _ocr_page_at_dpi(reader, pdf_path, page_num, higher_dpi, cache, preprocess)
+        if "timings" in result:
+            # Il tempo speso nei tentativi precedenti resta nel conto della pagina
+            retry = with_timings(retry, merge_timings(result["timings"], retry.get("timings")))
+        result = record_attempt(retry, higher_dpi, previous=result)
+    return result
+
+def _iter_recognized(batches, reader, batch_size, cache=None, preprocess=None):
+    """
+    Stadio OCR di iter_ocr_pages: riconosce i batch di pagine con EasyOCR
+    
+    Yields:
+        (numero_pagina, risultato, errore) nell'ordine delle pagine
+    """
+    for batch in batches:
+        todo = [(page_num, img_array, prepared) for page_num, img_array, _, ready, prepared in batch if ready is None]
+        results = {}
+        error = None
+        
+        if todo:
+            try:
+                start_time = time.perf_counter()
+                if len(todo) > 1:
+                    arrays = [img_array for _, img_array, _ in todo]
+                    if preprocess is not None:
+                        arrays = _pad_to_same_shape(arrays)
+                    batch_results = reader.readtext_batched(arrays, batch_size=batch_size)
+                else:
+                    batch_results = [reader.readtext(todo[0][1])]
+                ocr_seconds = (time.perf_counter() - start_time) / len(todo)
+                for (page_num, img_array, (offset, timings)), page_results in zip(todo, batch_results):
+                    page_result = _to_page_result(page_results, offset, img_array.shape[0] * img_array.shape[1])
+                    results[page_num] = (page_result, dict(timings, ocr=ocr_seconds))
+            except Exception as e:
+                error = str(e)
+        
+        for page_num, _, key, ready, _ in batch:
+            if ready is not None:
+                yield page_num, ready, None
+            elif error is not None:
+                yield page_num, None, error
+            else:
+                result, timings = results[page_num]
+                if cache is not None:
+                    cache.put(key, result)
+                yield page_num, with_timings(result, timings), None
+
+def _iter_refined(pages, reader, pdf_path, dpi, cache=None, adaptive=None, preprocess=None):
+    """Stadio OCR di iter_ocr_pages: DPI del risultato e nuovi tentativi della modalità adattiva"""
+    for page_num, result, error in pages:
+        if error is None and result.get("source") == SOURCE_OCR:
+            try:
+                result = _refine_result(result, reader, pdf_path, page_num, dpi, cache, adaptive, preprocess)
+            except Exception as e:
+                result, error = None, str(e)
+        yield page_num, result, error
+
+def iter_ocr_pages(reader, pdf_path, dpi=300, first_page=1, last_page=None, batch_size=OCR_BATCH_SIZE, render_threads=4, cache=None, text_layer=False, adaptive=None, preprocess=None, pipeline=False, pipeline_stats=None):
+    """
+    Applica EasyOCR alle pagine di un intervallo, un batch di pagine alla volta
+    
+    Con adaptive (AdaptiveDPI) le pagine vengono renderizzate al primo DPI
+    della politica; quelle con confidenza bassa vengono renderizzate di nuovo,
+    una alla volta, ai DPI successivi. Con preprocess (Preprocess) ogni pagina
+    passa per ocr_preprocess.py prima di EasyOCR. I risultati riconosciuti
+    hanno i tempi per fase in "timings" (l'OCR di un batch è diviso tra le sue pagine).
+    
+    Con pipeline rendering, preprocessing e OCR girano in thread separati
+    collegati da code limitate (vedi ocr_pipeline.py); le pagine renderizzate
+    vengono copiate fuori dalle pixmap per passare da un thread all'altro.
+    I nuovi tentativi della modalità adattiva restano nel thread dell'OCR,
+    perché il Reader non va usato da più thread insieme.
+    
+    Args:
+        pipeline_stats: lista in cui aggiungere i tempi degli stadi (StageStats, solo con pipeline)
+    
+    Yields:
+        (numero_pagina, risultato, errore) - risultato è None se l'OCR della pagina è fallito
+    """
+    if adaptive is not None:
+        dpi = adaptive.steps[0]
+    if last_page is None:
+        last_page = get_pdf_page_count(pdf_path)
+    
+    source = _iter_rendered_pages(pdf_path, dpi, first_page, last_page, render_threads, cache, text_layer, preprocess, copy=pipeline)
+    stages = [
+        ("preprocessing", lambda pages: _iter_prepared_pages(pages, dpi, preprocess)),
+        ("ocr", lambda pages: _iter_refined(
+            _iter_recognized(_group_batches(pages, batch_size, preprocess), reader, batch_size, cache, preprocess),
+            reader, pdf_path, dpi, cache, adaptive, preprocess
+        )),
+    ]
+    if not pipeline:
+        yield from chain_stages(source, stages)
+        return
+    
+    with run_pipeline(source, stages) as pages:
+        if pipeline_stats is not None:
+            pipeline_stats.extend(pages.stats)
+        yield from pages
+
+def _init_ocr_worker(cache_config):
+    """Inizializzazione dei processi worker: ogni processo carica il proprio Reader una volta"""
+    global _worker_reader, _worker_cache
+    
+    # Un solo thread di calcolo per processo: il parallelismo viene dal pool
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    
+    _worker_reader = create_reader()
+    _worker_cache = OCRCache(*cache_config) if cache_config else None
+
+def _ocr_page_range_worker(task):
+    """Eseguita nei worker: renderizza dal PDF e applica l'OCR a un intervallo di pagine"""
+    pdf_path, first_page, last_page, dpi, batch_size, text_layer, adaptive, preprocess, pipeline = task
+    return list(iter_ocr_pages(
+        _worker_reader, pdf_path, dpi, first_page, last_page, batch_size,
+        render_threads=1,
+        cache=_worker_cache,
+        text_layer=text_layer,
+        adaptive=adaptive,
+        preprocess=preprocess,
+        pipeline=pipeline
+    ))
+
+def iter_ocr_pages_parallel(pdf_path, total_pages, dpi, workers, chunk_size=PAGES_PER_CHUNK, batch_size=OCR_BATCH_SIZE, cache_config=None, first_page=1, text_layer=False, adaptive=None, preprocess=None, pipeline=False):
+    """
+    Distribuisce blocchi di chunk_size pagine su un pool di processi
+    
+    Ogni worker renderizza le proprie pagine partendo dal percorso del PDF,
+    quindi tra i processi viaggiano solo intervalli di pagine e testo.
+    Con pipeline ogni worker esegue i propri stadi in thread separati.
+    
+    Yields:
+        (numero_pagina, risultato, errore) nell'ordine delle pagine
+    """
+    tasks = [
+        (pdf_path, start, min(start + chunk_size - 1, total_pages), dpi, batch_size, text_layer, adaptive, preprocess, pipeline)
+        for start in range(first_page, total_pages + 1, chunk_size)
+    ]
+    
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_ocr_worker,
+        initargs=(cache_config,)
+    )
+    try:
+        # map restituisce i blocchi nell'ordine di invio: le pagine restano ordinate
+        for chunk_results in executor.map(_ocr_page_range_worker, tasks):
+            yield from chunk_results
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def print_page_event(event):
+    """Vista della console sugli eventi di pagina: la riga "Pagina i/N..." con l'esito"""
+    if event["event"] != "page":
+        return
+    print(f"   Pagina {event['page']}/{event['total_pages']}...", end=' ')
+    if event["error"] is not None:
+        print(f"[ERR] Errore pagina {event['page']}: {event['error']}")
+    elif not event.get("chars"):
+        print("[WARN] (nessun testo rilevato)")
+    elif event.get("source") == SOURCE_TEXT_LAYER:
+        print("[OK] (livello di testo)")
+    else:
+        print("[OK] (cache)" if event.get("cached") else "[OK]")
+
+def extract_text_from_pdf_ocr(pdf_path, output_file, reader, dpi=300, workers=1, batch_size=OCR_BATCH_SIZE, cache_config=None, resume=False, text_layer=True, adaptive=None, quiz_jsonl=None, preprocess=None, events=None, pipeline=False):
     """
     Estrae testo da PDF scansionato usando EasyOCR
     
     Args:
         pdf_path: percorso del file PDF
         output_file: percorso del file di output per il testo
-        reader: oggetto EasyOCR Reader
+        reader: oggetto EasyOCR Reader (non usato con workers > 1)
         dpi: risoluzione per la conversione PDF->immagine (default: 300)
+        workers: processi OCR in parallelo, ognuno con il proprio Reader (default: 1)
+        batch_size: pagine per chiamata a readtext_batched (default: OCR_BATCH_SIZE)
+        cache_config: (cartella, MB massimi) della cache OCR, None per disattivarla
+        resume: riprendi un'esecuzione interrotta dalla prima pagina non completata
+        text_layer: leggi senza OCR le pagine con un livello di testo (richiede PyMuPDF);
+                    ogni pagina viene etichettata con il metodo di estrazione
+        adaptive: politica AdaptiveDPI (ignora dpi e parte dal primo DPI della politica)
+        quiz_jsonl: file JSON Lines in cui scrivere i quiz ricostruiti dalle pagine
+                    man mano che vengono riconosciute (vedi quiz_layout_parser.py)
+        preprocess: opzioni Preprocess delle fasi tra rendering e OCR
+                    (vedi ocr_preprocess.py), None per passare le pagine così come sono
+        events: RunEvents che riceve gli eventi di avanzamento per pagina
+                (vedi ocr_events.py); default: solo la riga di console per pagina
+        pipeline: esegui rendering, preprocessing e OCR come stadi concorrenti
+                  collegati da code limitate (vedi ocr_pipeline.py), mentre
+                  questa funzione scrive l'output delle pagine già pronte
     """
+    if events is None:
+        events = RunEvents('easyocr', listeners=[print_page_event])
     
     if not os.path.exists(pdf_path):
         print(f"[ERR] File PDF non trovato: {pdf_path}")
+        events.finish(ok=False, error=f"File PDF non trovato: {pdf_path}")
         return False
     
     print(f"Apertura PDF: {pdf_path}")
     
     try:
-        # Converti PDF in immagini
-        print(f"Conversione PDF in immagini (DPI: {dpi})...")
-        print("   (Questo puo' richiedere alcuni minuti per PDF grandi)")
-        
-        if USE_PYMUPDF:
-            # Usa PyMuPDF (non richiede Poppler)
-            pdf_document = fitz.open(pdf_path)
-            total_pages = pdf_document.page_count
-            images = []
-            
-            for page_num in range(total_pages):
-                page = pdf_document[page_num]
-                # Converti pagina in immagine con la risoluzione specificata
-                mat = fitz.Matrix(dpi/72, dpi/72)  # 72 è il DPI standard di PDF
-                pix = page.get_pixmap(matrix=mat)
-                # Converti in PIL Image
-                img_data = pix.tobytes("png")
-                from io import BytesIO
-                img = Image.open(BytesIO(img_data))
-                images.append(img)
-                
-            pdf_document.close()
+        total_pages = get_pdf_page_count(pdf_path)
+        if adaptive is not None:
+            dpi = adaptive.steps[0]
+            print(f"[OK] PDF con {total_pages} pagine (DPI adattivo: {', '.join(str(step) for step in adaptive.steps)})\n")
         else:
-            # Usa pdf2image (richiede Poppler)
-            images = convert_from_path(
-                pdf_path,
-                dpi=dpi,
-                fmt='png',
-                thread_count=4
-            )
-        
-        total_pages = len(images)
-        print(f"[OK] Convertite {total_pages} pagine in immagini\n")
-        
+            print(f"[OK] PDF con {total_pages} pagine (DPI: {dpi})\n")
+        if preprocess is not None:
+            print(f"[INFO] Preprocessing: {preprocess_description(preprocess)}\n")
+        if pipeline:
+            print("[INFO] Pipeline: rendering, preprocessing, OCR e scrittura in stadi concorrenti\n")
     except Exception as e:
-        print(f"[ERR] Errore durante la conversione PDF: {e}")
+        print(f"[ERR] Errore durante la lettura del PDF: {e}")
         if not USE_PYMUPDF:
             print("\n[INFO] Assicurati che poppler sia installato")
             print("   Windows: Scarica da https://github.com/oschwartz10612/poppler-windows/releases")
             print("   Oppure: conda install -c conda-forge poppler")
+        events.finish(ok=False, error=str(e))
         return False
     
+    if text_layer and not USE_PYMUPDF:
+        print("[WARN] PyMuPDF non installato: tutte le pagine passano dall'OCR")
+        text_layer = False
+    
+    run_info = dict(
+        pdf_signature(pdf_path),
+        engine='easyocr', lang='+'.join(OCR_LANGUAGES), dpi=dpi, text_layer=text_layer,
+        adaptive=policy_info(adaptive), preprocess=preprocess_info(preprocess)
+    )
+    journal = OutputJournal(output_file, run_info, resume=resume)
+    first_page = journal.next_page
+    if journal.resumed:
+        print(f"[OK] Ripresa dalla pagina {first_page}/{total_pages}\n")
+    events.start(total_pages, total_pages - first_page + 1, first_page=first_page, output=output_file, **run_info)
+    
+    # Con la ripresa i quiz già scritti restano e i nuovi vengono aggiunti
+    quiz_writer = QuizJsonlWriter(quiz_jsonl, append=journal.resumed) if quiz_jsonl else None
+    
     # Estrai testo da ogni immagine usando OCR
-    all_text = []
+    pages_from_cache = 0
+    pages_from_text_layer = 0
+    stage_times = StageTimes()
+    pipeline_stats = []
+    cache = None
     
     print(f"Estrazione testo con EasyOCR (lingue: {', '.join(OCR_LANGUAGES)})...")
+    if workers > 1:
+        print(f"   (Modalita' parallela: {workers} processi, ognuno carica i modelli)")
     print("   (Questo puo' richiedere tempo, specialmente per PDF grandi)\n")
     
-    for i, image in enumerate(images, 1):
-        try:
-            print(f"   Pagina {i}/{total_pages}...", end=' ', flush=True)
-            
-            # Converti PIL Image in numpy array per EasyOCR
-            import numpy as np
-            if isinstance(image, Image.Image):
-                img_array = np.array(image)
-            else:
-                img_array = image
-            
-            # Applica OCR all'immagine
-            results = reader.readtext(img_array)
-            
-            # Estrai solo il testo (ignora coordinate e confidenza)
-            page_text = '\n'.join([result[1] for result in results])
+    if workers > 1:
+        pages = iter_ocr_pages_parallel(pdf_path, total_pages, dpi, workers, batch_size=batch_size, cache_config=cache_config, first_page=first_page, text_layer=text_layer, adaptive=adaptive, preprocess=preprocess, pipeline=pipeline)
+    else:
+        cache = OCRCache(*cache_config) if cache_config else None
+        pages = iter_ocr_pages(
+            reader, pdf_path, dpi,
+            first_page=first_page,
+            last_page=total_pages,
+            batch_size=batch_size,
+            cache=cache,
+            text_layer=text_layer,
+            adaptive=adaptive,
+            preprocess=preprocess,
+            pipeline=pipeline,
+            pipeline_stats=pipeline_stats
+        )
+    
+    try:
+        while True:
+            try:
+                i, result, error = next(pages)
+            except StopIteration:
+                break
+            except Exception as e:
+                print(f"[ERR] Errore durante la conversione PDF: {e}")
+                print("   Le pagine completate sono salvate: riprendi con --resume")
+                events.finish(ok=False, error=str(e))
+                return False
             
-            if page_text.strip():
-                all_text.append(f"=== PAGINA {i} ===\n{page_text}\n")
-                print("[OK]")
-            else:
-                print("[WARN] (nessun testo rilevato)")
+            try:
+                if error is not None:
+                    raise RuntimeError(error)
                 
-        except Exception as e:
-            print(f"[ERR] Errore pagina {i}: {e}")
-            continue
+                page_text = result["text"]
+                source = result.get("source")
+                if result.get("cached"):
+                    pages_from_cache += 1
+                if source == SOURCE_TEXT_LAYER:
+                    pages_from_text_layer += 1
+                stage_times.add(result)
+                
+                journal.add_page(i, page_text, source if text_layer else None, page_report(i, result))
+                if quiz_writer is not None:
+                    quiz_writer.add_page(i, result)
+                events.page(
+                    i, ocr_page_metrics(result),
+                    source=source, cached=bool(result.get("cached")), dpi=result.get("dpi", dpi)
+                )
+                    
+            except Exception as e:
+                journal.add_page(i, None, report={"page": i, "error": str(e)})
+                events.page(i, error=str(e))
+                continue
+    except KeyboardInterrupt:
+        print("\n\n[INFO] Interrotto: le pagine completate sono salvate, riprendi con --resume")
+        events.finish(ok=False, error="interrotto")
+        return False
+    finally:
+        pages.close()
+        if cache is not None:
+            cache.close()
+        journal.close()
+        if quiz_writer is not None:
+            # Il quiz in corso viene scritto solo a fine documento (non dopo un'interruzione)
+            quiz_writer.close(finish=journal.next_page > total_pages)
     
-    # Salva il testo estratto
-    if all_text:
-        output_path = Path(output_file)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(all_text))
-        
+    ok = journal.finish()
+    events.finish(ok=ok, total_chars=journal.total_chars)
+    if ok:
         print(f"\n[OK] Testo estratto salvato in: {output_file}")
         print(f"Totale pagine processate: {total_pages}")
-        print(f"Totale caratteri estratti: {sum(len(t) for t in all_text)}")
+        if text_layer:
+            print(f"Pagine lette dal livello di testo (senza OCR): {pages_from_text_layer}")
+        if cache_config:
+            print(f"Pagine lette dalla cache OCR: {pages_from_cache}")
+        print(f"Totale caratteri estratti: {journal.total_chars}")
+        print(f"Report per pagina (DPI e confidenza): {journal.report_file}")
+        if quiz_writer is not None:
+            print(f"Quiz ricostruiti: {quiz_writer.parser.quizzes} in {quiz_jsonl}")
+        if stage_times.pages:
+            print(f"Tempi per fase ({stage_times.pages} pagine riconosciute in questa esecuzione):")
+            for line in stage_times.lines():
+                print(f"   {line}")
+        if pipeline_stats:
+            print("Stadi della pipeline (lavoro / attesa sulle code):")
+            for stats in pipeline_stats:
+                print(f"   {stats.name}: {stats.busy:.1f}s / {stats.waiting:.1f}s")
         return True
     else:
         print("\n[WARN] Nessun testo estratto")
         return False
 
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Estrae testo da PDF scansionato con EasyOCR")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="processi OCR in parallelo, ognuno con i propri modelli (default: 1; 0 = tutti i core)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=OCR_BATCH_SIZE,
+        help=f"pagine per batch di EasyOCR (default: {OCR_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--force-ocr", action="store_true",
+        help="applica l'OCR a tutte le pagine, anche a quelle con un livello di testo"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="riprendi un'esecuzione interrotta dalla prima pagina non completata"
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="esegui rendering, preprocessing, OCR e scrittura come stadi concorrenti con code limitate"
+    )
+    add_cache_arguments(parser)
+    parser.add_argument(
+        "--quiz-jsonl", metavar="FILE",
+        help="scrivi anche i quiz (domanda, opzioni A-E, risposta) ricostruiti dai riquadri OCR in JSON Lines"
+    )
+    add_adaptive_arguments(parser)
+    add_preprocess_arguments(parser)
+    add_events_arguments(parser)
+    return parser.parse_args()
+
 def main():
     """Funzione principale"""
     
+    args = parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    events = events_from_args(args, 'easyocr', print_page_event)
+    
     print("=" * 60)
     print("  ESTRATTORE TESTO DA PDF SCANNERIZZATO - EasyOCR")
     print("=" * 60)
     print()
     
-    # Verifica e inizializza EasyOCR
-    reader = check_dependencies()
-    if reader is None:
-        print("\n[ERR] Impossibile inizializzare EasyOCR")
-        return
-    
-    print()
+    # Verifica e inizializza EasyOCR (in modalità parallela ogni worker crea il proprio Reader)
+    reader = None
+    if workers == 1:
+        reader = check_dependencies()
+        if reader is None:
+            print("\n[ERR] Impossibile inizializzare EasyOCR")
+            return
+        
+        print()
     
     # Estrai testo
     success = extract_text_from_pdf_ocr(
         PDF_PATH,
         OUTPUT_TEXT_FILE,
         reader,
-        dpi=300
+        dpi=300,
+        workers=workers,
+        batch_size=args.batch_size,
+        cache_config=cache_config_from_args(args),
+        resume=args.resume,
+        text_layer=not args.force_ocr,
+        adaptive=adaptive_policy_from_args(args),
+        quiz_jsonl=args.quiz_jsonl,
+        preprocess=preprocess_options_from_args(args),
+        events=events,
+        pipeline=args.pipeline
     )
+    events.close()
     
     if success:
         print("\n" + "=" * 60)
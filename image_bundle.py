@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bundle delle immagini dei quiz: un unico file con indice binario
+Usato da extract_pdf_images.py (--format bundle) e leggibile dall'app
+
+Invece di migliaia di file page_XXXX_img_YY.ext, tutte le immagini sono
+concatenate in un solo file: copiarlo, impacchettarlo nelle risorse di
+Electron o cercarvi un'immagine costa una sola apertura di file.
+
+Formato (little-endian):
+    intestazione (24 byte): magic "QIMGBUN1", versione u32, numero voci u32, offset indice u64
+    dati delle immagini, uno dopo l'altro (le immagini ripetute sono salvate una volta)
+    indice: una voce da 24 byte per ogni immagine di ogni pagina, ordinata per (pagina, indice)
+        pagina u32, indice immagine u16, riservato u16, offset u64, lunghezza u32, estensione 4s
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+BUNDLE_MAGIC = b"QIMGBUN1"
+BUNDLE_VERSION = 1
+BUNDLE_SUFFIX = ".bundle"
+
+HEADER = struct.Struct("<8sIIQ")
+ENTRY = struct.Struct("<IHHQI4s")
+
+class BundleWriter:
+    """
+    Scrive un bundle: le immagini vengono aggiunte una alla volta e l'indice alla chiusura
+
+    Il bundle viene scritto in un file temporaneo e rinominato solo a fine
+    scrittura: un bundle esistente non resta mai a metà.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(b'\0' * HEADER.size)
+        self._entries = []
+        # Chiave del contenuto (sha256) -> (offset, lunghezza) dei dati già scritti
+        self._blobs = {}
+
+    def has(self, key):
+        """True se i dati con questa chiave sono già nel bundle"""
+        return key in self._blobs
+
+    def add(self, page, image_index, ext, data=None, key=None):
+        """
+        Aggiunge un'immagine di una pagina
+
+        Args:
+            page: numero della pagina (1-based)
+            image_index: indice dell'immagine nella pagina (1-based)
+            ext: estensione del formato (png, jpeg...)
+            data: byte dell'immagine (non necessari se key è già nel bundle)
+            key: chiave del contenuto (default: sha256 di data); stessa chiave = dati condivisi
+        """
+        if key is None:
+            key = hashlib.sha256(data).hexdigest()
+
+        blob = self._blobs.get(key)
+        if blob is None:
+            if data is None:
+                raise ValueError(f"dati mancanti per l'immagine {image_index} della pagina {page}")
+            blob = (self._file.tell(), len(data))
+            self._file.write(data)
+            self._blobs[key] = blob
+
+        self._entries.append((page, image_index, blob[0], blob[1], ext.encode('ascii')[:4]))
+
+    def close(self):
+        """Scrive indice e intestazione e rende visibile il bundle"""
+        self._entries.sort(key=lambda entry: (entry[0], entry[1]))
+        index_offset = self._file.tell()
+        for page, image_index, offset, length, ext in self._entries:
+            self._file.write(ENTRY.pack(page, image_index, 0, offset, length, ext))
+
+        self._file.seek(0)
+        self._file.write(HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(self._entries), index_offset))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp_path)
+
+class ImageBundle:
+    """
+    Lettura di un bundle tramite mmap
+
+    get() restituisce una memoryview sui byte mappati (nessuna copia); le
+    viste vanno rilasciate (o non più usate) prima di close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"bundle vuoto: {path}")
+        self._view = memoryview(self._mmap)
+
+        magic, version, count, index_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            self.close()
+            raise ValueError(f"formato del bundle non riconosciuto: {path}")
+
+        self._index = self._view[index_offset:index_offset + count * ENTRY.size]
+        # Solo le chiavi (pagina, indice) vengono copiate, per la ricerca binaria
+        self._keys = [(page, image_index) for page, image_index, *_ in ENTRY.iter_unpack(self._index)]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _entry(self, position):
+        """(pagina, indice, offset, lunghezza, estensione) della voce in posizione position"""
+        page, image_index, _, offset, length, ext = ENTRY.unpack_from(self._index, position * ENTRY.size)
+        return page, image_index, offset, length, ext.rstrip(b'\0').decode('ascii')
+
+    def _find(self, page, image_index):
+        position = bisect.bisect_left(self._keys, (page, image_index))
+        if position < len(self._keys) and self._keys[position] == (page, image_index):
+            return position
+        return None
+
+    def get(self, page, image_index=1):
+        """Byte dell'immagine come memoryview (None se la pagina non ha quell'immagine)"""
+        position = self._find(page, image_index)
+        if position is None:
+            return None
+        _, _, offset, length, _ = self._entry(position)
+        return self._view[offset:offset + length]
+
+    def ext(self, page, image_index=1):
+        """Estensione del formato dell'immagine (None se assente)"""
+        position = self._find(page, image_index)
+        return self._entry(position)[4] if position is not None else None
+
+    def page_images(self, page):
+        """Immagini di una pagina: lista di (indice, estensione, memoryview)"""
+        images = []
+        position = bisect.bisect_left(self._keys, (page, 0))
+        while position < len(self._keys) and self._keys[position][0] == page:
+            _, image_index, offset, length, ext = self._entry(position)
+            images.append((image_index, ext, self._view[offset:offset + length]))
+            position += 1
+        return images
+
+    def __iter__(self):
+        """Tutte le voci come (pagina, indice, estensione, memoryview), in ordine"""
+        for position in range(len(self._keys)):
+            page, image_index, offset, length, ext = self._entry(position)
+            yield page, image_index, ext, self._view[offset:offset + length]
+
+    def close(self):
+        if getattr(self, "_index", None) is not None:
+            self._index.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def build_bundle(images_dir, images, bundle_path, variant=None):
+    """
+    Crea il bundle dalle immagini estratte, descritte dalle voci di images-metadata.json
+
+    Ogni voce del metadata diventa una voce dell'indice; i file canonici
+    condivisi da più pagine vengono letti e scritti una sola volta. Con
+    variant (es. "display", vedi image_variants.py) si impacchetta la
+    variante ridotta al posto dell'originale, dove è disponibile.
+
+    Returns:
+        (voci dell'indice, byte di dati scritti)
+    """
+    data_bytes = 0
+    with BundleWriter(bundle_path) as writer:
+        for image in images:
+            filename = image["filename"]
+            if variant and variant in image.get("variants", {}):
+                filename = image["variants"][variant]["filename"]
+            key = filename
+            ext = filename.rsplit('.', 1)[-1]
+            if writer.has(key):
+                writer.add(image["page"], image["image_index"], ext, key=key)
+                continue
+
+            with open(os.path.join(images_dir, filename), 'rb') as f:
+                data = f.read()
+            writer.add(image["page"], image["image_index"], ext, data, key=key)
+            data_bytes += len(data)
+    return len(images), data_bytes
+
+def bundle_path_for(images_dir):
+    """Percorso del bundle accanto alla cartella delle immagini (quiz-images -> quiz-images.bundle)"""
+    return os.path.normpath(images_dir) + BUNDLE_SUFFIX
+
+def main():
+    """Crea il bundle da una cartella di immagini già estratte"""
+    parser = argparse.ArgumentParser(description="Impacchetta le immagini estratte in un unico bundle con indice")
+    parser.add_argument("images_dir", nargs="?", default="quiz-images", help="cartella con images-metadata.json (default: quiz-images)")
+    parser.add_argument("--output", help="percorso del bundle (default: <cartella>.bundle)")
+    parser.add_argument("--variant", help="impacchetta questa variante (es. display) invece degli originali")
+    args = parser.parse_args()
+
+    metadata_path = os.path.join(args.images_dir, "images-metadata.json")
+    try:
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"❌ Errore: impossibile leggere {metadata_path}: {e}")
+        sys.exit(1)
+
+    bundle_path = args.output or bundle_path_for(args.images_dir)
+    entries, data_bytes = build_bundle(args.images_dir, metadata["images"], bundle_path, args.variant)
+    print(f"📦 Bundle creato: {bundle_path} ({entries} voci, {data_bytes // 1024}KB di immagini)")
+
+if __name__ == "__main__":
+    main()
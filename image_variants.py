@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Varianti ridotte delle immagini estratte (WebP per la visualizzazione)
+Usato da extract_pdf_images.py (--variants) o da solo su una cartella già estratta
+
+Le immagini incorporate nel PDF vengono salvate nel formato originale, spesso
+scansioni PNG/JPX molto grandi che l'app deve decodificare a piena risoluzione.
+Per ogni immagine distinta viene creata, con un pool di processi Pillow:
+    display/<nome>.webp  larghezza massima DISPLAY_MAX_WIDTH
+Le varianti più recenti dell'immagine originale non vengono ricreate.
+Il pacchetto dell'app (package.json, "files") contiene solo display/:
+gli originali page_* restano fuori.
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+METADATA_FILE = "images-metadata.json"
+
+DISPLAY_MAX_WIDTH = 1024
+
+# Varianti: nome (= sottocartella) -> larghezza massima in pixel
+VARIANTS = {
+    "display": DISPLAY_MAX_WIDTH,
+}
+
+WEBP_QUALITY = 80
+
+def variant_filename(filename, variant):
+    """Percorso relativo della variante: page_0003_img_01.png -> display/page_0003_img_01.webp"""
+    return f"{variant}/{os.path.splitext(filename)[0]}.webp"
+
+def _is_up_to_date(source_path, variant_path):
+    return os.path.exists(variant_path) and os.path.getmtime(variant_path) >= os.path.getmtime(source_path)
+
+def _variant_info(variant_file, variant_path, width, height):
+    return {
+        "filename": variant_file,
+        "width": width,
+        "height": height,
+        "size_bytes": os.path.getsize(variant_path),
+    }
+
+def make_variants(task):
+    """
+    Crea le varianti di un'immagine (eseguita nei processi worker)
+
+    Args:
+        task: (cartella delle immagini, nome file originale, qualità WebP)
+
+    Returns:
+        (nome file originale, {variante: info}, errore o None, varianti ricreate)
+    """
+    images_dir, filename, quality = task
+    source_path = os.path.join(images_dir, filename)
+    variants = {}
+    created = 0
+    try:
+        image = None
+        for variant, max_width in VARIANTS.items():
+            variant_file = variant_filename(filename, variant)
+            variant_path = os.path.join(images_dir, variant_file)
+
+            if _is_up_to_date(source_path, variant_path):
+                # Solo l'intestazione viene letta per le dimensioni
+                with Image.open(variant_path) as existing:
+                    variants[variant] = _variant_info(variant_file, variant_path, *existing.size)
+                continue
+
+            if image is None:
+                image = Image.open(source_path)
+                image.load()
+                if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                    image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+            resized = image.copy()
+            # thumbnail riduce mantenendo le proporzioni e non ingrandisce mai
+            resized.thumbnail((max_width, max_width * 100), Image.LANCZOS)
+            os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+            tmp_path = variant_path + ".tmp"
+            resized.save(tmp_path, "WEBP", quality=quality, method=4)
+            os.replace(tmp_path, variant_path)
+
+            variants[variant] = _variant_info(variant_file, variant_path, *resized.size)
+            created += 1
+        return filename, variants, None, created
+    except Exception as e:
+        return filename, variants, str(e), created
+
+def generate_variants(images_dir, workers=1, quality=WEBP_QUALITY):
+    """
+    Crea le varianti di tutte le immagini di images-metadata.json e le registra nel metadata
+
+    Ogni file canonico viene elaborato una volta; tutte le occorrenze che lo
+    condividono ricevono lo stesso campo "variants".
+
+    Returns:
+        (immagini elaborate, varianti ricreate, errori)
+    """
+    metadata_path = os.path.join(images_dir, METADATA_FILE)
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    filenames = sorted({image["filename"] for image in metadata["images"]})
+    tasks = [(images_dir, filename, quality) for filename in filenames]
+
+    results = {}
+    created = errors = 0
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(make_variants, tasks, chunksize=8))
+    else:
+        outcomes = [make_variants(task) for task in tasks]
+
+    for filename, variants, error, variants_created in outcomes:
+        created += variants_created
+        if error is not None:
+            errors += 1
+            print(f"  ✗ Errore varianti {filename}: {error}")
+        results[filename] = variants
+
+    for image in metadata["images"]:
+        variants = results.get(image["filename"])
+        if variants:
+            image["variants"] = variants
+
+    # Metadata riscritto in modo atomico (file temporaneo + rename)
+    tmp_path = metadata_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, metadata_path)
+
+    return len(filenames), created, errors
+
+def variants_payload(images_dir):
+    """Byte totali delle immagini originali e di ciascuna variante (per le statistiche)"""
+    with open(os.path.join(images_dir, METADATA_FILE), 'r', encoding='utf-8') as f:
+        images = json.load(f)["images"]
+
+    totals = {"original": 0}
+    seen = set()
+    for image in images:
+        if image["filename"] in seen:
+            continue
+        seen.add(image["filename"])
+        totals["original"] += image["size_bytes"]
+        for variant, info in image.get("variants", {}).items():
+            totals[variant] = totals.get(variant, 0) + info["size_bytes"]
+    return totals
+
+def print_variants_summary(images_dir, processed, created, errors):
+    """Statistiche della generazione delle varianti"""
+    totals = variants_payload(images_dir)
+    print(f"🖼️  Varianti: {processed} immagini, {created} varianti create ({errors} errori)")
+    print(f"   - Originali: {totals['original']//1024}KB")
+    for variant in VARIANTS:
+        if variant in totals:
+            print(f"   - {variant}: {totals[variant]//1024}KB")
+
+def main():
+    """Crea le varianti per una cartella di immagini già estratte"""
+    parser = argparse.ArgumentParser(description="Crea varianti WebP ridotte delle immagini estratte")
+    parser.add_argument("images_dir", nargs="?", default="quiz-images", help="cartella con images-metadata.json (default: quiz-images)")
+    parser.add_argument("--workers", type=int, default=0, help="processi Pillow in parallelo (default: 0 = tutti i core)")
+    parser.add_argument("--quality", type=int, default=WEBP_QUALITY, help=f"qualità WebP 1-100 (default: {WEBP_QUALITY})")
+    args = parser.parse_args()
+
+    if Image is None:
+        print("❌ Errore: Pillow non installato")
+        print("   Installa con: pip install Pillow")
+        sys.exit(1)
+
+    processed, created, errors = generate_variants(args.images_dir, args.workers or os.cpu_count() or 1, args.quality)
+    print_variants_summary(args.images_dir, processed, created, errors)
+
+if __name__ == "__main__":
+    main()
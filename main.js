@@ -3,6 +3,7 @@ const { autoUpdater } = require('electron-updater');
 const path = require('path');
 const fs = require('fs');
 const { exec } = require('child_process');
+const crypto = require('crypto');
 const pdf = require('pdf-parse');
 
 // Abilita hot-reload in modalità sviluppo
@@ -138,6 +139,73 @@ ipcMain.on('get-quiz-data-path', (event) => {
     event.returnValue = dataPath;
 });
 
+// Normalizza un testo per la ricerca (stessa normalizzazione di build_page_index.py)
+function normalizeSearchText(text) {
+    return text
+        .toLowerCase()
+        .trim()
+        .replace(/[^\w\s]/g, ' ') // Rimuovi punteggiatura
+        .replace(/\s+/g, ' '); // Normalizza spazi multipli
+}
+
+// Indice precalcolato domanda -> pagina (page-index.json, creato da build_page_index.py)
+let pageIndex;
+
+function loadPageIndex() {
+    if (pageIndex !== undefined) {
+        return pageIndex;
+    }
+    
+    pageIndex = null;
+    const candidates = [path.join(__dirname, 'page-index.json')];
+    if (process.resourcesPath) {
+        candidates.push(path.join(process.resourcesPath, 'page-index.json'));
+    }
+    for (const indexPath of candidates) {
+        try {
+            if (fs.existsSync(indexPath)) {
+                pageIndex = JSON.parse(fs.readFileSync(indexPath, 'utf8'));
+                console.log(`Indice delle pagine caricato: ${indexPath}`);
+                break;
+            }
+        } catch (error) {
+            console.warn(`Impossibile leggere l'indice delle pagine ${indexPath}:`, error);
+        }
+    }
+    return pageIndex;
+}
+
+// Cerca la pagina della domanda nell'indice; null se l'indice manca o non è aggiornato
+function lookupQuestionPage(pdfPath, sourceFile, quizId, questionText) {
+    const index = loadPageIndex();
+    const entry = index && index.files && index.files[sourceFile];
+    if (!entry || quizId === undefined || quizId === null) {
+        return null;
+    }
+    
+    // PDF diverso da quello indicizzato: l'indice non è affidabile
+    try {
+        if (fs.statSync(pdfPath).size !== entry.pdf_size) {
+            return null;
+        }
+    } catch (error) {
+        return null;
+    }
+    
+    const quiz = entry.quizzes[String(quizId)];
+    if (!quiz) {
+        return null;
+    }
+    
+    // Domanda modificata dopo la costruzione dell'indice
+    const [pageNumber, , questionHash] = quiz;
+    const currentHash = crypto.createHash('sha1').update(normalizeSearchText(questionText)).digest('hex').slice(0, 8);
+    if (currentHash !== questionHash) {
+        return null;
+    }
+    return pageNumber;
+}
+
 // Funzione per trovare la pagina di una domanda nel PDF
 async function findQuestionPage(pdfPath, questionText) {
     try {
@@ -149,11 +217,7 @@ async function findQuestionPage(pdfPath, questionText) {
         
         // Normalizza il testo della domanda per la ricerca
         // Usa quasi tutta la domanda per trovare una corrispondenza unica
-        const normalizedQuestion = questionText
-            .toLowerCase()
-            .trim()
-            .replace(/[^\w\s]/g, ' ') // Rimuovi punteggiatura
-            .replace(/\s+/g, ' '); // Normalizza spazi multipli
+        const normalizedQuestion = normalizeSearchText(questionText);
         
         // Normalizza anche il testo del PDF
         const totalText = pdfData.text.toLowerCase()
@@ -372,7 +436,7 @@ function openPdfAtPage(pdfPath, pageNumber) {
 }
 
 // Gestione IPC per aprire un file PDF
-ipcMain.on('open-pdf', async (event, pdfFileName, questionText) => {
+ipcMain.on('open-pdf', async (event, pdfFileName, questionText, sourceFile, quizId) => {
     try {
         // Il PDF principale è nella root, gli altri sono in "Ulteriori quiz"
         const isMainPdf = pdfFileName === 'Banca dati unisa farmacia ospedaliera.pdf';
@@ -418,8 +482,15 @@ ipcMain.on('open-pdf', async (event, pdfFileName, questionText) => {
         let pageNumber = 1;
         if (questionText) {
             try {
-                pageNumber = await findQuestionPage(pdfPath, questionText);
-                console.log(`Trovata pagina stimata: ${pageNumber} per la domanda`);
+                // Prima l'indice precalcolato, poi la scansione completa del PDF
+                const indexedPage = lookupQuestionPage(pdfPath, sourceFile, quizId, questionText);
+                if (indexedPage !== null) {
+                    pageNumber = indexedPage;
+                    console.log(`Pagina ${pageNumber} trovata nell'indice per la domanda ${quizId}`);
+                } else {
+                    pageNumber = await findQuestionPage(pdfPath, questionText);
+                    console.log(`Trovata pagina stimata: ${pageNumber} per la domanda`);
+                }
             } catch (pageError) {
                 console.warn('Errore nella ricerca della pagina, uso pagina 1:', pageError);
             }
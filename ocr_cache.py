@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache su disco dei risultati OCR, indicizzata per contenuto della pagina
+Usata da extract_text_from_pdf_ocr.py e extract_text_from_pdf_ocr_easyocr.py
+
+La chiave di ogni pagina è l'hash del suo contenuto (content stream e stream
+delle immagini via PyMuPDF, oppure i pixel renderizzati) più motore, lingua
+e DPI: rieseguendo l'OCR sullo stesso PDF le pagine invariate vengono lette
+dalla cache invece di essere riconosciute di nuovo.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fitz  # PyMuPDF (opzionale: senza, l'impronta si calcola sui pixel renderizzati)
+except ImportError:
+    fitz = None
+
+# Configurazione
+CACHE_DIR = ".ocr-cache"
+CACHE_FILE = "ocr-cache.sqlite"
+CACHE_MAX_MB = 512
+
+# Dopo un'eviction la cache scende a questa frazione del limite (evita evictions a ogni scrittura)
+EVICTION_TARGET = 0.9
+
+def open_pdf(pdf_path):
+    """Apre il PDF con PyMuPDF per calcolare le impronte delle pagine (None se non disponibile)"""
+    if fitz is None:
+        return None
+    return fitz.open(pdf_path)
+
+def page_fingerprint(pdf_document, page_index):
+    """
+    Impronta del contenuto di una pagina, senza renderizzarla
+
+    Comprende dimensioni e rotazione, i content stream della pagina e gli stream
+    grezzi delle immagini e degli XObject che usa: due pagine scansionate con lo
+    stesso content stream ma immagini diverse hanno impronte diverse.
+
+    Args:
+        pdf_document: documento PyMuPDF aperto
+        page_index: indice della pagina (0-based)
+    """
+    page = pdf_document[page_index]
+    digest = hashlib.sha256()
+    digest.update(repr((tuple(page.rect), page.rotation)).encode('utf-8'))
+    digest.update(page.read_contents())
+
+    xrefs = [img[0] for img in page.get_images(full=True)]
+    xrefs += [xobject[0] for xobject in page.get_xobjects()]
+    for xref in xrefs:
+        digest.update(pdf_document.xref_stream_raw(xref) or b'')
+
+    return digest.hexdigest()
+
+def pixels_fingerprint(image):
+    """Impronta dei pixel renderizzati (PIL Image o array NumPy)"""
+    digest = hashlib.sha256()
+    if hasattr(image, 'tobytes') and hasattr(image, 'mode'):
+        digest.update(f"{image.mode}{image.size}".encode('utf-8'))
+        digest.update(image.tobytes())
+    else:
+        digest.update(f"{image.dtype}{image.shape}".encode('utf-8'))
+        digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def make_key(fingerprint, engine, lang, dpi, **options):
+    """Chiave della cache: impronta della pagina + motore, lingua, DPI e opzioni che cambiano il risultato"""
+    params = {"fingerprint": fingerprint, "engine": engine, "lang": lang, "dpi": dpi}
+    params.update(options)
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+class OCRCache:
+    """
+    Cache OCR persistente in SQLite con limite di dimensione ed eviction LRU
+
+    Ogni voce contiene il risultato di una pagina:
+        {"text": str, "boxes": [...], "confidences": [...]}
+    Può essere aperta da più processi contemporaneamente (un'istanza per processo)
+    e usata da più thread dello stesso processo (stadi di ocr_pipeline.py): le
+    operazioni sulla connessione sono serializzate da un lock.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_mb=CACHE_MAX_MB):
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_mb = max_mb
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, CACHE_FILE), timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Restituisce il risultato salvato per la chiave (None se assente)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """Salva il risultato di una pagina ed elimina le voci meno usate se si supera il limite"""
+        value = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, value, len(value.encode('utf-8')), time.time())
+                )
+            self._evict()
+
+    def _evict(self):
+        """Eviction LRU: elimina le voci usate meno di recente finché la cache rientra nel limite"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * EVICTION_TARGET
+        to_delete = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= target:
+                break
+            to_delete.append((key,))
+            total -= size
+
+        with self._conn:
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def add_cache_arguments(parser):
+    """Aggiunge le opzioni della cache OCR a un ArgumentParser"""
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="non usare la cache OCR su disco"
+    )
+    parser.add_argument(
+        "--cache-dir", default=CACHE_DIR,
+        help=f"cartella della cache OCR (default: {CACHE_DIR})"
+    )
+    parser.add_argument(
+        "--cache-max-mb", type=float, default=CACHE_MAX_MB,
+        help=f"dimensione massima della cache in MB (default: {CACHE_MAX_MB})"
+    )
+
+def cache_config_from_args(args):
+    """Configurazione della cache da passare ai worker: (cartella, MB massimi) oppure None"""
+    if args.no_cache:
+        return None
+    return (args.cache_dir, args.cache_max_mb)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Eventi di avanzamento in JSON Lines (strumentazione per pagina)
+Usato da extract_text_from_pdf_ocr.py, extract_text_from_pdf_ocr_easyocr.py e extract_pdf_images.py
+
+Con --events FILE ogni esecuzione scrive una riga JSON per evento, così
+l'app Electron o un job runner possono seguire avanzamento, velocità e tempo
+stimato senza interpretare i messaggi della console:
+
+    {"event": "run_start", "script": "tesseract", "time": "...", "total_pages": 90, "pages": 90, ...}
+    {"event": "page", "page": 1, "done": 1, "pages": 90, "elapsed": 2.41, "pages_per_second": 0.415,
+     "eta_seconds": 214.5, "source": "ocr", "cached": false, "error": null,
+     "render_seconds": 0.31, "preprocess_seconds": 0.12, "ocr_seconds": 1.96, "pixels": 8699840, "chars": 2412}
+    {"event": "run_end", "ok": true, "summary": {"pages": 90, "errors": 0, ..., "metrics": {...}}}
+
+Le misure di pagina (i campi numerici passati come metrics) finiscono nel
+riepilogo di run_end con totale, media e percentili. Con "--events -" gli
+eventi vanno su stdout e i messaggi per le persone su stderr. La riga
+"Pagina i/N..." della console è a sua volta un ascoltatore degli eventi di
+pagina (disattivabile con --quiet).
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+
+# Versione del formato degli eventi (cambia solo con modifiche incompatibili)
+EVENTS_VERSION = 1
+
+# Percentili delle misure di pagina nel riepilogo di run_end
+SUMMARY_PERCENTILES = (50, 90, 95, 99)
+
+# Fasi del preprocessing (ocr_preprocess.TIMING_STAGES) sommate in preprocess_seconds
+PREPROCESS_TIMINGS = ("grayscale", "binarize", "deskew", "trim")
+
+def percentile(values, percent):
+    """Percentile per rango (stesso criterio di benchmark_extraction.py) di una lista già ordinata"""
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+def ocr_page_metrics(result):
+    """
+    Misure di una pagina OCR: tempi di rendering, preprocessing e OCR, pixel e caratteri
+
+    I tempi vengono da result["timings"] (assenti per le pagine lette dalla
+    cache o dal livello di testo); "pixels" è la dimensione dell'immagine
+    passata al motore OCR.
+    """
+    metrics = {}
+    timings = result.get("timings")
+    if timings:
+        if "rendering" in timings:
+            metrics["render_seconds"] = timings["rendering"]
+        preprocess = [timings[stage] for stage in PREPROCESS_TIMINGS if stage in timings]
+        if preprocess:
+            metrics["preprocess_seconds"] = round(sum(preprocess), 4)
+        if "ocr" in timings:
+            metrics["ocr_seconds"] = timings["ocr"]
+    if result.get("pixels") and not result.get("cached"):
+        metrics["pixels"] = result["pixels"]
+    metrics["chars"] = len(result["text"].strip())
+    return metrics
+
+class RunEvents:
+    """
+    Eventi di un'esecuzione: run_start, un evento per pagina, run_end con il riepilogo
+
+    Gli eventi vanno sullo stream JSON Lines (se presente) e a ogni
+    ascoltatore (funzioni che ricevono il dizionario dell'evento, es. la vista
+    della console). Senza stream e senza ascoltatori non viene scritto nulla.
+    """
+
+    def __init__(self, script, stream=None, listeners=(), close_stream=False):
+        self.script = script
+        self.stream = stream
+        self.listeners = list(listeners)
+        self._close_stream = close_stream
+        self._start = time.perf_counter()
+        self.total_pages = 0
+        self.pages = 0
+        self.done = 0
+        self.errors = 0
+        self.sources = {}
+        self.measures = {}
+        self.finished = False
+
+    def emit(self, event):
+        """Invia un evento allo stream e agli ascoltatori"""
+        if self.stream is not None:
+            self.stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.stream.flush()
+        for listener in self.listeners:
+            listener(event)
+
+    def start(self, total_pages, pages=None, **info):
+        """
+        Inizio dell'esecuzione
+
+        Args:
+            total_pages: pagine del documento
+            pages: pagine da processare in questa esecuzione (default: total_pages)
+            info: campi aggiuntivi (DPI, motore, file di output...)
+        """
+        self._start = time.perf_counter()
+        self.total_pages = total_pages
+        self.pages = total_pages if pages is None else pages
+        self.emit(dict(
+            event="run_start", version=EVENTS_VERSION, script=self.script,
+            time=datetime.now().isoformat(timespec='seconds'),
+            total_pages=self.total_pages, pages=self.pages, **info
+        ))
+
+    def page(self, page_num, metrics=None, error=None, **info):
+        """
+        Pagina completata (o fallita, con error)
+
+        Args:
+            metrics: misure numeriche della pagina (secondi, pixel, caratteri...),
+                     riassunte con i percentili in run_end
+            info: campi descrittivi (source, cached, dpi...)
+        """
+        metrics = metrics or {}
+        self.done += 1
+        if error is not None:
+            self.errors += 1
+        source = info.get("source")
+        if source is not None:
+            self.sources[source] = self.sources.get(source, 0) + 1
+        for name, value in metrics.items():
+            if value is not None:
+                self.measures.setdefault(name, []).append(value)
+
+        elapsed = time.perf_counter() - self._start
+        rate = self.done / elapsed if elapsed > 0 else None
+        remaining = max(self.pages - self.done, 0)
+        self.emit(dict(
+            event="page", page=page_num, done=self.done, pages=self.pages, total_pages=self.total_pages,
+            elapsed=round(elapsed, 3),
+            pages_per_second=round(rate, 3) if rate else None,
+            eta_seconds=round(remaining / rate, 1) if rate else None,
+            error=error, **info, **metrics
+        ))
+
+    def summary(self):
+        """Riepilogo dell'esecuzione: conteggi, velocità e per ogni misura totale, media e percentili"""
+        elapsed = time.perf_counter() - self._start
+        metrics = {}
+        for name, values in self.measures.items():
+            ordered = sorted(values)
+            total = sum(ordered)
+            stats = {"count": len(ordered), "total": round(total, 4), "mean": round(total / len(ordered), 4)}
+            for percent in SUMMARY_PERCENTILES:
+                stats[f"p{percent}"] = percentile(ordered, percent)
+            stats["max"] = ordered[-1]
+            metrics[name] = stats
+        return {
+            "pages": self.done,
+            "errors": self.errors,
+            "sources": self.sources,
+            "elapsed": round(elapsed, 3),
+            "pages_per_second": round(self.done / elapsed, 3) if elapsed > 0 else None,
+            "metrics": metrics,
+        }
+
+    def finish(self, ok=True, **info):
+        """Fine dell'esecuzione (una sola volta): evento run_end con il riepilogo, restituito"""
+        if self.finished:
+            return None
+        self.finished = True
+        summary = self.summary()
+        self.emit(dict(event="run_end", ok=ok, summary=summary, **info))
+        return summary
+
+    def close(self):
+        if self._close_stream and self.stream is not None:
+            self.stream.close()
+        self.stream = None
+
+def add_events_arguments(parser):
+    """Aggiunge le opzioni degli eventi di avanzamento a un ArgumentParser"""
+    parser.add_argument(
+        "--events", metavar="FILE",
+        help='scrivi gli eventi di avanzamento per pagina in JSON Lines ("-" = stdout, i messaggi passano su stderr)'
+    )
+    parser.add_argument(
+        "--quiet", action="store_true",
+        help="non stampare l'avanzamento pagina per pagina sulla console"
+    )
+
+def events_from_args(args, script, console=None):
+    """
+    Eventi di un'esecuzione secondo --events e --quiet
+
+    Args:
+        script: nome dello script negli eventi
+        console: ascoltatore che stampa l'avanzamento di pagina (saltato con --quiet)
+    """
+    listeners = [console] if console is not None and not args.quiet else []
+    if not args.events:
+        return RunEvents(script, listeners=listeners)
+    if args.events == "-":
+        # stdout resta agli eventi: ogni print dello script va su stderr
+        stream = sys.stdout
+        sys.stdout = sys.stderr
+        return RunEvents(script, stream, listeners)
+    return RunEvents(script, open(args.events, "w", encoding="utf-8"), listeners, close_stream=True)
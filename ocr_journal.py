@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scrittura incrementale e ripristinabile del testo estratto con OCR
+Usata da extract_text_from_pdf_ocr.py e extract_text_from_pdf_ocr_easyocr.py
+
+Ogni pagina completata viene aggiunta a un file parziale (<output>.partial) e
+un piccolo manifest (<output>.progress.json) registra fino a dove si è arrivati.
+Dopo un'interruzione (crash, Ctrl-C, memoria esaurita) l'opzione --resume
+riparte dalla prima pagina non completata; alla fine il file parziale diventa
+il file di output, identico byte per byte a quello di un'esecuzione senza
+interruzioni.
+
+Accanto al testo viene scritto un report per pagina (<output>.report.json)
+con metodo di estrazione, DPI finale e confidenza dell'OCR.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from pdf_text_layer import page_header
+
+MANIFEST_SUFFIX = ".progress.json"
+PARTIAL_SUFFIX = ".partial"
+REPORT_SUFFIX = ".report.json"
+MANIFEST_VERSION = 2
+
+def pdf_signature(pdf_path):
+    """Identifica la versione del PDF (percorso, dimensione, data di modifica)"""
+    stat = os.stat(pdf_path)
+    return {
+        "pdf": os.path.abspath(pdf_path),
+        "size": stat.st_size,
+        "mtime": int(stat.st_mtime),
+    }
+
+class OutputJournal:
+    """
+    File di output scritto pagina per pagina, con manifest di avanzamento
+
+    Il formato del testo è quello storico degli script OCR: le voci
+    "=== PAGINA i ===\\n<testo>\\n" separate da una riga vuota. L'intestazione
+    può riportare il metodo di estrazione: "=== PAGINA i [testo] ===".
+    """
+
+    def __init__(self, output_file, run_info, first_page=1, resume=False):
+        """
+        Args:
+            output_file: percorso del file di output finale
+            run_info: parametri dell'esecuzione (PDF, motore, lingua, DPI...);
+                      si riprende solo se coincidono con quelli del manifest
+            first_page: pagina da cui parte un'esecuzione nuova
+            resume: riprendi dal manifest se presente e compatibile
+        """
+        self.output_file = output_file
+        self.partial_file = output_file + PARTIAL_SUFFIX
+        self.manifest_file = output_file + MANIFEST_SUFFIX
+        self.report_file = output_file + REPORT_SUFFIX
+        # Il report parziale è in formato JSON Lines (una riga per pagina)
+        self.partial_report_file = self.report_file + PARTIAL_SUFFIX
+        self.run_info = run_info
+
+        self.next_page = first_page
+        self.bytes_written = 0
+        self.report_bytes = 0
+        self.pages_with_text = 0
+        self.total_chars = 0
+        self.resumed = False
+
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+
+        manifest = self._load_manifest() if resume else None
+        if manifest is not None:
+            self.next_page = manifest["next_page"]
+            self.bytes_written = manifest["bytes_written"]
+            self.pages_with_text = manifest["pages_with_text"]
+            self.total_chars = manifest["total_chars"]
+            self.report_bytes = manifest["report_bytes"]
+            self.resumed = True
+
+            # Scarta eventuali byte scritti dopo l'ultimo aggiornamento del manifest
+            self._file = self._reopen(self.partial_file, self.bytes_written)
+            self._report = self._reopen(self.partial_report_file, self.report_bytes)
+        else:
+            self._file = open(self.partial_file, 'wb')
+            self._report = open(self.partial_report_file, 'wb')
+            self._save_manifest()
+
+    @staticmethod
+    def _reopen(path, size):
+        """Riapre un file parziale troncandolo alla dimensione registrata nel manifest"""
+        f = open(path, 'r+b')
+        f.truncate(size)
+        f.seek(size)
+        return f
+
+    def _load_manifest(self):
+        """Legge il manifest; None se assente, illeggibile o di un'esecuzione diversa"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("run") != self.run_info:
+            print("[WARN] Manifest di avanzamento non compatibile con questa esecuzione: si riparte da capo")
+            return None
+        for path, size in ((self.partial_file, manifest["bytes_written"]), (self.partial_report_file, manifest["report_bytes"])):
+            if not os.path.exists(path) or os.path.getsize(path) < size:
+                print("[WARN] File parziale mancante o incompleto: si riparte da capo")
+                return None
+        return manifest
+
+    def _save_manifest(self):
+        """Aggiorna il manifest in modo atomico (file temporaneo + rename)"""
+        tmp_file = self.manifest_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "run": self.run_info,
+                "next_page": self.next_page,
+                "bytes_written": self.bytes_written,
+                "pages_with_text": self.pages_with_text,
+                "total_chars": self.total_chars,
+                "report_bytes": self.report_bytes,
+            }, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.manifest_file)
+
+    def add_page(self, page_num, text, source=None, report=None):
+        """
+        Registra una pagina completata
+
+        Args:
+            page_num: numero della pagina
+            text: testo della pagina (None o vuoto = pagina senza testo o fallita)
+            source: metodo di estrazione da indicare nell'intestazione (None = nessuna etichetta)
+            report: voce del report per la pagina (dict serializzabile in JSON), opzionale
+        """
+        if text and text.strip():
+            entry = f"{page_header(page_num, source)}\n{text}\n"
+            data = entry.encode('utf-8')
+            if self.pages_with_text:
+                data = b'\n' + data
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+            self.bytes_written += len(data)
+            self.pages_with_text += 1
+            self.total_chars += len(entry)
+
+        if report is not None:
+            line = (json.dumps(report, ensure_ascii=False) + '\n').encode('utf-8')
+            self._report.write(line)
+            self._report.flush()
+            self.report_bytes += len(line)
+
+        self.next_page = page_num + 1
+        self._save_manifest()
+
+    def finish(self):
+        """
+        Chiude il journal: il file parziale diventa il file di output
+
+        Returns:
+            True se è stato scritto del testo (altrimenti il file di output non viene toccato)
+        """
+        self.close()
+        if self.pages_with_text:
+            os.replace(self.partial_file, self.output_file)
+        else:
+            os.remove(self.partial_file)
+
+        if self.report_bytes:
+            self._write_report()
+        os.remove(self.partial_report_file)
+
+        os.remove(self.manifest_file)
+        return self.pages_with_text > 0
+
+    def _write_report(self):
+        """Converte il report parziale (JSON Lines) nel report finale con un riepilogo"""
+        with open(self.partial_report_file, 'r', encoding='utf-8') as f:
+            pages = [json.loads(line) for line in f if line.strip()]
+
+        dpi_counts = {}
+        for page in pages:
+            if page.get("dpi") is not None:
+                key = str(page["dpi"])
+                dpi_counts[key] = dpi_counts.get(key, 0) + 1
+        confidences = [page["mean_confidence"] for page in pages if page.get("mean_confidence") is not None]
+
+        tmp_file = self.report_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "run": self.run_info,
+                "summary": {
+                    "pages": len(pages),
+                    "pages_by_dpi": dpi_counts,
+                    "mean_confidence": round(sum(confidences) / len(confidences), 4) if confidences else None,
+                },
+                "pages": pages,
+            }, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.report_file)
+
+    def close(self):
+        """Chiude i file senza finalizzare (l'esecuzione potrà essere ripresa con --resume)"""
+        for f in (self._file, self._report):
+            if not f.closed:
+                f.close()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Esecuzione a pipeline degli stadi OCR (rendering → preprocessing → OCR → scrittura)
+Usato da extract_text_from_pdf_ocr.py e extract_text_from_pdf_ocr_easyocr.py
+
+Ogni stadio è un generatore che consuma l'iteratore dello stadio precedente:
+
+    def prepara(pagine):
+        for pagina in pagine:
+            yield elabora(pagina)
+
+In modalità sequenziale gli stadi sono semplicemente concatenati; con
+run_pipeline ogni stadio gira in un proprio thread e gli stadi sono collegati
+da code limitate (PIPELINE_QUEUE_SIZE elementi):
+
+- memoria limitata: al massimo queue_size elementi in attesa tra due stadi,
+  quindi il rendering non può accumulare centinaia di immagini in anticipo
+- contropressione: uno stadio veloce si blocca sulla coda piena finché lo
+  stadio lento successivo non la svuota
+- il tempo totale si avvicina a quello dello stadio più lento invece che alla
+  somma degli stadi (rendering e preprocessing di PyMuPDF/numpy e il processo
+  tesseract rilasciano il GIL)
+- annullamento pulito: Ctrl-C nel thread principale, un errore in uno stadio o
+  la chiusura anticipata dell'iteratore fermano tutti i thread
+
+Gli errori viaggiano in ordine dentro le code: il consumatore riceve
+l'eccezione originale quando arriva al punto in cui si è verificata.
+
+PyMuPDF non supporta chiamate concorrenti da più thread (nemmeno su documenti
+diversi): gli stadi eseguono le operazioni PyMuPDF, compresa l'apertura e la
+chiusura dei documenti, sotto PDF_LOCK, e non si passano oggetti PyMuPDF
+(pagine, pixmap) attraverso le code.
+"""
+
+import queue
+import threading
+import time
+
+# Elementi in attesa tra due stadi (immagini di pagina: poche bastano a
+# tenere occupato lo stadio successivo)
+PIPELINE_QUEUE_SIZE = 2
+
+# Intervallo di controllo dell'annullamento durante le attese sulle code (secondi)
+POLL_INTERVAL = 0.1
+
+# Serializza le chiamate PyMuPDF tra gli stadi (rientrante: gli stadi possono annidarle)
+PDF_LOCK = threading.RLock()
+
+# Fine dello stream di uno stadio
+_DONE = object()
+
+class PipelineCancelled(Exception):
+    """Pipeline annullata (Ctrl-C, errore di un altro stadio o consumatore chiuso)"""
+
+class _Failure:
+    """Eccezione di uno stadio, inoltrata in ordine agli stadi successivi"""
+
+    def __init__(self, error):
+        self.error = error
+
+class StageStats:
+    """Tempi di uno stadio: lavoro effettivo e attesa sulle code"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+
+    def __repr__(self):
+        return f"{self.name}: {self.items} elementi, {self.busy:.2f}s di lavoro, {self.waiting:.2f}s di attesa"
+
+def chain_stages(source, stages):
+    """Versione sequenziale di run_pipeline: stessi stadi, un solo thread"""
+    items = iter(source)
+    for _, stage in stages:
+        items = stage(items)
+    return items
+
+class Pipeline:
+    """
+    Stadi in thread separati collegati da code limitate
+
+    Si usa come iteratore (gli elementi dell'ultimo stadio) dentro un blocco
+    with, che garantisce l'annullamento e l'attesa dei thread all'uscita:
+
+        with Pipeline(pagine, [("preprocessing", prepara), ("ocr", riconosci)]) as risultati:
+            for risultato in risultati:
+                scrivi(risultato)
+    """
+
+    def __init__(self, source, stages, queue_size=PIPELINE_QUEUE_SIZE):
+        """
+        Args:
+            source: iterabile iniziale (es. il generatore di rendering), consumato in un thread
+            stages: lista di (nome, funzione) con funzione(iteratore) -> iteratore
+            queue_size: elementi massimi in attesa tra due stadi
+        """
+        self._cancel = threading.Event()
+        self.stats = [StageStats("sorgente")] + [StageStats(name) for name, _ in stages]
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in self.stats]
+        self._threads = [threading.Thread(
+            target=self._run, args=(lambda _: source, None, self._queues[0], self.stats[0]),
+            name="pipeline-sorgente", daemon=True
+        )]
+        for index, (name, func) in enumerate(stages, start=1):
+            self._threads.append(threading.Thread(
+                target=self._run, args=(func, self._queues[index - 1], self._queues[index], self.stats[index]),
+                name=f"pipeline-{name}", daemon=True
+            ))
+        self._output = self._queues[-1]
+        self._started = False
+        self._finished = False
+
+    def _get(self, source_queue, stats):
+        """Prende un elemento dalla coda controllando l'annullamento"""
+        started = time.perf_counter()
+        try:
+            while True:
+                if self._cancel.is_set():
+                    raise PipelineCancelled()
+                try:
+                    return source_queue.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+        finally:
+            if stats is not None:
+                stats.waiting += time.perf_counter() - started
+
+    def _put(self, target_queue, item, stats):
+        """Mette un elemento nella coda (bloccando se piena) controllando l'annullamento"""
+        started = time.perf_counter()
+        try:
+            while True:
+                if self._cancel.is_set():
+                    raise PipelineCancelled()
+                try:
+                    target_queue.put(item, timeout=POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            stats.waiting += time.perf_counter() - started
+
+    def _input(self, source_queue, stats):
+        """Iteratore degli elementi in ingresso a uno stadio (rilancia gli errori a monte)"""
+        while True:
+            item = self._get(source_queue, stats)
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    def _run(self, func, source_queue, target_queue, stats):
+        """Corpo del thread di uno stadio"""
+        inputs = self._input(source_queue, stats) if source_queue is not None else None
+        outputs = None
+        try:
+            outputs = iter(func(inputs))
+            while True:
+                started, waited = time.perf_counter(), stats.waiting
+                try:
+                    item = next(outputs)
+                except StopIteration:
+                    break
+                finally:
+                    # next() include l'attesa sulla coda in ingresso, già contata in waiting
+                    stats.busy += time.perf_counter() - started - (stats.waiting - waited)
+                stats.items += 1
+                self._put(target_queue, item, stats)
+            self._put(target_queue, _DONE, stats)
+        except PipelineCancelled:
+            pass
+        except BaseException as e:
+            try:
+                self._put(target_queue, _Failure(e), stats)
+            except PipelineCancelled:
+                pass
+        finally:
+            # Il generatore va chiuso nel thread che lo esegue (rilascia documenti e processi)
+            if outputs is not None and hasattr(outputs, "close"):
+                try:
+                    outputs.close()
+                except Exception:
+                    pass
+
+    def __iter__(self):
+        if not self._started:
+            self._started = True
+            for thread in self._threads:
+                thread.start()
+        consumer = StageStats("consumatore")
+        try:
+            while True:
+                item = self._get(self._output, consumer)
+                if item is _DONE:
+                    self._finished = True
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Annulla gli stadi ancora attivi e attende la fine dei thread"""
+        if not self._finished:
+            self._cancel.set()
+        for thread in self._threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def run_pipeline(source, stages, queue_size=PIPELINE_QUEUE_SIZE):
+    """Crea una Pipeline (vedi la classe); da usare in un blocco with"""
+    return Pipeline(source, stages, queue_size)
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Correzione del testo OCR con il lessico della banca dati (indice di cancellazioni stile SymSpell)
+
+I file "Ulteriori quiz/*.txt" contengono errori OCR sistematici ("ILR10" per
+IL-10, "serinaltreonina" per serina/treonina) che prima andavano corretti a
+mano prima degli script extractModello*Quizzes.js. Qui:
+    1. il lessico è costruito dalle domande e risposte di quiz-data.json (già
+       revisionate), più i termini di ocr-lexicon.txt, con la frequenza di ogni parola
+    2. per ogni parola si precalcolano le cancellazioni (fino a MAX_EDIT_DISTANCE
+       caratteri) dei primi PREFIX_LENGTH caratteri: due parole a distanza <= d
+       condividono almeno una cancellazione
+    3. per ogni parola OCR sconosciuta si generano le stesse cancellazioni (al più
+       29 con prefisso 7 e distanza 2) e i candidati trovati nell'indice sono
+       verificati con la distanza di Damerau-Levenshtein, in cui le confusioni
+       tipiche dell'OCR (l/1/, O/0...) costano meno: tempo atteso costante per
+       parola, indipendente dalla dimensione del lessico
+    4. due parole note separate da un carattere confuso con "/" ("serina" + "l" +
+       "treonina") diventano "serina/treonina", e un articolo eliso senza
+       apostrofo davanti a una parola nota torna con l'apostrofo ("lattività")
+Le parole che differiscono da una parola nota solo per le vocali finali
+("autoimmuni"/"autoimmune") sono considerate flessioni corrette.
+Una correzione viene applicata solo se la sua confidenza (somiglianza per quota
+di frequenza tra i candidati equivalenti) supera la soglia; le altre restano nel
+report come suggerimenti. Con il report di qualità dell'OCR (<file>.report.json)
+la soglia di una pagina sale alla confidenza media dell'OCR della pagina, e le
+pagine lette dal livello di testo del PDF non vengono toccate.
+
+Ogni sostituzione (pagina, riga, colonna, prima/dopo) finisce nel report
+<file>.corrections.json.
+
+Uso:
+    python ocr_postcorrect.py                                   # tutti i modelli, scrive <file>.corrected.txt
+    python ocr_postcorrect.py "Ulteriori quiz/ssfo-quiz-modello7.txt" --in-place
+    python ocr_postcorrect.py --dry-run                         # solo il report
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+
+# Fonti del lessico: quiz revisionati e termini aggiuntivi (uno per riga, "#" commento)
+LEXICON_FILES = ["quiz-data.json"]
+LEXICON_EXTRA = "ocr-lexicon.txt"
+
+# File corretti per default
+OCR_TEXT_FILES = os.path.join("Ulteriori quiz", "ssfo-quiz-modello*.txt")
+
+CORRECTED_SUFFIX = ".corrected.txt"
+CORRECTIONS_SUFFIX = ".corrections.json"
+
+# Report di qualità degli script OCR (ocr_journal.REPORT_SUFFIX) ed etichetta delle
+# pagine lette dal livello di testo (pdf_text_layer.SOURCE_TEXT_LAYER): ripetuti qui
+# per non importare PyMuPDF solo per due costanti
+REPORT_SUFFIX = ".report.json"
+SOURCE_TEXT_LAYER = "testo"
+
+# Indice di cancellazioni: distanza massima e lunghezza del prefisso indicizzato
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+# Parole più corte non vengono corrette (sigle, articoli, lettere delle opzioni);
+# da LONG_TOKEN_LENGTH caratteri si accetta un costo maggiore (MAX_LONG_COST)
+MIN_TOKEN_LENGTH = 4
+LONG_TOKEN_LENGTH = 8
+
+# Costo di una sostituzione tra caratteri che l'OCR confonde (le altre costano 1)
+CONFUSION_COST = 0.25
+OCR_CONFUSIONS = {
+    frozenset(pair) for pair in (
+        ("l", "1"), ("i", "1"), ("i", "l"), ("o", "0"), ("s", "5"), ("b", "8"), ("z", "2"), ("g", "6"),
+        ("e", "c"), ("n", "u"),
+        ("a", "à"), ("e", "è"), ("e", "é"), ("i", "ì"), ("o", "ò"), ("u", "ù"),
+        ("l", "/"), ("i", "/"), ("1", "/"),
+        # "R" al posto del trattino: ILR10, ILR2, ILRG nei modelli 3 e 7
+        ("r", "-"),
+    )
+}
+
+_SUBSTITUTION_COSTS = {
+    (a, b): CONFUSION_COST for pair in OCR_CONFUSIONS for a in pair for b in pair if a != b
+}
+
+# Costo massimo di una correzione (al più MAX_EDIT_DISTANCE modifiche): una
+# modifica qualsiasi, e sulle parole lunghe una confusione OCR in più (due
+# modifiche "vere" cambiano spesso parola: sedimentazione/sperimentazione)
+MAX_SHORT_COST = 1
+MAX_LONG_COST = 1.25
+
+# Caratteri letti al posto della barra tra due parole ("serinaltreonina")
+SEPARATOR_CONFUSIONS = {"l": "/", "1": "/", "|": "/"}
+
+# Lunghezza minima di ciascuna delle due parole di una separazione
+MIN_SPLIT_PART = 4
+
+# Articoli e preposizioni elisi: l'OCR perde spesso l'apostrofo ("lattività", "nellartrite")
+ELISION_PREFIXES = ("l", "dell", "nell", "all", "dall", "sull", "quest", "quell")
+_ELIDED_START = re.compile(r"^[aeiouhàèéìòù]")
+
+# Vocali finali ignorate nel confronto delle forme flesse: "autoimmuni" è nota se
+# il lessico contiene "autoimmune" (il lessico dei quiz non ha tutte le flessioni).
+# Per lo stesso motivo una modifica non dovuta a confusioni OCR nelle ultime due
+# lettere di una parola terminante in vocale non è una correzione ("potenziando"
+# non diventa "potenziano")
+INFLECTION_VOWELS = "aeio"
+MIN_STEM_LENGTH = 4
+
+# Le sigle del lessico mantengono le maiuscole; le parole più lunghe scritte
+# tutte in maiuscolo (titoli, "TREONINA") sono testo normale
+MAX_ACRONYM_LETTERS = 5
+
+# Confidenza minima (0-1) per applicare una correzione
+MIN_CORRECTION_CONFIDENCE = 0.9
+
+# Parole della struttura del file che gli script extractModello*Quizzes.js cercano così come sono
+PROTECTED_WORDS = {"anteprima", "quesito", "risposta", "pagina"}
+
+_TOKEN = re.compile(r"[^\W_]+(?:[-/][^\W_]+)*")
+_PARTS = re.compile(r"[-/]")
+_LETTER = re.compile(r"[^\W\d_]")
+_PAGE_HEADER = re.compile(r'^=== PAGINA (\d+)(?: \[(\w+)\])? ===$')
+
+Correction = namedtuple("Correction", ["original", "correction", "cost", "confidence", "rule"])
+
+def _deletes(key, max_distance):
+    """Tutte le stringhe ottenute cancellando da key fino a max_distance caratteri"""
+    result = {key}
+    frontier = {key}
+    for _ in range(max_distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        result |= frontier
+    return result
+
+def ocr_distance(source, target, max_distance):
+    """
+    Distanza di Damerau-Levenshtein (trasposizioni adiacenti) con le confusioni OCR a costo ridotto
+
+    Calcola solo la fascia |i - j| <= max_distance della matrice (fuori servono
+    più di max_distance inserimenti o cancellazioni) e si ferma appena ogni
+    percorso supera max_distance (restituisce un valore > max_distance).
+    """
+    n, m = len(source), len(target)
+    if abs(n - m) > max_distance:
+        return max_distance + 1
+    band = int(max_distance)
+    infinity = max_distance + 1
+    costs = _SUBSTITUTION_COSTS
+    previous2 = None
+    previous = [j if j <= band else infinity for j in range(m + 1)]
+    for i in range(1, n + 1):
+        current = [infinity] * (m + 1)
+        if i <= band:
+            current[0] = i
+        row_min = current[0]
+        a = source[i - 1]
+        for j in range(max(1, i - band), min(m, i + band) + 1):
+            b = target[j - 1]
+            cost = previous[j - 1] if a == b else previous[j - 1] + costs.get((a, b), 1)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if a != b and previous2 is not None and j > 1 and a == target[j - 2] and source[i - 2] == b:
+                cost = min(cost, previous2[j - 2] + 1)
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return infinity
+        previous2, previous = previous, current
+    return previous[m]
+
+def inflection_stem(word):
+    """Parola senza le vocali finali di flessione (al più due: "inibitorio" e "inibitori" -> "inibitor")"""
+    stem = word
+    for _ in range(2):
+        if stem[-1:] and stem[-1] in INFLECTION_VOWELS:
+            stem = stem[:-1]
+    return stem
+
+def inflection_edit(word, candidate):
+    """True se word e candidate differiscono solo nella desinenza (ultime due lettere, finale in vocale)"""
+    if word[-1:] not in INFLECTION_VOWELS or candidate[-1:] not in INFLECTION_VOWELS:
+        return False
+    common = 0
+    while common < min(len(word), len(candidate)) and word[-1 - common] == candidate[-1 - common]:
+        common += 1
+    return common <= 1
+
+def match_case(token, form):
+    """Adatta le maiuscole della correzione a quelle della parola OCR (le sigle del lessico restano come sono)"""
+    if form != form.lower():
+        return form
+    if len(token) > 1 and token.isupper():
+        return form.upper()
+    if token[:1].isupper():
+        return form[:1].upper() + form[1:]
+    return form
+
+class Lexicon:
+    """
+    Parole note con frequenza e indice di cancellazioni dei prefissi
+
+    Le parole sono indicizzate in minuscolo; per ogni parola si ricorda la forma
+    da usare nelle correzioni (minuscola se compare anche così, altrimenti la
+    più frequente, es. "IL-10" o "HER2").
+    """
+
+    def __init__(self, max_distance=MAX_EDIT_DISTANCE, prefix_length=PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words = {}
+        self._forms = {}
+        self._stems = set()
+        # Le parole con lo stesso prefisso condividono le cancellazioni: l'indice
+        # porta dalle cancellazioni ai prefissi, e ogni prefisso alle sue parole
+        self._prefixes = {}
+        self._index = {}
+
+    def add(self, term, count=1):
+        """Aggiunge una parola (count occorrenze)"""
+        word = term.lower()
+        if word not in self.words:
+            self.words[word] = 0
+            self._forms[word] = {}
+            self._stems.add(inflection_stem(word))
+            prefix = word[:self.prefix_length]
+            if prefix not in self._prefixes:
+                self._prefixes[prefix] = []
+                for key in _deletes(prefix, self.max_distance):
+                    self._index.setdefault(key, []).append(prefix)
+            self._prefixes[prefix].append(word)
+        self.words[word] += count
+        forms = self._forms[word]
+        forms[term] = forms.get(term, 0) + count
+
+    def add_texts(self, texts):
+        """Aggiunge tutte le parole di più testi (contate prima di indicizzarle)"""
+        terms = Counter()
+        for text in texts:
+            terms.update(_TOKEN.findall(text or ""))
+        # Anche le parti delle parole composte ("beta-bloccante") sono parole note
+        for term, count in list(terms.items()):
+            if _PARTS.search(term):
+                for part in _PARTS.split(term):
+                    terms[part] += count
+        for term, count in terms.items():
+            self.add(term, count)
+
+    def __len__(self):
+        return len(self.words)
+
+    def frequency(self, word):
+        return self.words.get(word, 0)
+
+    def form(self, word):
+        """Forma della parola da scrivere nel testo corretto"""
+        forms = self._forms[word]
+        if word in forms:
+            return word
+        form = max(forms, key=forms.get)
+        if form.isupper() and len(_LETTER.findall(form)) > MAX_ACRONYM_LETTERS:
+            return word
+        return form
+
+    def known(self, word):
+        """True se la parola (minuscola), una sua flessione o tutte le sue parti sono nel lessico"""
+        if word in self.words:
+            return True
+        stem = inflection_stem(word)
+        if len(stem) >= MIN_STEM_LENGTH and stem != word and stem in self._stems:
+            return True
+        parts = _PARTS.split(word)
+        return len(parts) > 1 and all(self.known(part) for part in parts)
+
+    def lookup(self, word, max_cost):
+        """Parole del lessico con distanza OCR <= max_cost da word (con costo), dall'indice delle cancellazioni"""
+        prefixes = set()
+        for key in _deletes(word[:self.prefix_length], self.max_distance):
+            prefixes.update(self._index.get(key, ()))
+        found = []
+        for prefix in prefixes:
+            for candidate in self._prefixes[prefix]:
+                cost = ocr_distance(word, candidate, max_cost)
+                if cost <= max_cost:
+                    found.append((cost, candidate))
+        return found
+
+    def split(self, word):
+        """
+        Separazioni "parola1/parola2" di una parola con un carattere confuso con la barra
+
+        Returns:
+            lista di (costo, (parola1, parola2), separatore)
+        """
+        found = []
+        for i in range(MIN_SPLIT_PART, len(word) - MIN_SPLIT_PART):
+            separator = SEPARATOR_CONFUSIONS.get(word[i])
+            if separator is None:
+                continue
+            left, right = word[:i], word[i + 1:]
+            if left in self.words and right in self.words:
+                found.append((CONFUSION_COST, (left, right), separator))
+        return found
+
+    def elision(self, word):
+        """
+        Lettura con l'apostrofo perso dall'OCR ("lattività" -> "l'" + "attività")
+
+        Returns:
+            (lunghezza del prefisso eliso, parola) oppure None
+        """
+        for prefix in ELISION_PREFIXES:
+            rest = word[len(prefix):]
+            if (word.startswith(prefix) and len(rest) >= MIN_TOKEN_LENGTH
+                    and _ELIDED_START.match(rest) and rest in self.words):
+                return len(prefix), rest
+        return None
+
+def load_lexicon(files=LEXICON_FILES, extra=LEXICON_EXTRA):
+    """
+    Lessico dalle domande e risposte dei file dei quiz e dai termini aggiuntivi
+
+    Returns:
+        (Lexicon, file effettivamente letti)
+    """
+    texts, used = [], []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        quizzes = data.get("quizzes", []) if isinstance(data, dict) else data
+        for quiz in quizzes:
+            texts.append(quiz.get("question"))
+            texts.extend(answer.get("text") for answer in quiz.get("answers") or [])
+        used.append(path)
+    if extra and os.path.exists(extra):
+        with open(extra, 'r', encoding='utf-8') as f:
+            texts.extend(line.split('#', 1)[0].strip() for line in f)
+        used.append(extra)
+
+    lexicon = Lexicon()
+    lexicon.add_texts(texts)
+    return lexicon, used
+
+class Corrector:
+    """
+    Correzione delle singole parole OCR con il lessico
+
+    Il risultato per ogni parola distinta viene memorizzato: le parole ripetute
+    nel documento costano una sola ricerca.
+    """
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+        self._cache = {}
+
+    def candidate(self, token):
+        """Migliore correzione della parola (Correction) o None se è nota o non correggibile"""
+        if token in self._cache:
+            return self._cache[token]
+        result = self._candidate(token)
+        self._cache[token] = result
+        return result
+
+    def _candidate(self, token):
+        word = token.lower()
+        if (len(word) < MIN_TOKEN_LENGTH or word in PROTECTED_WORDS or self.lexicon.known(word)
+                or len(_LETTER.findall(word)) < 2):
+            return None
+
+        lexicon = self.lexicon
+        max_cost = MAX_LONG_COST if len(word) >= LONG_TOKEN_LENGTH else MAX_SHORT_COST
+        candidates = [
+            (cost, lexicon.frequency(candidate), match_case(token, lexicon.form(candidate)), "symspell")
+            for cost, candidate in lexicon.lookup(word, max_cost)
+            if not (cost >= 1 and inflection_edit(word, candidate))
+        ]
+        for cost, (left, right), separator in lexicon.split(word):
+            form = match_case(token, lexicon.form(left)) + separator + lexicon.form(right)
+            candidates.append((cost, min(lexicon.frequency(left), lexicon.frequency(right)), form, "split"))
+        elided = lexicon.elision(word)
+        if elided is not None:
+            length, rest = elided
+            form = token[:length] + "'" + match_case(token[length:], lexicon.form(rest))
+            candidates.append((CONFUSION_COST, lexicon.frequency(rest), form, "elision"))
+        if not candidates:
+            return None
+
+        candidates.sort(key=lambda c: (c[0], -c[1]))
+        cost, frequency, form, rule = candidates[0]
+        # Quota di frequenza tra i candidati praticamente equivalenti (costo entro una confusione):
+        # due parole note ugualmente vicine rendono la correzione incerta
+        rivals = sum(c[1] for c in candidates if c[0] <= cost + CONFUSION_COST)
+        similarity = max(0.0, 1 - cost / len(word))
+        confidence = round(similarity * frequency / rivals, 3)
+        return Correction(token, form, cost, confidence, rule)
+
+def load_page_report(text_path):
+    """Pagine del report di qualità dell'OCR accanto al file di testo: {pagina: voce}, vuoto se assente"""
+    try:
+        with open(text_path + REPORT_SUFFIX, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {page["page"]: page for page in report.get("pages", []) if "page" in page}
+
+def page_threshold(min_confidence, page_report):
+    """Confidenza richiesta nella pagina (None = pagina da non correggere)"""
+    if page_report.get("source") == SOURCE_TEXT_LAYER:
+        return None
+    ocr_confidence = page_report.get("mean_confidence")
+    if ocr_confidence is None:
+        return min_confidence
+    return max(min_confidence, ocr_confidence)
+
+def correct_lines(lines, corrector, min_confidence=MIN_CORRECTION_CONFIDENCE, pages=None):
+    """
+    Corregge le righe di un file di testo OCR ("=== PAGINA i ===")
+
+    Args:
+        lines: righe del file (con o senza "\\n")
+        pages: voci del report di qualità per pagina (load_page_report), opzionale
+
+    Returns:
+        (righe corrette, sostituzioni applicate, suggerimenti sotto soglia, parole esaminate)
+    """
+    pages = pages or {}
+    corrected, substitutions, suggestions = [], [], []
+    page_num, threshold, tokens = None, min_confidence, 0
+
+    for line_num, line in enumerate(lines, start=1):
+        header = _PAGE_HEADER.match(line.strip())
+        if header:
+            page_num = int(header.group(1))
+            if header.group(2) == SOURCE_TEXT_LAYER:
+                threshold = None
+            else:
+                threshold = page_threshold(min_confidence, pages.get(page_num, {}))
+            corrected.append(line)
+            continue
+        if threshold is None:
+            corrected.append(line)
+            continue
+
+        applied = []
+        for match in _TOKEN.finditer(line):
+            tokens += 1
+            correction = corrector.candidate(match.group())
+            if correction is None:
+                continue
+            entry = {
+                "page": page_num,
+                "line": line_num,
+                "column": match.start() + 1,
+                "original": correction.original,
+                "correction": correction.correction,
+                "confidence": correction.confidence,
+                "cost": correction.cost,
+                "rule": correction.rule,
+            }
+            if correction.confidence >= threshold:
+                applied.append((match.start(), match.end(), correction.correction, entry))
+            else:
+                entry["threshold"] = threshold
+                suggestions.append(entry)
+
+        if applied:
+            new_line = line
+            for start, end, replacement, _ in reversed(applied):
+                new_line = new_line[:start] + replacement + new_line[end:]
+            for *_, entry in applied:
+                entry["before"] = line.rstrip("\n")
+                entry["after"] = new_line.rstrip("\n")
+                substitutions.append(entry)
+            line = new_line
+        corrected.append(line)
+
+    return corrected, substitutions, suggestions, tokens
+
+def output_paths(path, in_place=False):
+    """(file di testo corretto, report delle correzioni) di un file OCR"""
+    stem = path[:-4] if path.endswith(".txt") else path
+    return (path if in_place else stem + CORRECTED_SUFFIX), stem + CORRECTIONS_SUFFIX
+
+def correct_file(path, corrector, min_confidence=MIN_CORRECTION_CONFIDENCE, in_place=False, dry_run=False):
+    """
+    Corregge un file di testo OCR e scrive il testo corretto e il report
+
+    Returns:
+        report (dict)
+    """
+    started = time.perf_counter()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        lines = f.readlines()
+    pages = load_page_report(path)
+    corrected, substitutions, suggestions, tokens = correct_lines(lines, corrector, min_confidence, pages)
+    elapsed = time.perf_counter() - started
+
+    output, report_file = output_paths(path, in_place)
+    if not dry_run:
+        tmp_file = output + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+            f.writelines(corrected)
+        os.replace(tmp_file, output)
+
+    report = {
+        "input": path,
+        "output": None if dry_run else output,
+        "generated": datetime.now().isoformat(timespec='seconds'),
+        "settings": {
+            "max_edit_distance": corrector.lexicon.max_distance,
+            "prefix_length": corrector.lexicon.prefix_length,
+            "min_confidence": min_confidence,
+            "ocr_report": bool(pages),
+        },
+        "summary": {
+            "tokens": tokens,
+            "substitutions": len(substitutions),
+            "suggestions": len(suggestions),
+            "seconds": round(elapsed, 4),
+        },
+        "substitutions": substitutions,
+        "suggestions": suggestions,
+    }
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    report["report"] = report_file
+    return report
+
+def default_inputs():
+    """File OCR dei modelli (esclusi quelli già corretti)"""
+    return [path for path in sorted(glob.glob(OCR_TEXT_FILES)) if not path.endswith(CORRECTED_SUFFIX)]
+
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Corregge il testo OCR con il lessico della banca dati dei quiz")
+    parser.add_argument(
+        "files", nargs="*",
+        help=f"file di testo OCR da correggere (default: {OCR_TEXT_FILES})"
+    )
+    parser.add_argument(
+        "--lexicon", action="append", metavar="FILE",
+        help=f"file dei quiz da cui costruire il lessico, ripetibile (default: {', '.join(LEXICON_FILES)})"
+    )
+    parser.add_argument(
+        "--extra", default=LEXICON_EXTRA,
+        help=f"termini aggiuntivi, uno per riga (default: {LEXICON_EXTRA})"
+    )
+    parser.add_argument(
+        "--min-confidence", type=float, default=MIN_CORRECTION_CONFIDENCE,
+        help=f"confidenza minima 0-1 per applicare una correzione (default: {MIN_CORRECTION_CONFIDENCE})"
+    )
+    parser.add_argument(
+        "--in-place", action="store_true",
+        help=f"sovrascrivi i file invece di scrivere <file>{CORRECTED_SUFFIX}"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="non scrivere il testo corretto, solo il report delle correzioni"
+    )
+    return parser.parse_args()
+
+def main():
+    """Funzione principale"""
+    args = parse_args()
+    files = args.files or default_inputs()
+    if not files:
+        print(f"[ERR] Nessun file da correggere ({OCR_TEXT_FILES})")
+        return 1
+
+    started = time.perf_counter()
+    try:
+        lexicon, sources = load_lexicon(args.lexicon or LEXICON_FILES, args.extra)
+    except (OSError, ValueError) as e:
+        print(f"[ERR] Impossibile costruire il lessico: {e}")
+        return 1
+    print(f"[INFO] Lessico: {len(lexicon)} parole da {', '.join(sources)} ({time.perf_counter() - started:.2f}s)")
+
+    corrector = Corrector(lexicon)
+    for path in files:
+        try:
+            report = correct_file(path, corrector, args.min_confidence, args.in_place, args.dry_run)
+        except OSError as e:
+            print(f"[ERR] {path}: {e}")
+            continue
+        summary = report["summary"]
+        target = f" -> {report['output']}" if report["output"] else ""
+        print(f"[OK] {path}{target}: {summary['substitutions']} sostituzioni, "
+              f"{summary['suggestions']} suggerimenti sotto soglia ({summary['seconds']:.3f}s)")
+        for entry in report["substitutions"]:
+            print(f"   pagina {entry['page']}, riga {entry['line']}: {entry['original']} -> {entry['correction']} "
+                  f"(confidenza {entry['confidence']:.2f})")
+        print(f"   Report: {report['report']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
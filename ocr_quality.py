@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Confidenza dell'OCR e risoluzione adattiva
+Usato da extract_text_from_pdf_ocr.py e extract_text_from_pdf_ocr_easyocr.py
+
+In modalità adattiva ogni pagina viene renderizzata prima a bassa risoluzione
+(es. 150 DPI, un quarto dei pixel di 300 DPI) e renderizzata di nuovo a un
+DPI più alto solo se la confidenza media o minima delle parole riconosciute
+è sotto soglia.
+"""
+
+from collections import namedtuple
+
+# Risoluzioni provate in ordine, dalla più economica alla più costosa
+ADAPTIVE_DPI_STEPS = (150, 300)
+
+# Soglie di confidenza (0-1) sotto le quali si passa al DPI successivo
+MIN_MEAN_CONFIDENCE = 0.80
+MIN_WORD_CONFIDENCE = 0.30
+
+# Politica della modalità adattiva (serializzabile verso i processi worker)
+AdaptiveDPI = namedtuple("AdaptiveDPI", ["steps", "min_mean_confidence", "min_word_confidence"])
+
+def confidence_stats(result):
+    """Confidenza media e minima delle parole di un risultato di pagina ((None, None) se non ci sono parole)"""
+    confidences = result.get("confidences") or []
+    if not confidences:
+        return None, None
+    return sum(confidences) / len(confidences), min(confidences)
+
+def needs_higher_dpi(result, policy):
+    """True se il risultato è sotto le soglie della politica (una pagina senza parole conta come sotto soglia)"""
+    mean_conf, min_conf = confidence_stats(result)
+    if mean_conf is None:
+        return True
+    return mean_conf < policy.min_mean_confidence or min_conf < policy.min_word_confidence
+
+def record_attempt(result, dpi, previous=None):
+    """
+    Annota nel risultato il DPI usato e la cronologia dei tentativi
+
+    Args:
+        result: risultato di pagina appena ottenuto
+        dpi: risoluzione con cui è stato ottenuto
+        previous: risultato del tentativo precedente (None se è il primo)
+    """
+    mean_conf, min_conf = confidence_stats(result)
+    attempts = list(previous.get("attempts", [])) if previous else []
+    attempts.append({
+        "dpi": dpi,
+        "mean_confidence": round(mean_conf, 4) if mean_conf is not None else None,
+        "min_confidence": round(min_conf, 4) if min_conf is not None else None,
+    })
+    return dict(result, dpi=dpi, attempts=attempts)
+
+def page_report(page_num, result):
+    """Voce del report di qualità per una pagina"""
+    mean_conf, min_conf = confidence_stats(result)
+    report = {
+        "page": page_num,
+        "source": result.get("source"),
+        "dpi": result.get("dpi"),
+        "mean_confidence": round(mean_conf, 4) if mean_conf is not None else None,
+        "min_confidence": round(min_conf, 4) if min_conf is not None else None,
+        "words": len(result.get("confidences") or []),
+        "cached": bool(result.get("cached")),
+        "attempts": result.get("attempts", []),
+    }
+    if result.get("timings"):
+        # Tempi per fase (rendering, preprocessing, OCR) delle pagine riconosciute in questa esecuzione
+        report["timings"] = result["timings"]
+    return report
+
+def policy_info(policy):
+    """Parametri della politica in forma JSON (per il manifest di --resume); None se disattivata"""
+    if policy is None:
+        return None
+    return {
+        "steps": list(policy.steps),
+        "min_mean_confidence": policy.min_mean_confidence,
+        "min_word_confidence": policy.min_word_confidence,
+    }
+
+def add_adaptive_arguments(parser):
+    """Aggiunge le opzioni della risoluzione adattiva a un ArgumentParser"""
+    parser.add_argument(
+        "--adaptive-dpi", action="store_true",
+        help="renderizza prima a bassa risoluzione e aumenta il DPI solo per le pagine con confidenza bassa"
+    )
+    parser.add_argument(
+        "--dpi-steps", default=",".join(str(dpi) for dpi in ADAPTIVE_DPI_STEPS),
+        help=f"risoluzioni della modalità adattiva, in ordine (default: {','.join(str(dpi) for dpi in ADAPTIVE_DPI_STEPS)})"
+    )
+    parser.add_argument(
+        "--min-mean-confidence", type=float, default=MIN_MEAN_CONFIDENCE,
+        help=f"confidenza media minima 0-1 (default: {MIN_MEAN_CONFIDENCE})"
+    )
+    parser.add_argument(
+        "--min-word-confidence", type=float, default=MIN_WORD_CONFIDENCE,
+        help=f"confidenza minima di una parola 0-1 (default: {MIN_WORD_CONFIDENCE})"
+    )
+
+def adaptive_policy_from_args(args):
+    """Politica adattiva dalle opzioni (None se la modalità adattiva è disattivata)"""
+    if not args.adaptive_dpi:
+        return None
+    steps = tuple(int(dpi) for dpi in args.dpi_steps.split(",") if dpi.strip())
+    return AdaptiveDPI(steps, args.min_mean_confidence, args.min_word_confidence)
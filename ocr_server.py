@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server OCR a lunga durata con i modelli EasyOCR già caricati
+
+Il caricamento dei modelli di EasyOCR (~500MB) domina i tempi su PDF piccoli:
+il server crea il Reader una sola volta e poi accetta lavori come righe JSON
+su stdin/stdout oppure su un socket Unix locale (--socket).
+
+Richiesta (una riga JSON):
+    {"id": 1, "pdf": "file.pdf", "first_page": 1, "last_page": 10,
+     "dpi": 300, "batch_size": 4, "text_layer": true, "adaptive": false, "cache": true,
+     "quizzes": false, "preprocess": false}
+
+Solo "pdf" è obbligatorio. "adaptive" può essere true (politica di default)
+oppure {"steps": [150, 300], "min_mean_confidence": 0.8, "min_word_confidence": 0.3}.
+"preprocess" può essere true (tutte le fasi) oppure la lista delle fasi,
+es. ["deskew", "trim"] (vedi ocr_preprocess.py).
+
+Risposte (una riga JSON ciascuna, con lo stesso "id" della richiesta):
+    {"id": 1, "type": "page", "page": 3, "text": ..., "words": [...], "boxes": [...],
+     "confidences": [...], "source": "ocr", "dpi": 300, "pixels": 8699840, "timings": {...}}
+    {"id": 1, "type": "page", "page": 4, "error": "..."}
+    {"id": 1, "type": "quiz", "quiz": {...}}            (con "quizzes": true, vedi quiz_layout_parser.py)
+    {"id": 1, "type": "done", "pages": 10, "errors": 0, "seconds": 12.3}
+    {"id": 1, "type": "error", "error": "..."}           (lavoro rifiutato)
+
+Comandi: {"cmd": "ping"} -> {"type": "pong"}, {"cmd": "shutdown"} chiude il server.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import extract_text_from_pdf_ocr_easyocr as engine
+from ocr_cache import OCRCache, add_cache_arguments, cache_config_from_args
+from ocr_quality import AdaptiveDPI, ADAPTIVE_DPI_STEPS, MIN_MEAN_CONFIDENCE, MIN_WORD_CONFIDENCE
+from ocr_preprocess import Preprocess, PREPROCESS_STAGES
+from quiz_layout_parser import QuizLayoutParser
+
+def log(message):
+    """Messaggi del server su stderr (stdout è riservato al protocollo)"""
+    print(message, file=sys.stderr, flush=True)
+
+def adaptive_policy_from_job(value):
+    """Politica AdaptiveDPI dal campo "adaptive" di una richiesta (None se disattivata)"""
+    if not value:
+        return None
+    options = value if isinstance(value, dict) else {}
+    return AdaptiveDPI(
+        tuple(int(dpi) for dpi in options.get("steps", ADAPTIVE_DPI_STEPS)),
+        float(options.get("min_mean_confidence", MIN_MEAN_CONFIDENCE)),
+        float(options.get("min_word_confidence", MIN_WORD_CONFIDENCE)),
+    )
+
+def preprocess_options_from_job(value):
+    """Opzioni Preprocess dal campo "preprocess" di una richiesta (None se disattivato)"""
+    if not value:
+        return None
+    stages = value if isinstance(value, list) else PREPROCESS_STAGES
+    unknown = set(stages) - set(PREPROCESS_STAGES)
+    if unknown:
+        raise ValueError(f"fasi di preprocessing sconosciute: {', '.join(sorted(unknown))}")
+    return Preprocess(*(stage in stages for stage in PREPROCESS_STAGES))
+
+class OCRServer:
+    """
+    Esegue i lavori OCR con un unico Reader EasyOCR
+
+    I lavori vengono eseguiti uno alla volta (il Reader non è condiviso tra
+    thread); con il socket più client possono restare connessi insieme.
+    """
+
+    def __init__(self, reader, cache_config=None):
+        self.reader = reader
+        self.cache_config = cache_config
+        self.jobs_done = 0
+        self._lock = threading.Lock()
+
+    def run_job(self, job, emit):
+        """
+        Esegue un lavoro e invia le risposte con emit(dict)
+
+        Returns:
+            False se il lavoro chiede lo spegnimento del server, altrimenti True
+        """
+        job_id = job.get("id")
+        cmd = job.get("cmd")
+        if cmd == "ping":
+            emit({"id": job_id, "type": "pong", "jobs": self.jobs_done})
+            return True
+        if cmd == "shutdown":
+            emit({"id": job_id, "type": "bye"})
+            return False
+        if cmd is not None:
+            emit({"id": job_id, "type": "error", "error": f"comando sconosciuto: {cmd}"})
+            return True
+
+        pdf_path = job.get("pdf")
+        if not pdf_path or not os.path.exists(pdf_path):
+            emit({"id": job_id, "type": "error", "error": f"file PDF non trovato: {pdf_path}"})
+            return True
+
+        with self._lock:
+            self._run_pages(job_id, pdf_path, job, emit)
+        return True
+
+    def _run_pages(self, job_id, pdf_path, job, emit):
+        """Applica l'OCR all'intervallo di pagine richiesto, inviando una risposta per pagina"""
+        start_time = time.time()
+        try:
+            total_pages = engine.get_pdf_page_count(pdf_path)
+            first_page = max(1, int(job.get("first_page", 1)))
+            last_page = min(total_pages, int(job.get("last_page") or total_pages))
+            adaptive = adaptive_policy_from_job(job.get("adaptive"))
+            preprocess = preprocess_options_from_job(job.get("preprocess"))
+        except Exception as e:
+            emit({"id": job_id, "type": "error", "error": str(e)})
+            return
+
+        cache = None
+        if self.cache_config and job.get("cache", True):
+            # Una connessione SQLite per lavoro: i lavori possono arrivare da thread diversi
+            cache = OCRCache(*self.cache_config)
+
+        # Quiz ricostruiti dalle pagine (quiz_layout_parser.py), inviati appena completi
+        quiz_parser = QuizLayoutParser() if job.get("quizzes") else None
+
+        pages = errors = 0
+        try:
+            for page_num, result, error in engine.iter_ocr_pages(
+                self.reader, pdf_path,
+                dpi=int(job.get("dpi", 300)),
+                first_page=first_page,
+                last_page=last_page,
+                batch_size=int(job.get("batch_size", engine.OCR_BATCH_SIZE)),
+                cache=cache,
+                text_layer=bool(job.get("text_layer", True)) and engine.USE_PYMUPDF,
+                adaptive=adaptive,
+                preprocess=preprocess
+            ):
+                pages += 1
+                if error is not None:
+                    errors += 1
+                    emit({"id": job_id, "type": "page", "page": page_num, "error": error})
+                else:
+                    emit({"id": job_id, "type": "page", "page": page_num, **result})
+                    if quiz_parser is not None:
+                        for quiz in quiz_parser.feed_page(page_num, result):
+                            emit({"id": job_id, "type": "quiz", "quiz": quiz})
+            if quiz_parser is not None:
+                for quiz in quiz_parser.finish():
+                    emit({"id": job_id, "type": "quiz", "quiz": quiz})
+        except Exception as e:
+            emit({"id": job_id, "type": "error", "error": str(e)})
+            return
+        finally:
+            if cache is not None:
+                cache.close()
+
+        self.jobs_done += 1
+        emit({
+            "id": job_id,
+            "type": "done",
+            "pages": pages,
+            "errors": errors,
+            "seconds": round(time.time() - start_time, 3),
+        })
+
+def parse_job(line):
+    """Decodifica una riga di richiesta; (lavoro, errore)"""
+    try:
+        job = json.loads(line)
+    except ValueError as e:
+        return None, f"JSON non valido: {e}"
+    if not isinstance(job, dict):
+        return None, "la richiesta deve essere un oggetto JSON"
+    return job, None
+
+def serve_stdio(server, protocol_out):
+    """Legge le richieste da stdin e scrive le risposte su protocol_out (lo stdout originale)"""
+    def emit(message):
+        protocol_out.write(json.dumps(message, ensure_ascii=False) + '\n')
+        protocol_out.flush()
+
+    log("[OK] Server OCR pronto su stdin/stdout")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job, error = parse_job(line)
+        if error is not None:
+            emit({"id": None, "type": "error", "error": error})
+            continue
+        if not server.run_job(job, emit):
+            break
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _JobHandler(socketserver.StreamRequestHandler):
+        """Una connessione: righe JSON di richiesta in ingresso, righe di risposta in uscita"""
+
+        def handle(self):
+            def emit(message):
+                self.wfile.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.wfile.flush()
+
+            for raw_line in self.rfile:
+                line = raw_line.decode('utf-8', errors='replace')
+                if not line.strip():
+                    continue
+                job, error = parse_job(line)
+                if error is not None:
+                    emit({"id": None, "type": "error", "error": error})
+                    continue
+                try:
+                    keep_running = self.server.ocr.run_job(job, emit)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                if not keep_running:
+                    # shutdown() attende la fine di serve_forever: va chiamato da un altro thread
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+
+    class _UnixJobServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+def serve_socket(server, socket_path):
+    """Accetta connessioni sul socket Unix socket_path finché non arriva {"cmd": "shutdown"}"""
+    if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+        log("[ERR] Socket Unix non supportati su questo sistema: usa la modalità stdin/stdout")
+        return False
+
+    if os.path.exists(socket_path):
+        # Socket rimasto da un'esecuzione precedente: rifiuta se un altro server è in ascolto
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            log(f"[ERR] Un server è già in ascolto su {socket_path}")
+            return False
+        except OSError:
+            os.remove(socket_path)
+        finally:
+            probe.close()
+
+    with _UnixJobServer(socket_path, _JobHandler) as unix_server:
+        unix_server.ocr = server
+        log(f"[OK] Server OCR in ascolto su {socket_path}")
+        try:
+            unix_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+    return True
+
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Server OCR EasyOCR con modelli caricati una sola volta")
+    parser.add_argument(
+        "--socket", metavar="PERCORSO",
+        help="ascolta su un socket Unix invece di stdin/stdout"
+    )
+    add_cache_arguments(parser)
+    return parser.parse_args()
+
+def main():
+    """Funzione principale"""
+    args = parse_args()
+
+    # In modalità stdin/stdout qualsiasi print (EasyOCR, torch, script OCR) va su
+    # stderr e non sporca il protocollo, anche durante il caricamento dei modelli
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    log("[*] Caricamento modelli EasyOCR...")
+    start_time = time.time()
+    try:
+        reader = engine.create_reader()
+    except Exception as e:
+        log(f"[ERR] Errore inizializzazione EasyOCR: {e}")
+        sys.exit(1)
+    log(f"[OK] Modelli caricati in {time.time() - start_time:.1f}s")
+
+    server = OCRServer(reader, cache_config_from_args(args))
+    try:
+        if args.socket:
+            if not serve_socket(server, args.socket):
+                sys.exit(1)
+        else:
+            serve_stdio(server, protocol_out)
+    except KeyboardInterrupt:
+        pass
+    log(f"[INFO] Server OCR chiuso ({server.jobs_done} lavori completati)")
+
+if __name__ == "__main__":
+    main()
@@ -595,6 +595,80 @@ async function initQuiz() {
     startTimer();
 }
 
+// Bundle delle immagini (quiz-images.bundle, creato da image_bundle.py): indice letto una volta
+let imageBundle = null;
+
+// Legge intestazione e indice del bundle; le immagini vengono lette solo quando servono
+function loadImageBundle(basePath) {
+    if (imageBundle !== null) {
+        return imageBundle;
+    }
+    
+    imageBundle = { fd: null, entries: new Map() };
+    try {
+        const bundlePath = path.join(basePath, 'quiz-images.bundle');
+        if (fs.existsSync(bundlePath)) {
+            const fd = fs.openSync(bundlePath, 'r');
+            const header = Buffer.alloc(24);
+            fs.readSync(fd, header, 0, header.length, 0);
+            
+            if (header.toString('latin1', 0, 8) !== 'QIMGBUN1' || header.readUInt32LE(8) !== 1) {
+                console.warn('Formato di quiz-images.bundle non riconosciuto');
+                fs.closeSync(fd);
+                return imageBundle;
+            }
+            
+            // Voci da 24 byte: pagina u32, indice u16, riservato u16, offset u64, lunghezza u32, estensione
+            const count = header.readUInt32LE(12);
+            const index = Buffer.alloc(count * 24);
+            fs.readSync(fd, index, 0, index.length, Number(header.readBigUInt64LE(16)));
+            for (let i = 0; i < count; i++) {
+                const entry = i * 24;
+                imageBundle.entries.set(`${index.readUInt32LE(entry)}:${index.readUInt16LE(entry + 4)}`, {
+                    offset: Number(index.readBigUInt64LE(entry + 8)),
+                    length: index.readUInt32LE(entry + 16),
+                    ext: index.toString('latin1', entry + 20, entry + 24).replace(/\0+$/, '')
+                });
+            }
+            imageBundle.fd = fd;
+        }
+    } catch (error) {
+        console.warn('Impossibile leggere quiz-images.bundle:', error);
+    }
+    return imageBundle;
+}
+
+// Indice pagina -> file immagine letto da images-metadata.json (caricato una volta)
+let imagesByPage = null;
+
+// Le immagini ripetute (loghi, strutture comuni) sono salvate una sola volta:
+// il metadata associa ogni pagina al file canonico
+function loadImagesByPage(basePath) {
+    if (imagesByPage !== null) {
+        return imagesByPage;
+    }
+    
+    imagesByPage = new Map();
+    try {
+        const metadataPath = path.join(basePath, 'quiz-images', 'images-metadata.json');
+        if (fs.existsSync(metadataPath)) {
+            const metadata = JSON.parse(fs.readFileSync(metadataPath, 'utf8'));
+            for (const image of metadata.images || []) {
+                if (!imagesByPage.has(image.page)) {
+                    imagesByPage.set(image.page, []);
+                }
+                imagesByPage.get(image.page).push(image);
+            }
+            for (const images of imagesByPage.values()) {
+                images.sort((a, b) => a.image_index - b.image_index);
+            }
+        }
+    } catch (error) {
+        console.warn('Impossibile leggere images-metadata.json:', error);
+    }
+    return imagesByPage;
+}
+
 // Controlla se esiste un'immagine per il quiz
 function getQuizImage(quizId) {
     // Ogni pagina ha circa 2 quiz
@@ -603,6 +677,32 @@ function getQuizImage(quizId) {
     // Path relativo dalla cartella pages/quiz alla root
     const basePath = path.join(__dirname, '..', '..');
     
+    // Prima il bundle, se presente: l'immagine viene letta dal file unico come data URL
+    const bundle = loadImageBundle(basePath);
+    for (const imageIndex of [1, 2]) {
+        const entry = bundle.entries.get(`${pageNumber}:${imageIndex}`);
+        if (entry) {
+            const data = Buffer.alloc(entry.length);
+            fs.readSync(bundle.fd, data, 0, entry.length, entry.offset);
+            const mimeType = entry.ext === 'jpg' ? 'jpeg' : entry.ext;
+            return `data:image/${mimeType};base64,${data.toString('base64')}`;
+        }
+    }
+    
+    // Poi le prime due immagini della pagina secondo il metadata
+    const pageImages = loadImagesByPage(basePath).get(pageNumber) || [];
+    for (const image of pageImages.slice(0, 2)) {
+        // Variante ridotta (WebP) se generata, altrimenti il file originale
+        const display = image.variants && image.variants.display;
+        const filenames = display ? [display.filename, image.filename] : [image.filename];
+        for (const filename of filenames) {
+            const imagePath = `quiz-images/${filename}`;
+            if (fs.existsSync(path.join(basePath, imagePath))) {
+                return `../../${imagePath}`;
+            }
+        }
+    }
+    
     // Prova diversi pattern di nomi file
     const possibleImages = [
         `quiz-images/page_${String(pageNumber).padStart(4, '0')}_img_01.jpeg`,
@@ -661,8 +761,8 @@ function openCurrentQuestionPdf() {
     // Ottieni il testo della domanda per cercare la pagina nel PDF
     const questionText = quiz.question || '';
     
-    // Invia la richiesta al processo principale per aprire il PDF con il testo della domanda
-    ipcRenderer.send('open-pdf', pdfFileName, questionText);
+    // Invia la richiesta al processo principale (file di origine e id servono per l'indice delle pagine)
+    ipcRenderer.send('open-pdf', pdfFileName, questionText, sourceFile, quiz.id);
 }
 
 // Gestisci errori nell'apertura del PDF
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Riconoscimento delle pagine PDF che hanno già un livello di testo
+Usato da extract_text_from_pdf_ocr.py e extract_text_from_pdf_ocr_easyocr.py
+
+Molti PDF sono misti: alcune pagine sono scansioni, altre sono generate in
+digitale. Per queste ultime il testo si legge con PyMuPDF in pochi
+millisecondi, senza renderizzare la pagina né passarla all'OCR.
+"""
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Caratteri (esclusi gli spazi) necessari perché il livello di testo sia considerato utile
+MIN_TEXT_CHARS = 40
+
+# Oltre questa frazione di pagina coperta da immagini la pagina è trattata come scansione
+MAX_IMAGE_COVERAGE = 0.5
+
+# Frazione minima di caratteri validi: font senza mappa Unicode producono testo illeggibile
+MIN_VALID_RATIO = 0.9
+
+# Etichette usate nell'intestazione "=== PAGINA i [etichetta] ===" del file di output
+SOURCE_TEXT_LAYER = "testo"
+SOURCE_OCR = "ocr"
+
+def image_coverage(page):
+    """Frazione dell'area della pagina coperta da immagini (0-1)"""
+    page_area = abs(page.rect)
+    if not page_area:
+        return 0.0
+
+    covered = 0.0
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"]) & page.rect
+        if not bbox.is_empty:
+            covered += abs(bbox)
+    return min(1.0, covered / page_area)
+
+def classify_page(page, min_chars=MIN_TEXT_CHARS, max_image_coverage=MAX_IMAGE_COVERAGE):
+    """
+    Decide se una pagina ha bisogno dell'OCR
+
+    Args:
+        page: pagina PyMuPDF
+        min_chars: caratteri minimi del livello di testo
+        max_image_coverage: copertura massima di immagini per usare il livello di testo
+
+    Returns:
+        (serve_ocr, testo del livello di testo, copertura immagini)
+    """
+    text = page.get_text("text", sort=True)
+    chars = [c for c in text if not c.isspace()]
+    coverage = image_coverage(page)
+
+    if len(chars) < min_chars or coverage > max_image_coverage:
+        return True, text, coverage
+
+    valid = sum(1 for c in chars if c.isprintable() and c != '\ufffd')
+    if valid / len(chars) < MIN_VALID_RATIO:
+        return True, text, coverage
+
+    return False, text, coverage
+
+def text_layer_result(page, text, dpi):
+    """
+    Risultato di pagina nello stesso formato dell'OCR, letto dal livello di testo
+
+    I riquadri delle parole sono convertiti in pixel alla risoluzione dpi, come
+    quelli restituiti dai motori OCR.
+    """
+    scale = dpi / 72
+    words, boxes = [], []
+    for x0, y0, x1, y1, word, *_ in page.get_text("words", sort=True):
+        words.append(word)
+        boxes.append([int(x0 * scale), int(y0 * scale), int(x1 * scale), int(y1 * scale)])
+
+    return {
+        "text": text,
+        "words": words,
+        "boxes": boxes,
+        "confidences": [1.0] * len(words),
+        "source": SOURCE_TEXT_LAYER,
+    }
+
+def page_header(page_num, source=None):
+    """Intestazione di pagina del file di output (con l'etichetta del metodo di estrazione se nota)"""
+    if source:
+        return f"=== PAGINA {page_num} [{source}] ==="
+    return f"=== PAGINA {page_num} ==="
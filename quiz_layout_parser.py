@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ricostruzione dei quiz (domanda, risposte A-E, "Risposta X") dai risultati OCR
+Usato da extract_text_from_pdf_ocr.py e extract_text_from_pdf_ocr_easyocr.py (--quiz-jsonl)
+
+Il file di testo dell'OCR contiene un frammento per riga: EasyOCR separa la
+lettera dell'opzione dal testo ("B" / "un" / "anticorpo monoclonale...") e gli
+script extractModello*Quizzes.js devono ricomporre le domande con regole
+diverse per ogni modello. Qui si usano i riquadri dei risultati OCR:
+    1. le parole con sovrapposizione verticale formano una riga, ordinata da sinistra
+    2. una macchina a stati riconosce domanda, opzioni A-E e riga "Risposta X"
+    3. ogni quiz completato viene scritto subito come riga JSON (stesso formato
+       dei quiz di quiz-data.json, più la pagina e gli eventuali avvisi)
+Le pagine arrivano una alla volta mentre l'OCR procede: una domanda a cavallo
+di due pagine viene completata con la pagina successiva.
+
+Da solo converte un file di testo già estratto ("=== PAGINA i ===") o le righe
+"page" del server OCR (ocr_server.py):
+    python quiz_layout_parser.py "Ulteriori quiz/ssfo-quiz-modello7.txt"
+"""
+
+import argparse
+import json
+import re
+import sys
+
+QUIZ_LETTERS = "ABCDE"
+
+# Due riquadri sono sulla stessa riga se si sovrappongono in verticale almeno
+# per questa frazione dell'altezza del più basso
+LINE_OVERLAP = 0.5
+
+# Opzioni senza lettera: una riga che segue la precedente a meno di questa
+# frazione della propria altezza è testo andato a capo, non una nuova opzione
+WRAP_GAP = 0.6
+
+# Letture OCR sbagliate di una lettera isolata, accettate solo se è la lettera attesa
+MARKER_CONFUSIONS = {"4": "A", "8": "B", "c": "C", "0": "D"}
+
+QUIZ_JSONL_SUFFIX = ".quiz.jsonl"
+
+_MARKER_TOKEN = re.compile(r'^([A-Ea-e480])[.)]?$')
+_MARKER_PREFIX = re.compile(r'^([A-E])(?:[.)]\s*|\s+)(\S.*)$')
+# "Risposta X" (anche "Riposta", lettura OCR frequente)
+_ANSWER_KEY = re.compile(r'^ris?posta(?:\s+corretta)?\s*[:.]?\s*(?:([A-Ea-e])\b.*)?$', re.IGNORECASE)
+# Numero della domanda: "Anteprima quesito 1101" oppure "1.41)" (anche seguito dalla domanda)
+_NUMBER_HEADER = re.compile(r'^(?:(?:anteprima\s+)?quesito\s+(\d+)\b|(\d+(?:\.\d+)?)\))\s*(.*)$', re.IGNORECASE)
+_PAGE_HEADER = re.compile(r'^=== PAGINA (\d+)(?: \[\w+\])? ===$')
+_HAS_WORD = re.compile(r'\w')
+
+class Line:
+    """Riga ricostruita: testo, riquadro (None senza geometria) e prima parola"""
+
+    __slots__ = ("text", "box", "first_word", "first_box")
+
+    def __init__(self, text, box=None, first_word=None, first_box=None):
+        self.text = text
+        self.box = box
+        self.first_word = first_word if first_word is not None else text.split(' ', 1)[0]
+        self.first_box = first_box
+
+def rebuild_lines(words, boxes):
+    """
+    Raggruppa le parole (o i frammenti di EasyOCR) in righe usando i riquadri
+
+    Returns:
+        lista di Line dall'alto in basso, con le parole ordinate da sinistra
+    """
+    items = sorted(zip(boxes, words), key=lambda item: (item[0][1] + item[0][3]) / 2)
+    rows = []
+    for box, word in items:
+        word = word.strip()
+        if not word:
+            continue
+        row = rows[-1] if rows else None
+        if row is not None:
+            top, bottom = row["box"][1], row["box"][3]
+            overlap = min(bottom, box[3]) - max(top, box[1])
+            height = min(bottom - top, box[3] - box[1]) or 1
+            if overlap / height >= LINE_OVERLAP:
+                row["items"].append((box, word))
+                row["box"] = [min(row["box"][0], box[0]), min(top, box[1]),
+                              max(row["box"][2], box[2]), max(bottom, box[3])]
+                continue
+        rows.append({"box": list(box), "items": [(box, word)]})
+
+    lines = []
+    for row in rows:
+        row["items"].sort(key=lambda item: item[0][0])
+        first_box, first_word = row["items"][0]
+        text = ' '.join(word for _, word in row["items"])
+        lines.append(Line(text, row["box"], first_word, first_box))
+    return lines
+
+def text_lines(text):
+    """Righe di una pagina senza geometria (file di testo già estratto)"""
+    return [Line(line.strip()) for line in text.splitlines() if line.strip()]
+
+def result_lines(result):
+    """Righe di un risultato di pagina: dai riquadri se presenti, altrimenti dal testo"""
+    if result.get("words") and result.get("boxes"):
+        return rebuild_lines(result["words"], result["boxes"])
+    return text_lines(result.get("text") or "")
+
+class _Quiz:
+    """Quiz in costruzione"""
+
+    def __init__(self, page, number=None):
+        self.page = page
+        self.number = number
+        self.question = []
+        # x del margine sinistro della domanda (None senza geometria)
+        self.left = None
+        # Opzioni: [lettera, [segmenti di testo], x della lettera, esplicita]
+        self.answers = []
+        self.correct = None
+        self.warnings = []
+
+    @property
+    def last_letter(self):
+        return self.answers[-1][0] if self.answers else None
+
+    def next_letter(self):
+        last = self.last_letter
+        if last is None:
+            return "A"
+        position = QUIZ_LETTERS.index(last) + 1
+        return QUIZ_LETTERS[position] if position < len(QUIZ_LETTERS) else None
+
+    def can_fold(self, letter):
+        """True se le opzioni dalla lettera in poi sono tutte senza lettera (quindi ipotetiche)"""
+        later = [answer for answer in self.answers if answer[0] >= letter]
+        return bool(later) and len(later) < len(self.answers) and not any(answer[3] for answer in later)
+
+    def fold(self, letter):
+        """Riporta le opzioni ipotetiche dalla lettera in poi nel testo dell'opzione precedente"""
+        while self.answers and self.answers[-1][0] >= letter:
+            _, segments, _, _ = self.answers.pop()
+            self.answers[-1][1].extend(segments)
+
+class QuizLayoutParser:
+    """
+    Macchina a stati che trasforma le righe delle pagine in quiz
+
+    feed_page() restituisce i quiz completati con quella pagina; finish()
+    quelli rimasti aperti alla fine del documento.
+    """
+
+    def __init__(self):
+        self._quiz = None
+        self._awaiting_key = False
+        self._previous_box = None
+        self.quizzes = 0
+        self.skipped = 0
+
+    def feed_page(self, page_num, result):
+        """Aggiunge un risultato di pagina (OCR o livello di testo)"""
+        return self.feed_lines(page_num, result_lines(result))
+
+    def feed_lines(self, page_num, lines):
+        """Aggiunge le righe di una pagina, dall'alto in basso"""
+        completed = []
+        self._previous_box = None
+        for line in lines:
+            self._feed_line(page_num, line, completed)
+            if line.box is not None:
+                self._previous_box = line.box
+        return completed
+
+    def finish(self):
+        """Chiude il quiz in corso a fine documento"""
+        completed = []
+        self._close(completed)
+        return completed
+
+    def _feed_line(self, page_num, line, completed):
+        text = line.text.strip()
+        if not _HAS_WORD.search(text):
+            # Simboli isolati (pallini delle opzioni, trattini)
+            return
+
+        quiz = self._quiz
+
+        # "Risposta" da sola: la lettera arriva sulla riga successiva
+        if self._awaiting_key:
+            self._awaiting_key = False
+            if quiz is not None and len(text) == 1 and text.upper() in QUIZ_LETTERS:
+                quiz.correct = text.upper()
+                self._close(completed)
+                return
+
+        match = _NUMBER_HEADER.match(text)
+        if match:
+            self._close(completed)
+            self._quiz = _Quiz(page_num, match.group(1) or match.group(2))
+            if match.group(3):
+                self._add_question_line(self._quiz, line, match.group(3))
+            return
+
+        match = _ANSWER_KEY.match(text)
+        if match and quiz is not None:
+            if match.group(1) is None:
+                self._awaiting_key = True
+                return
+            quiz.correct = match.group(1).upper()
+            self._close(completed)
+            return
+
+        marker = self._marker(line, quiz)
+        if marker is not None:
+            letter, rest = marker
+            if quiz.answers and letter <= quiz.last_letter:
+                # Una lettera vera smentisce le opzioni senza lettera ipotizzate prima
+                quiz.fold(letter)
+            x = line.first_box[0] if line.first_box is not None else None
+            quiz.answers.append([letter, [rest] if rest else [], x, True])
+            return
+
+        if quiz is None or not quiz.question:
+            if quiz is None:
+                quiz = self._quiz = _Quiz(page_num)
+            self._add_question_line(quiz, line, text)
+            return
+
+        if not quiz.answers:
+            if quiz.question[-1].endswith((':', '?')):
+                # Domanda terminata e opzione senza lettera (lettera persa dall'OCR)
+                quiz.answers.append(["A", [text], None, False])
+                quiz.warnings.append("lettera A mancante")
+            else:
+                self._add_question_line(quiz, line, text)
+            return
+
+        if self._is_continuation(line, quiz):
+            quiz.answers[-1][1].append(text)
+            return
+
+        next_letter = quiz.next_letter()
+        if next_letter is not None and not quiz.answers[-1][3]:
+            # Opzioni senza lettera: una per riga
+            quiz.answers.append([next_letter, [text], None, False])
+            return
+
+        # Dopo l'ultima opzione: inizia la domanda successiva (senza riga "Risposta")
+        self._close(completed)
+        self._quiz = _Quiz(page_num)
+        self._add_question_line(self._quiz, line, text)
+
+    @staticmethod
+    def _add_question_line(quiz, line, text):
+        quiz.question.append(text)
+        if line.box is not None:
+            quiz.left = line.box[0] if quiz.left is None else min(quiz.left, line.box[0])
+
+    def _in_marker_column(self, line, quiz):
+        """
+        True se la prima parola può essere la lettera di un'opzione per posizione
+
+        Con la geometria deve essere allineata alle lettere precedenti (o al
+        margine della domanda); senza, una lettera minuscola o confusa deve
+        essere da sola sulla riga.
+        """
+        if line.first_box is None:
+            return True
+        reference = quiz.answers[-1][2] if quiz.answers and quiz.answers[-1][2] is not None else quiz.left
+        if reference is None:
+            return True
+        return abs(line.first_box[0] - reference) <= (line.first_box[3] - line.first_box[1])
+
+    def _marker(self, line, quiz):
+        """(lettera, testo restante) se la riga inizia un'opzione attesa, altrimenti None"""
+        if quiz is None or not quiz.question:
+            return None
+        # Dopo la E nessuna lettera è attesa ("F" non corrisponde a nessuna opzione)
+        expected = quiz.next_letter() or "F"
+        last = quiz.last_letter
+
+        def acceptable(letter):
+            # La lettera attesa o, se l'OCR ne ha persa una, quella dopo
+            if letter == expected or (last is not None and letter > expected):
+                return True
+            return quiz.can_fold(letter)
+
+        if not self._in_marker_column(line, quiz):
+            return None
+
+        match = _MARKER_TOKEN.match(line.first_word)
+        if match:
+            token = match.group(1)
+            rest = line.text[len(line.first_word):].strip()
+            if token in QUIZ_LETTERS:
+                if acceptable(token):
+                    return token, rest
+            elif MARKER_CONFUSIONS.get(token, token.upper()) == expected and (line.first_box is not None or not rest):
+                # Minuscola o cifra: solo la lettera attesa, in un riquadro separato o da sola sulla riga
+                return expected, rest
+
+        match = _MARKER_PREFIX.match(line.text)
+        if match and acceptable(match.group(1)):
+            return match.group(1), match.group(2).strip()
+        return None
+
+    def _is_continuation(self, line, quiz):
+        """True se la riga continua il testo dell'ultima opzione (testo andato a capo)"""
+        letter_x = quiz.answers[-1][2]
+        if line.box is not None and not quiz.answers[-1][3]:
+            previous = self._previous_box
+            if previous is None:
+                return False
+            return line.box[1] - previous[3] < WRAP_GAP * (line.box[3] - line.box[1])
+        if not quiz.answers[-1][1]:
+            # Lettera da sola sulla riga: questo è il suo testo
+            return True
+        if line.box is not None and letter_x is not None:
+            # Il testo a capo è allineato al testo dell'opzione, a destra della lettera
+            # (larga circa mezza altezza di riga)
+            return line.box[0] > letter_x + (line.box[3] - line.box[1]) / 2
+        if not quiz.answers[-1][3]:
+            return False
+        if quiz.next_letter() is not None:
+            # Prima della E una riga senza lettera continua l'opzione (lettera persa: vedi _repair)
+            return True
+        return line.text[:1].islower()
+
+    def _close(self, completed):
+        """Completa il quiz in corso (se ha opzioni) e lo aggiunge a completed"""
+        quiz, self._quiz = self._quiz, None
+        self._awaiting_key = False
+        if quiz is None:
+            return
+        if not quiz.answers:
+            if quiz.question or quiz.correct:
+                self.skipped += 1
+            return
+
+        answers = self._repair(quiz)
+        self.quizzes += 1
+        record = {
+            "id": self.quizzes,
+            "number": quiz.number,
+            "page": quiz.page,
+            "question": ' '.join(quiz.question),
+            "answers": [{"letter": letter, "text": text} for letter, text in answers],
+            "correctAnswer": quiz.correct,
+        }
+        if quiz.warnings:
+            record["warnings"] = quiz.warnings
+        completed.append(record)
+
+    def _repair(self, quiz):
+        """
+        Opzioni come (lettera, testo), ricostruendo le lettere perse dall'OCR
+
+        Se manca una lettera (A, B, D, E) le righe in più dell'opzione
+        precedente diventano le opzioni mancanti.
+        """
+        answers = []
+        for position, (letter, segments, _, _) in enumerate(quiz.answers):
+            following = quiz.answers[position + 1][0] if position + 1 < len(quiz.answers) else None
+            missing = []
+            if following is not None:
+                missing = list(QUIZ_LETTERS[QUIZ_LETTERS.index(letter) + 1:QUIZ_LETTERS.index(following)])
+
+            if missing and len(segments) > len(missing):
+                split = len(segments) - len(missing)
+                answers.append((letter, ' '.join(segments[:split])))
+                answers.extend(zip(missing, segments[split:]))
+                quiz.warnings.append(f"lettere ricostruite: {', '.join(missing)}")
+            else:
+                answers.append((letter, ' '.join(segments)))
+                if missing:
+                    quiz.warnings.append(f"opzioni mancanti: {', '.join(missing)}")
+
+        if answers[-1][0] != QUIZ_LETTERS[-1] and quiz.correct is not None:
+            quiz.warnings.append(f"opzioni fino a {answers[-1][0]}")
+        if quiz.correct is not None and quiz.correct not in {letter for letter, _ in answers}:
+            quiz.warnings.append(f"risposta {quiz.correct} non tra le opzioni")
+        return answers
+
+class QuizJsonlWriter:
+    """
+    Scrive i quiz in JSON Lines man mano che le pagine vengono riconosciute
+
+    Ogni riga viene scritta e svuotata appena il quiz è completo. Con
+    append=True (ripresa di un'esecuzione interrotta) i quiz già scritti
+    restano; la domanda in corso al momento dell'interruzione può risultare
+    incompleta (campo "warnings").
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.parser = QuizLayoutParser()
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def add_page(self, page_num, result):
+        """Analizza una pagina e scrive i quiz completati"""
+        self._write(self.parser.feed_page(page_num, result))
+
+    def close(self, finish=True):
+        """Chiude il file; con finish scrive anche il quiz in corso (fine del documento)"""
+        if self._file.closed:
+            return
+        if finish:
+            self._write(self.parser.finish())
+        self._file.close()
+
+    def _write(self, records):
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        if records:
+            self._file.flush()
+
+def iter_text_file_pages(path):
+    """Pagine di un file di testo degli script OCR: (numero_pagina, righe)"""
+    page_num, lines = None, []
+    with open(path, 'r', encoding='utf-8') as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            match = _PAGE_HEADER.match(line)
+            if match:
+                if page_num is not None:
+                    yield page_num, lines
+                page_num, lines = int(match.group(1)), []
+            elif line and page_num is not None:
+                lines.append(Line(line))
+    if page_num is not None:
+        yield page_num, lines
+
+def iter_server_pages(path):
+    """Pagine dalle risposte del server OCR (righe JSON con "type": "page")"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for raw_line in f:
+            if not raw_line.strip():
+                continue
+            message = json.loads(raw_line)
+            if message.get("type") == "page" and "error" not in message:
+                yield message["page"], result_lines(message)
+
+def parse_args():
+    """Legge le opzioni da riga di comando"""
+    parser = argparse.ArgumentParser(description="Ricostruisce i quiz dal testo OCR o dalle risposte del server OCR")
+    parser.add_argument("input", help="file di testo degli script OCR oppure JSON Lines di ocr_server.py")
+    parser.add_argument("--output", help=f"file JSON Lines dei quiz (default: <input>{QUIZ_JSONL_SUFFIX})")
+    return parser.parse_args()
+
+def main():
+    """Funzione principale"""
+    args = parse_args()
+    output = args.output or args.input.rsplit('.', 1)[0] + QUIZ_JSONL_SUFFIX
+
+    parser = QuizLayoutParser()
+    warnings = 0
+    try:
+        pages = iter_server_pages(args.input) if args.input.endswith('.jsonl') else iter_text_file_pages(args.input)
+        with open(output, 'w', encoding='utf-8') as f:
+            for page_num, lines in pages:
+                for record in parser.feed_lines(page_num, lines):
+                    warnings += "warnings" in record
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            for record in parser.finish():
+                warnings += "warnings" in record
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    except (OSError, ValueError) as e:
+        print(f"[ERR] Impossibile leggere {args.input}: {e}")
+        sys.exit(1)
+
+    print(f"[OK] {parser.quizzes} quiz scritti in {output} ({warnings} con avvisi, {parser.skipped} blocchi senza opzioni)")
+
+if __name__ == "__main__":
+    main()